@@ -0,0 +1,243 @@
+"""
+Typeahead search over assets.
+
+asset_search holds one lower-cased row per asset: its code, its name and a
+document of code, name, manufacturer, model, RFID UIDs and department. Asset
+writes refresh the affected rows in their own transaction; deletes cascade.
+
+A query collects a few small candidate sets, each of which stops at the
+limit inside an index, and only those candidates are scored:
+
+* code and name prefixes, walked in order on text_pattern_ops btrees
+* substrings and fuzzy word matches on a pg_trgm GiST index, the latter
+  ordered by word-similarity distance (KNN) so typos still rank
+
+Trigrams need at least MIN_TRIGRAM_LENGTH characters, and a '%q%' match
+the GiST index cannot serve reads every row, so shorter queries, and
+every query without pg_trgm (the extension needs CREATE privilege), match
+on prefixes only.
+
+migrations.py creates the table, fills it and builds its indexes
+CONCURRENTLY (create() and INDEXES). The request path only checks once
+that the migration has run: until then writes skip the refresh (the
+migration's fill covers them) and searches fail with a clear error.
+
+    python asset_search.py --rebuild
+"""
+import argparse
+
+import psycopg2
+
+from db import fetch_all, fetch_one, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS asset_search (
+    asset_id INTEGER PRIMARY KEY REFERENCES assets(asset_id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+"""
+
+# (name, table, definition) for migrations.build_indexes
+INDEXES = (
+    ("idx_asset_search_code", "asset_search", "(code text_pattern_ops)"),
+    ("idx_asset_search_name", "asset_search", "(name text_pattern_ops)"),
+)
+TRIGRAM_INDEX = ("idx_asset_search_document_trgm", "asset_search", "USING gist (document gist_trgm_ops)")
+
+READY_SQL = """
+SELECT
+    to_regclass('asset_search') IS NOT NULL AS ready,
+    to_regclass('idx_asset_search_document_trgm') IS NOT NULL AS trigram
+"""
+
+# {where} restricts the assets being (re)indexed
+REFRESH_SQL = """
+INSERT INTO asset_search (asset_id, code, name, document)
+SELECT
+    a.asset_id,
+    lower(COALESCE(a.asset_code, '')),
+    lower(COALESCE(a.asset_name, '')),
+    lower(concat_ws(' ', a.asset_code, a.asset_name, a.manufacturer, a.model, t.uids, d.name))
+FROM assets a
+LEFT JOIN LATERAL (
+    SELECT string_agg(rfid_uid, ' ') AS uids
+    FROM asset_tags
+    WHERE asset_id = a.asset_id
+) t ON TRUE
+LEFT JOIN LATERAL (
+    SELECT dep.name
+    FROM asset_department_mapping adm
+    JOIN departments dep ON dep.department_id = adm.department_id
+    WHERE adm.asset_id = a.asset_id
+    ORDER BY adm.mapped_at DESC
+    LIMIT 1
+) d ON TRUE
+{where}
+ON CONFLICT (asset_id) DO UPDATE SET
+    code = EXCLUDED.code,
+    name = EXCLUDED.name,
+    document = EXCLUDED.document
+"""
+
+MIN_TRIGRAM_LENGTH = 3
+MAX_QUERY_LENGTH = 100
+MAX_LIMIT = 50
+
+_schema_ready = False
+_trigram = False
+
+
+def create():
+    """
+    Migration step: the pg_trgm extension, the table and its initial fill.
+    Returns the indexes to build CONCURRENTLY afterwards.
+    """
+    try:
+        with transaction() as tx:
+            tx.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except psycopg2.Error as e:
+        print(f"pg_trgm unavailable, asset search limited to prefixes: {e}", flush=True)
+    with transaction() as tx:
+        trigram = tx.fetch_one(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') AS ok"
+        )["ok"]
+        missing = tx.fetch_one("SELECT to_regclass('asset_search') IS NULL AS missing")["missing"]
+        tx.execute(SCHEMA)
+        if missing:
+            tx.execute(REFRESH_SQL.format(where=""))
+    return INDEXES + ((TRIGRAM_INDEX,) if trigram else ())
+
+
+def ready(fetch=None):
+    """
+    Whether migrations.py has created asset_search. Cached once true; also
+    notes whether the trigram index exists. fetch runs the check (tx.fetch_one
+    inside a transaction).
+    """
+    global _schema_ready, _trigram
+    if not _schema_ready:
+        row = (fetch or fetch_one)(READY_SQL)
+        _trigram = row["trigram"]
+        _schema_ready = row["ready"]
+    return _schema_ready
+
+
+def refresh(tx, asset_ids):
+    """Re-index the given assets inside tx (after their row, tags or department changed)"""
+    asset_ids = [i for i in asset_ids if i is not None]
+    if asset_ids and ready(tx.fetch_one):
+        tx.execute(REFRESH_SQL.format(where="WHERE a.asset_id = ANY(%s)"), (asset_ids,))
+
+
+def refresh_where(tx, where, params=None):
+    """Re-index the assets matching an SQL condition on ``a`` (e.g. a staging join)"""
+    if ready(tx.fetch_one):
+        tx.execute(REFRESH_SQL.format(where=f"WHERE {where}"), params)
+
+
+def rebuild():
+    """Recompute the whole index from assets"""
+    if not ready():
+        raise RuntimeError("asset_search does not exist yet; run migrations.py")
+    with transaction() as tx:
+        tx.execute("TRUNCATE asset_search")
+        tx.execute(REFRESH_SQL.format(where=""))
+        return tx.fetch_one("SELECT COUNT(*) AS n FROM asset_search")["n"]
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_sql(trigram):
+    candidates = [
+        "(SELECT asset_id FROM asset_search WHERE code LIKE %(prefix)s ORDER BY code LIMIT %(limit)s)",
+        "(SELECT asset_id FROM asset_search WHERE name LIKE %(prefix)s ORDER BY name LIMIT %(limit)s)",
+    ]
+    similarity = "0"
+    if trigram:
+        candidates += [
+            "(SELECT asset_id FROM asset_search WHERE document LIKE %(contains)s LIMIT %(limit)s)",
+            "(SELECT asset_id FROM asset_search WHERE %(q)s <%% document"
+            " ORDER BY %(q)s <<-> document LIMIT %(limit)s)",
+        ]
+        similarity = "word_similarity(%(q)s, s.document)"
+
+    union = "\n        UNION ".join(candidates)
+    return f"""
+    WITH candidates AS (
+        {union}
+    ),
+    ranked AS (
+        SELECT
+            s.asset_id,
+            CASE
+                WHEN s.code = %(q)s THEN 4
+                WHEN s.code LIKE %(prefix)s THEN 3
+                WHEN s.name LIKE %(prefix)s THEN 2
+                WHEN s.document LIKE %(contains)s THEN 1
+                ELSE 0
+            END + {similarity} AS score
+        FROM candidates c
+        JOIN asset_search s ON s.asset_id = c.asset_id
+        ORDER BY score DESC, s.code
+        LIMIT %(limit)s
+    )
+    SELECT
+        a.asset_id,
+        a.asset_code,
+        a.asset_name,
+        a.manufacturer,
+        a.model,
+        ac.name AS category_name,
+        d.name AS department_name,
+        t.rfid_uids,
+        ROUND(r.score::numeric, 3) AS score
+    FROM ranked r
+    JOIN assets a ON a.asset_id = r.asset_id
+    LEFT JOIN asset_categories ac ON ac.category_id = a.category_id
+    LEFT JOIN LATERAL (
+        SELECT dep.name
+        FROM asset_department_mapping adm
+        JOIN departments dep ON dep.department_id = adm.department_id
+        WHERE adm.asset_id = a.asset_id
+        ORDER BY adm.mapped_at DESC
+        LIMIT 1
+    ) d ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT array_agg(rfid_uid ORDER BY rfid_uid) AS rfid_uids
+        FROM asset_tags
+        WHERE asset_id = a.asset_id
+    ) t ON TRUE
+    ORDER BY r.score DESC, a.asset_code
+    """
+
+
+def search(q, limit=10):
+    """Best matches for a typeahead query, highest score first"""
+    if not ready():
+        raise RuntimeError("Asset search is not set up yet; run migrations.py")
+    q = " ".join((q or "").lower().split())[:MAX_QUERY_LENGTH]
+    if not q:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    escaped = _escape_like(q)
+    trigram = _trigram and len(q) >= MIN_TRIGRAM_LENGTH
+    return fetch_all(_search_sql(trigram), {
+        "q": q,
+        "prefix": escaped + "%",
+        "contains": "%" + escaped + "%",
+        "limit": limit,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute the search index")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Rebuilt asset_search: {rebuild()} rows")
+    else:
+        parser.print_help()
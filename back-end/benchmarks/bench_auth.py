@@ -0,0 +1,160 @@
+"""
+Auth benchmark: token verification latency and login throughput.
+
+verify: issues a token for a real user and compares the uncached path
+(JWT decode + user/role join) with tokens.verify() hits.
+
+middleware: per-request cost of permissions.authenticate() with warm
+token and permission caches, in microseconds.
+
+login: --clients threads hammer password checks at BCRYPT_ROUNDS, once
+inline on the calling threads (the old behaviour) and once through the
+passwords pool; reports checks/s, latency percentiles and rejections.
+
+    python benchmarks/bench_auth.py --verify 5000 --clients 32 --logins 10
+    python benchmarks/bench_auth.py --skip-verify --rounds 10
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt  # noqa: E402
+
+import passwords  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def report(label, timings_ms, elapsed=None, extra=""):
+    timings_ms.sort()
+    rate = f"{len(timings_ms) / elapsed:9.1f}/s" if elapsed else " " * 11
+    print(f"  {label:22s} n={len(timings_ms):6d} {rate}  p50 {percentile(timings_ms, 50):8.3f}  "
+          f"p95 {percentile(timings_ms, 95):8.3f}  p99 {percentile(timings_ms, 99):8.3f} ms {extra}")
+
+
+def bench_verify(count, user_id):
+    import db
+    import tokens
+
+    if user_id is None:
+        row = db.fetch_one("SELECT user_id FROM users ORDER BY user_id LIMIT 1")
+        if not row:
+            sys.exit("No users in the database; pass --skip-verify")
+        user_id = row["user_id"]
+    user = tokens.find_user(user_id=user_id)
+    token = tokens.issue(user)
+
+    uncached = []
+    for _ in range(min(count, 1000)):
+        start = time.perf_counter()
+        tokens.find_user(user_id=tokens.decode(token)["user_id"])
+        uncached.append((time.perf_counter() - start) * 1000)
+
+    tokens.verify(token)
+    cached = []
+    for _ in range(count):
+        start = time.perf_counter()
+        tokens.verify(token)
+        cached.append((time.perf_counter() - start) * 1000)
+
+    print(f"verify (user {user_id})")
+    report("decode + query", uncached)
+    report("tokens.verify (cached)", cached)
+    return token
+
+
+def bench_middleware(count, token):
+    from flask import Flask
+
+    import permissions
+    import querystats
+
+    def queries():
+        return sum(q["count"] for q in querystats.top(limit=None))
+
+    app = Flask(__name__)
+    permissions.init_app(app)
+
+    @app.route("/api/assets/", methods=["GET"])
+    @permissions.requires("assets:read")
+    def assets():
+        return "", 204
+
+    headers = {"Authorization": f"Bearer {token}"}
+    timings = []
+    with app.test_request_context("/api/assets/", headers=headers):
+        permissions.authenticate()
+        queries_before = queries()
+        for _ in range(count):
+            start = time.perf_counter()
+            permissions.authenticate()
+            timings.append((time.perf_counter() - start) * 1_000_000)
+    timings.sort()
+    # Only the periodic resource_versions sync should show up here
+    print(f"middleware ({count} requests, {queries() - queries_before} queries during the run)")
+    print(f"  authenticate()          p50 {percentile(timings, 50):8.1f}  p95 {percentile(timings, 95):8.1f}  "
+          f"p99 {percentile(timings, 99):8.1f} us")
+
+
+def bench_login(clients, per_client, rounds):
+    hashed = bcrypt.hashpw(b"benchmark-password", bcrypt.gensalt(rounds)).decode()
+
+    def run(check):
+        timings, rejected = [], [0]
+        lock = threading.Lock()
+
+        def client():
+            for _ in range(per_client):
+                start = time.perf_counter()
+                try:
+                    check("benchmark-password", hashed)
+                except passwords.Busy:
+                    with lock:
+                        rejected[0] += 1
+                    continue
+                with lock:
+                    timings.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return timings, time.perf_counter() - start, rejected[0]
+
+    print(f"login ({clients} clients x {per_client}, cost {rounds}, "
+          f"{passwords.BCRYPT_WORKERS} workers, max pending {passwords.LOGIN_MAX_PENDING})")
+    timings, elapsed, _ = run(lambda p, h: bcrypt.checkpw(p.encode(), h.encode()))
+    report("inline", timings, elapsed)
+    timings, elapsed, rejected = run(passwords.check)
+    report("passwords pool", timings, elapsed, f"rejected={rejected}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verify", type=int, default=5000, help="cached verifications to time")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--skip-verify", action="store_true", help="login benchmark only (no database)")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=10, help="password checks per client")
+    parser.add_argument("--rounds", type=int, default=passwords.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+
+    if not args.skip_verify:
+        token = bench_verify(args.verify, args.user_id)
+        bench_middleware(args.verify, token)
+    bench_login(args.clients, args.logins, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Serialization / compression benchmark for large API payloads.
+
+Builds a /api/tracking/current-shaped payload (Decimals, datetimes) and
+reports encode time and bytes on the wire for each encoder and encoding.
+
+    python benchmarks/bench_json.py --assets 50000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_provider import _default, orjson  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_rows(n):
+    now = datetime.now()
+    return [
+        {
+            "asset_id": i,
+            "asset_code": f"AST-{i:06d}",
+            "asset_name": f"Infusion Pump {i}",
+            "asset_type": "Medical",
+            "room_id": i % 400,
+            "current_room": f"Room {i % 400}",
+            "floor_id": i % 40,
+            "floor_name": f"Floor {i % 40}",
+            "building_id": i % 4,
+            "building_name": f"Block {i % 4}",
+            "last_seen_at": now - timedelta(minutes=i % 3000),
+            "purchase_cost": Decimal("12500.50") + i,
+            "hours_open": Decimal(i % 100) / 7,
+            "activity_status": "Active" if i % 5 else "Missing",
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.assets)
+    encoders = {
+        "stdlib": lambda: json.dumps(rows, default=_default, separators=(",", ":")).encode(),
+    }
+    if orjson is not None:
+        encoders["orjson"] = lambda: orjson.dumps(rows, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    print(f"{args.assets} assets, best of {args.repeat}")
+    body = None
+    for name, fn in encoders.items():
+        seconds, body = timed(fn, args.repeat)
+        print(f"  encode {name:8s} {seconds * 1000:8.1f} ms  {len(body):>10,} bytes")
+
+    seconds, gz = timed(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+    print(f"  gzip-6          {seconds * 1000:8.1f} ms  {len(gz):>10,} bytes")
+    if brotli is not None:
+        seconds, br = timed(lambda: brotli.compress(body, quality=5), args.repeat)
+        print(f"  br-5            {seconds * 1000:8.1f} ms  {len(br):>10,} bytes")
+
+
+if __name__ == "__main__":
+    main()
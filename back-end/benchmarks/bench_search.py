@@ -0,0 +1,100 @@
+"""
+Typeahead search latency benchmark.
+
+Samples real assets from the configured database, derives a query mix from
+them (code prefixes, name prefixes, misspelt names, RFID fragments) and
+reports p50/p95/p99 per query kind for asset_search.search(). Point it at a
+database with a realistic number of assets (the target is p99 < 20 ms at
+500k).
+
+    python benchmarks/bench_search.py --queries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asset_search  # noqa: E402
+import db  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def typo(word, rng):
+    """Swap two neighbouring letters, or drop one"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i + 1:]
+
+
+def make_queries(samples, count, rng):
+    kinds = {
+        "code_prefix": lambda a: a["asset_code"][:rng.randint(2, max(2, len(a["asset_code"])))],
+        "name_prefix": lambda a: a["asset_name"][:rng.randint(1, max(1, len(a["asset_name"])))],
+        "name_typo": lambda a: typo(a["asset_name"], rng),
+        "rfid_fragment": lambda a: (a["rfid_uid"] or a["asset_code"])[-rng.randint(3, 6):],
+    }
+    queries = []
+    for _ in range(count):
+        kind = rng.choice(list(kinds))
+        queries.append((kind, kinds[kind](rng.choice(samples))))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=1000, help="assets sampled to build queries")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not asset_search.ready():
+        sys.exit("asset_search does not exist yet; run migrations.py")
+    total = db.fetch_one("SELECT COUNT(*) AS n FROM asset_search")["n"]
+    samples = db.fetch_all("""
+        SELECT a.asset_code, a.asset_name,
+               (SELECT rfid_uid FROM asset_tags t WHERE t.asset_id = a.asset_id LIMIT 1) AS rfid_uid
+        FROM assets a
+        ORDER BY random()
+        LIMIT %s
+    """, (args.sample,))
+    if not samples:
+        sys.exit("No assets to search; load a dataset first")
+
+    rng = random.Random(args.seed)
+    queries = make_queries(samples, args.queries, rng)
+
+    # Warm the pool, the plan cache and the index pages
+    for _, q in queries[:50]:
+        asset_search.search(q, args.limit)
+
+    timings = {}
+    for kind, q in queries:
+        start = time.perf_counter()
+        asset_search.search(q, args.limit)
+        timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+    timings["all"] = [t for values in timings.values() for t in values]
+
+    print(f"{total} indexed assets, {args.queries} queries, limit {args.limit}, "
+          f"trigram={'on' if asset_search._trigram else 'off'}")
+    print(f"  {'kind':14s} {'n':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}  (ms)")
+    for kind, values in timings.items():
+        values.sort()
+        print(f"  {kind:14s} {len(values):6d} {percentile(values, 50):8.2f} {percentile(values, 95):8.2f} "
+              f"{percentile(values, 99):8.2f} {values[-1]:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start budget check for the API.
+
+Runs `import app; app.create_app()` in fresh interpreters under
+-X importtime, reports the median import and factory time and the heaviest
+modules, and exits non-zero when the total exceeds the budget. Nothing here
+needs a reachable database: startup must not connect.
+
+    python benchmarks/bench_startup.py --budget-ms 800 --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {len(list(application.url_map.iter_rules()))}")
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND, capture_output=True, text=True,
+        # An unroutable host proves startup never waits on the database
+        env=dict(os.environ, DB_HOST=os.getenv("DB_HOST", "192.0.2.1")),
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr[-2000:])
+    import_ms, factory_ms, rules = proc.stdout.split()[-3:]
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace(":", "|", 1).split("|")
+        # One separator space, then two spaces per nesting level
+        modules.append((int(cumulative_us), name[1:].rstrip()))
+    return float(import_ms), float(factory_ms), int(rules), modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 800)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r[0] for r in results)
+    factory_ms = statistics.median(r[1] for r in results)
+    total = import_ms + factory_ms
+
+    print(f"{args.runs} cold starts, {results[-1][2]} routes")
+    print(f"  import app     {import_ms:8.1f} ms")
+    print(f"  create_app()   {factory_ms:8.1f} ms")
+    print(f"  total          {total:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print("heaviest top-level imports (cumulative, last run):")
+    top_level = [(us, name) for us, name in results[-1][3] if not name.startswith(" ")]
+    for us, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if total > args.budget_ms:
+        print(f"FAIL: startup {total:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+HTTP load-testing suite for the API.
+
+run: discovers every GET route registered by app.create_app() (or takes
+--endpoint paths), fills path parameters from --param defaults, and drives
+them with --clients concurrent keep-alive clients for --duration seconds
+using a weighted --mix. Reports req/s, p50/p95/p99, error rate and the
+server-reported DB time (Server-Timing "db") per endpoint, and writes the
+results as JSON with --output. With gevent installed clients are
+greenlets, so 500+ of them fit in one process; otherwise threads.
+
+compare: diffs two result files and exits non-zero when an endpoint's
+p95/p99 or DB time grew, its throughput fell, or its error rate rose by
+more than --threshold percent.
+
+    python serve.py &
+    python benchmarks/load_test.py run --clients 500 --duration 60 --token "$API_TOKEN" --output before.json
+    python benchmarks/load_test.py run --endpoint /api/tracking/current --mix /api/tracking/current=3 ...
+    python benchmarks/load_test.py compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import os
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["run"]:
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
+import http.client  # noqa: E402
+import random  # noqa: E402
+import re  # noqa: E402
+import subprocess  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+from urllib.parse import urlsplit  # noqa: E402
+
+try:
+    import gevent
+    from gevent import monkey as _monkey
+    if not _monkey.is_module_patched("socket"):
+        gevent = None
+except ImportError:
+    gevent = None
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Values for URL parameters; routes needing any other parameter are skipped
+DEFAULT_PARAMS = {
+    "asset_id": "1",
+    "reader_id": "1",
+    "building_id": "1",
+    "floor_id": "1",
+    "room_id": "1",
+    "role_id": "1",
+    "report_type": "department-summary",
+}
+
+# Never load-tested unless named with --endpoint
+EXCLUDED = re.compile(r"^/api/health/ready$|/jobs/|/snapshots/")
+
+_PARAM = re.compile(r"<(?:[^:<>]+:)?([^<>]+)>")
+_DB_TIMING = re.compile(r"db;dur=([\d.]+)")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ---------- discovery ----------
+def discover(params):
+    """(GET paths, skipped rules) from the app's URL map"""
+    sys.path.insert(0, BACKEND)
+    from app import create_app
+
+    paths, skipped = [], []
+    for rule in sorted(create_app().url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" not in rule.methods or rule.endpoint == "static":
+            continue
+        missing = [a for a in rule.arguments if a not in params]
+        if missing:
+            skipped.append(f"{rule.rule} (no value for {', '.join(missing)})")
+            continue
+        path = _PARAM.sub(lambda m: params[m.group(1)], rule.rule)
+        if EXCLUDED.search(path):
+            skipped.append(f"{rule.rule} (excluded)")
+            continue
+        if path not in paths:
+            paths.append(path)
+    return paths, skipped
+
+
+# ---------- run ----------
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}   # endpoint -> [ms]
+        self.db_ms = {}       # endpoint -> [ms]
+        self.errors = {}      # endpoint -> count
+        self.statuses = {}    # endpoint -> {status: count}
+
+    def add(self, endpoint, ms, status, db_ms):
+        with self.lock:
+            codes = self.statuses.setdefault(endpoint, {})
+            codes[status] = codes.get(status, 0) + 1
+            if status is None or status >= 400:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                return
+            self.latencies.setdefault(endpoint, []).append(ms)
+            if db_ms is not None:
+                self.db_ms.setdefault(endpoint, []).append(db_ms)
+
+
+def client(base, endpoints, weights, headers, deadline, record_after, results, seed):
+    rng = random.Random(seed)
+    parts = urlsplit(base)
+    conn_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_class(parts.hostname, parts.port, timeout=60)
+    while time.monotonic() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        start = time.perf_counter()
+        status, db_ms = None, None
+        try:
+            conn.request("GET", endpoint, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            timing = _DB_TIMING.search(response.getheader("Server-Timing") or "")
+            db_ms = float(timing.group(1)) if timing else None
+        except (OSError, http.client.HTTPException):
+            conn.close()
+        if time.monotonic() >= record_after:
+            results.add(endpoint, (time.perf_counter() - start) * 1000, status, db_ms)
+    conn.close()
+
+
+def summarize(results, endpoints, duration):
+    summary = {}
+    for endpoint in endpoints:
+        values = sorted(results.latencies.get(endpoint, []))
+        db_values = sorted(results.db_ms.get(endpoint, []))
+        errors = results.errors.get(endpoint, 0)
+        requests = len(values) + errors
+        summary[endpoint] = {
+            "requests": requests,
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "db_p50_ms": round(percentile(db_values, 50), 2),
+            "db_p95_ms": round(percentile(db_values, 95), 2),
+            "statuses": {str(k): v for k, v in sorted(results.statuses.get(endpoint, {}).items(),
+                                                       key=lambda kv: str(kv[0]))},
+        }
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    params = dict(DEFAULT_PARAMS)
+    for item in args.param or []:
+        name, _, value = item.partition("=")
+        params[name] = value
+
+    if args.endpoint:
+        endpoints, skipped = args.endpoint, []
+    else:
+        endpoints, skipped = discover(params)
+    if args.include:
+        endpoints = [e for e in endpoints if re.search(args.include, e)]
+    if args.exclude:
+        endpoints = [e for e in endpoints if not re.search(args.exclude, e)]
+    if not endpoints:
+        sys.exit("No endpoints to test")
+
+    mix = {}
+    for item in args.mix or []:
+        path, _, weight = item.rpartition("=")
+        mix[path] = float(weight)
+    weights = [mix.get(e, 1.0) for e in endpoints]
+
+    headers = {"Accept-Encoding": "gzip"}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+
+    results = Results()
+    record_after = time.monotonic() + args.warmup
+    deadline = record_after + args.duration
+    client_args = [(args.url, endpoints, weights, headers, deadline, record_after, results, args.seed + n)
+                   for n in range(args.clients)]
+    if gevent is not None:
+        gevent.joinall([gevent.spawn(client, *a) for a in client_args])
+    else:
+        threads = [threading.Thread(target=client, args=a, daemon=True) for a in client_args]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    summary = summarize(results, endpoints, args.duration)
+    total_ok = sum(len(v) for v in results.latencies.values())
+    total_errors = sum(results.errors.values())
+    document = {
+        "meta": {
+            "url": args.url,
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mode": "greenlets" if gevent is not None else "threads",
+            "seed": args.seed,
+            "commit": _git_commit(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "skipped": skipped,
+        },
+        "totals": {
+            "rps": round(total_ok / args.duration, 2),
+            "requests": total_ok + total_errors,
+            "error_rate": round(total_errors / (total_ok + total_errors), 4) if total_ok + total_errors else 0.0,
+        },
+        "endpoints": summary,
+    }
+
+    meta = document["meta"]
+    print(f"{meta['clients']} clients ({meta['mode']}), {args.duration:.0f}s after {args.warmup:.0f}s warm-up, "
+          f"{len(endpoints)} endpoints, {args.url}")
+    print(f"  {'endpoint':52s} {'req/s':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'db p95':>8s} {'err%':>6s}")
+    for endpoint, s in summary.items():
+        print(f"  {endpoint[:52]:52s} {s['rps']:8.1f} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f} "
+              f"{s['db_p95_ms']:8.1f} {s['error_rate'] * 100:6.2f}")
+    print(f"  {'total':52s} {document['totals']['rps']:8.1f}")
+    for line in skipped:
+        print(f"  skipped {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.fail_on_errors and total_errors:
+        sys.exit(1)
+
+
+# ---------- compare ----------
+# metric -> True when higher is worse
+COMPARED = {"p95_ms": True, "p99_ms": True, "db_p95_ms": True, "rps": False, "error_rate": True}
+# Below these absolute values a relative change is noise
+FLOORS = {"p95_ms": 1.0, "p99_ms": 1.0, "db_p95_ms": 1.0, "rps": 1.0, "error_rate": 0.001}
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    regressions = []
+    print(f"{args.base} ({base['meta'].get('commit')}) -> {args.new} ({new['meta'].get('commit')}), "
+          f"threshold {args.threshold:.0f}%")
+    for endpoint, after in new["endpoints"].items():
+        before = base["endpoints"].get(endpoint)
+        if before is None:
+            print(f"  {endpoint}: new endpoint")
+            continue
+        changes = []
+        for metric, higher_is_worse in COMPARED.items():
+            old, cur = before.get(metric, 0.0), after.get(metric, 0.0)
+            if max(old, cur) < FLOORS[metric]:
+                continue
+            delta = (cur - old) / old * 100 if old else float("inf")
+            worse = delta > args.threshold if higher_is_worse else delta < -args.threshold
+            if worse:
+                changes.append(f"{metric} {old:g} -> {cur:g} ({delta:+.1f}%)")
+        if changes:
+            regressions.append(endpoint)
+            print(f"  REGRESSION {endpoint}: " + "; ".join(changes))
+    for endpoint in base["endpoints"]:
+        if endpoint not in new["endpoints"]:
+            print(f"  {endpoint}: missing from {args.new}")
+
+    if regressions:
+        print(f"{len(regressions)} endpoint(s) regressed")
+        sys.exit(1)
+    print("No regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("run", help="drive the API and report per-endpoint latency")
+    p.add_argument("--url", default=os.getenv("API_URL", "http://localhost:5000"))
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--duration", type=float, default=30)
+    p.add_argument("--warmup", type=float, default=5, help="seconds excluded from the results")
+    p.add_argument("--endpoint", action="append", help="path to hit instead of discovered routes (repeatable)")
+    p.add_argument("--include", help="regex: only test matching paths")
+    p.add_argument("--exclude", help="regex: skip matching paths")
+    p.add_argument("--mix", action="append", help="PATH=WEIGHT (default weight 1, repeatable)")
+    p.add_argument("--param", action="append", help="NAME=VALUE for URL parameters (repeatable)")
+    p.add_argument("--token", default=os.getenv("API_TOKEN"), help="bearer token")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--output", help="write JSON results here")
+    p.add_argument("--fail-on-errors", action="store_true", help="exit 1 if any request failed")
+    p.set_defaults(func=run)
+
+    p = commands.add_parser("compare", help="flag regressions between two result files")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=10, help="percent change that counts as a regression")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,34 @@
+import itertools
+import math
 import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
 from dotenv import load_dotenv
-from psycopg2.pool import SimpleConnectionPool
-from psycopg2.extras import RealDictCursor
+from flask import g, has_request_context, request
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_batch as _execute_batch, execute_values as _execute_values
+from pool import ConnectionPool
+import querystats
 
 load_dotenv()
 
-pool = SimpleConnectionPool(
-    minconn=1,
-    maxconn=10,
+POOL_SETTINGS = dict(
+    minconn=int(os.getenv("DB_POOL_MIN", 1)),
+    maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    max_lifetime=float(os.getenv("DB_CONN_MAX_LIFETIME", 3600)),
+    max_idle=float(os.getenv("DB_CONN_MAX_IDLE", 600)),
+    statement_timeout_ms=os.getenv("DB_STATEMENT_TIMEOUT_MS"),
+    application_name=os.getenv("DB_APPLICATION_NAME", "asset-tracking-api"),
+)
+
+# Lazy: nothing connects until the first query, so importing this module
+# (and forking workers) never waits on the database
+pool = ConnectionPool(
+    **POOL_SETTINGS,
     host=os.getenv("DB_HOST"),
     port=os.getenv("DB_PORT"),
     database=os.getenv("DB_NAME"),
@@ -15,60 +36,479 @@ pool = SimpleConnectionPool(
     password=os.getenv("DB_PASSWORD")
 )
 
+# ---------- READ / WRITE ROUTING ----------
+# Read replicas: libpq connection strings separated by ";", e.g.
+# DB_REPLICA_DSNS="host=10.0.0.2 port=5432 dbname=assets user=app password=x"
+REPLICA_DSNS = [d.strip() for d in os.getenv("DB_REPLICA_DSNS", "").split(";") if d.strip()]
+# Replicas further behind than this (seconds) are skipped for reads
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", 5))
+# How long an unreachable replica is taken out of rotation
+REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+# After a write, that client's reads go to the primary for this long so a
+# re-fetch right after its own mutation sees it. The deadline travels in a
+# cookie, so one client's writes never pull anyone else off the replicas.
+READ_AFTER_WRITE_SECONDS = float(os.getenv("DB_READ_AFTER_WRITE_SECONDS", 2))
+READ_AFTER_WRITE_COOKIE = "db_primary_until"
+
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class Target:
+    """A database server reads or writes can be routed to, with its own pool and counters"""
+
+    def __init__(self, name, pool, replica=False):
+        self.name = name
+        self.pool = pool
+        self.replica = replica
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        self.counts = {"reads": 0, "writes": 0, "fallbacks": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._checking = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def mark_down(self):
+        self.count("errors")
+        self.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    def healthy(self):
+        """Reachable and within REPLICA_MAX_LAG; lag is re-measured at most every few seconds"""
+        now = time.monotonic()
+        if now < self.down_until:
+            return False
+        if now - self.checked_at > REPLICA_LAG_CHECK_SECONDS and self._checking.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                conn = self.pool.getconn(timeout=1)
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(REPLICA_LAG_SQL)
+                        self.lag = float(cur.fetchone()[0])
+                finally:
+                    self.pool.putconn(conn)
+            except Exception:
+                self.mark_down()
+                return False
+            finally:
+                self._checking.release()
+        return self.lag <= REPLICA_MAX_LAG
+
+    def stats(self):
+        with self._lock:
+            data = {"name": self.name, "role": "replica" if self.replica else "primary", **self.counts}
+        if self.replica:
+            data["lag_seconds"] = round(self.lag, 3)
+            data["available"] = time.monotonic() >= self.down_until and self.lag <= REPLICA_MAX_LAG
+        data["pool"] = self.pool.stats()
+        return data
+
+
+primary = Target("primary", pool)
+replicas = [
+    Target(f"replica{i}", ConnectionPool(**POOL_SETTINGS, dsn=dsn), replica=True)
+    for i, dsn in enumerate(REPLICA_DSNS, 1)
+]
+_next_replica = itertools.count()
+
+
+def use_primary():
+    """Route the remaining reads of the current request to the primary"""
+    if has_request_context():
+        g.db_read_primary = True
+
+
+def _mark_write():
+    if has_request_context():
+        g.db_read_primary = True
+        g.db_wrote = True
+
+
+def _read_your_writes():
+    """True while the client's read-after-write cookie has not expired"""
+    try:
+        return time.time() < float(request.cookies.get(READ_AFTER_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+
+
+def _read_target():
+    if not replicas:
+        return primary
+    if has_request_context() and (
+        g.get("db_read_primary")
+        or request.headers.get("X-DB-Primary") == "1"
+        or _read_your_writes()
+    ):
+        return primary
+    start = next(_next_replica)
+    for i in range(len(replicas)):
+        target = replicas[(start + i) % len(replicas)]
+        if target.healthy():
+            return target
+    primary.count("fallbacks")
+    return primary
+
+
+def _checkout_read():
+    """(target, conn) for a read: a healthy replica when configured, else the primary"""
+    target = _read_target()
+    try:
+        conn = target.pool.getconn()
+    except psycopg2.OperationalError:
+        if target is primary:
+            raise
+        target.mark_down()
+        primary.count("fallbacks")
+        target = primary
+        conn = target.pool.getconn()
+    target.count("reads")
+    return target, conn
+
+
+def _checkout_write():
+    primary.count("writes")
+    _mark_write()
+    return primary, pool.getconn()
+
+
+def _remember_write(response):
+    if replicas and g.get("db_wrote") and READ_AFTER_WRITE_SECONDS > 0:
+        response.set_cookie(
+            READ_AFTER_WRITE_COOKIE, f"{time.time() + READ_AFTER_WRITE_SECONDS:.3f}",
+            max_age=math.ceil(READ_AFTER_WRITE_SECONDS), httponly=True, samesite="Lax",
+        )
+    return response
+
+
+def init_app(app):
+    """Send a client that wrote back to the primary for its next reads (see READ_AFTER_WRITE_SECONDS)"""
+    app.after_request(_remember_write)
+
+
+def ping(timeout=None):
+    """One round trip to the primary, then warm its pool to minconn; raises when unreachable"""
+    conn = pool.getconn(timeout)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+    except psycopg2.Error:
+        pool.putconn(conn, close=True)
+        raise
+    pool.putconn(conn)
+    pool.prefill()
+
+
+def close():
+    """Close every pool (shutdown); in-use connections are closed as they are returned"""
+    for target in [primary] + replicas:
+        target.pool.closeall()
+
+
+def stats():
+    """Pool and routing metrics for every target"""
+    return {
+        "primary": primary.stats(),
+        "replicas": [r.stats() for r in replicas],
+    }
+
+# Unique names for server-side cursors
+_cursor_ids = itertools.count()
+
+def _execute(cur, query, params, in_transaction=False):
+    """
+    cur.execute() with timing recorded against the query fingerprint and
+    endpoint. Statements inside db.transaction() are never re-run under
+    EXPLAIN: it would repeat their locks on the caller's transaction.
+    """
+    started = time.perf_counter()
+    cur.execute(query, params)
+    querystats.record(query, params, time.perf_counter() - started, cur.rowcount,
+                      None if in_transaction else cur.connection)
+
+
+def _commit(conn):
+    conn.commit()
+    querystats.record_commit()
+
+
 # ---------- READ (SELECT) ----------
 def fetch_all(query, params=None):
-    conn = pool.getconn()
+    target, conn = _checkout_read()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, params)
+            _execute(cur, query, params)
             return cur.fetchall()
     finally:
-        pool.putconn(conn)
+        target.pool.putconn(conn)
 
 
 # ---------- READ ONE ----------
 def fetch_one(query, params=None):
-    conn = pool.getconn()
+    target, conn = _checkout_read()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, params)
+            _execute(cur, query, params)
             return cur.fetchone()
     finally:
-        pool.putconn(conn)
+        target.pool.putconn(conn)
 
 
 # ---------- WRITE (INSERT / UPDATE / DELETE) ----------
 def execute(query, params=None):
-    conn = pool.getconn()
+    target, conn = _checkout_write()
     try:
         with conn.cursor() as cur:
-            cur.execute(query, params)
-            conn.commit()
+            _execute(cur, query, params)
+            _commit(conn)
     finally:
-        pool.putconn(conn)
+        target.pool.putconn(conn)
 
 
 # ---------- WRITE WITH RETURN (INSERT RETURNING) ----------
 def execute_returning(query, params=None):
     """Execute query and return the result (useful for INSERT ... RETURNING)"""
-    conn = pool.getconn()
+    target, conn = _checkout_write()
     try:
         with conn.cursor() as cur:
-            cur.execute(query, params)
+            _execute(cur, query, params)
             result = cur.fetchone()
-            conn.commit()
+            _commit(conn)
             return result[0] if result else None
     finally:
-        pool.putconn(conn)
+        target.pool.putconn(conn)
 
 def execute_returning_dict(query, params=None):
     """Execute query and return the result as a dictionary (useful for INSERT ... RETURNING *)"""
-    conn = pool.getconn()
+    target, conn = _checkout_write()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, params)
+            _execute(cur, query, params)
+            result = cur.fetchone()
+            _commit(conn)
+            return result
+    finally:
+        target.pool.putconn(conn)
+
+
+# ---------- UNIT OF WORK (one connection, one commit) ----------
+class Transaction:
+    """Statements issued inside db.transaction(); all share one connection and commit once"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Set to True to roll back instead of committing on a clean exit (dry runs)
+        self.rollback_only = False
+        self._savepoint_ids = itertools.count(1)
+
+    def cursor(self, dict_rows=False):
+        """Raw cursor on the transaction's connection (e.g. for copy_expert)"""
+        return self.conn.cursor(cursor_factory=RealDictCursor if dict_rows else None)
+
+    def fetch_all(self, query, params=None):
+        with self.cursor(dict_rows=True) as cur:
+            _execute(cur, query, params, in_transaction=True)
+            return cur.fetchall()
+
+    def fetch_one(self, query, params=None):
+        with self.cursor(dict_rows=True) as cur:
+            _execute(cur, query, params, in_transaction=True)
+            return cur.fetchone()
+
+    def execute(self, query, params=None):
+        """Run a statement and return the number of affected rows"""
+        with self.cursor() as cur:
+            _execute(cur, query, params, in_transaction=True)
+            return cur.rowcount
+
+    def execute_returning(self, query, params=None):
+        with self.cursor() as cur:
+            _execute(cur, query, params, in_transaction=True)
             result = cur.fetchone()
-            conn.commit()
+            return result[0] if result else None
+
+    def execute_returning_dict(self, query, params=None):
+        with self.cursor(dict_rows=True) as cur:
+            _execute(cur, query, params, in_transaction=True)
+            return cur.fetchone()
+
+    def execute_batch(self, query, params_seq, page_size=100):
+        """Run query for every params tuple, page_size statements per round trip"""
+        params_seq = list(params_seq)
+        with self.cursor() as cur:
+            started = time.perf_counter()
+            _execute_batch(cur, query, params_seq, page_size=page_size)
+            querystats.record(query, None, time.perf_counter() - started, len(params_seq))
+
+    def execute_values(self, query, argslist, template=None, page_size=100, fetch=False):
+        """INSERT ... VALUES %s with many rows per statement; fetch=True returns RETURNING rows"""
+        argslist = list(argslist)
+        with self.cursor(dict_rows=fetch) as cur:
+            started = time.perf_counter()
+            result = _execute_values(cur, query, argslist, template=template,
+                                     page_size=page_size, fetch=fetch)
+            querystats.record(query, None, time.perf_counter() - started, len(argslist))
             return result
+
+    @contextmanager
+    def savepoint(self):
+        """Roll back only this block if it raises; the exception still propagates"""
+        name = f"sp_{next(self._savepoint_ids)}"
+        with self.conn.cursor() as cur:
+            cur.execute(f"SAVEPOINT {name}")
+        try:
+            yield self
+        except Exception:
+            with self.conn.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        with self.conn.cursor() as cur:
+            cur.execute(f"RELEASE SAVEPOINT {name}")
+
+
+@contextmanager
+def transaction():
+    """
+    Run several statements on one primary connection and commit once.
+
+        with transaction() as tx:
+            asset_id = tx.execute_returning("INSERT ... RETURNING asset_id", (...))
+            tx.execute("INSERT INTO asset_department_mapping ...", (asset_id, dept))
+
+    Any exception rolls the whole block back.
+    """
+    target, conn = _checkout_write()
+    try:
+        tx = Transaction(conn)
+        yield tx
+        if tx.rollback_only:
+            conn.rollback()
+        else:
+            _commit(conn)
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        target.pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def autocommit():
+    """
+    A primary cursor outside any transaction, for statements that refuse to
+    run in one (CREATE INDEX CONCURRENTLY, VACUUM). No statement timeout; the
+    connection is closed afterwards rather than returned to the pool.
+    """
+    target, conn = _checkout_write()
+    try:
+        conn.autocommit = True
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SET statement_timeout = 0")
+            yield cur
+    finally:
+        target.pool.putconn(conn, close=True)
+
+
+# ---------- STREAMING READ (server-side cursor) ----------
+ROW_FORMATS = ("dict", "tuple", "numpy")
+
+
+def _structured_array(rows, description, dtype=None):
+    """Convert a batch of tuples into a NumPy structured array"""
+    import numpy as np  # optional dependency, only needed for row_format="numpy"
+
+    if dtype is None:
+        fields = []
+        for i, col in enumerate(description):
+            sample = next((r[i] for r in rows if r[i] is not None), None)
+            if isinstance(sample, bool):
+                kind = "?"
+            elif isinstance(sample, int):
+                kind = "i8"
+            elif isinstance(sample, (float, Decimal)):
+                kind = "f8"
+            elif isinstance(sample, datetime):
+                kind = "M8[us]"
+            else:
+                kind = "O"
+            fields.append((col.name, kind))
+        dtype = np.dtype(fields)
+    return np.array([tuple(r) for r in rows], dtype=dtype)
+
+
+def _batches(query, params, itersize, row_format, dtype=None):
+    """Generator behind iter_batches; first yields the cursor description, once the first batch is fetched"""
+    factory = RealDictCursor if row_format == "dict" else None
+    target, conn = _checkout_read()
+    try:
+        with conn.cursor(name=f"stream_{next(_cursor_ids)}", cursor_factory=factory) as cur:
+            cur.itersize = itersize
+            started = time.perf_counter()
+            total = 0
+            cur.execute(query, params)
+            rows = cur.fetchmany(itersize)
+            yield cur.description
+            while rows:
+                total += len(rows)
+                if row_format == "numpy":
+                    rows = _structured_array(rows, cur.description, dtype)
+                yield rows
+                rows = cur.fetchmany(itersize)
+            # Time to drain the cursor, including time spent in the consumer
+            querystats.record(query, params, time.perf_counter() - started, total)
     finally:
-        pool.putconn(conn)
\ No newline at end of file
+        if not conn.closed:
+            conn.rollback()
+        target.pool.putconn(conn, close=bool(conn.closed))
+
+
+def iter_batches(query, params=None, itersize=2000, row_format="dict", dtype=None):
+    """
+    Yield lists of rows (or structured arrays) from a named server-side cursor.
+
+    Only itersize rows are held in memory at a time. row_format is "dict"
+    (RealDictRow), "tuple" or "numpy"; dtype optionally fixes the NumPy dtype.
+    The connection goes back to the pool when the consumer finishes, breaks
+    out early or the generator is garbage collected.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+    batches = _batches(query, params, itersize, row_format, dtype)
+    next(batches)
+    yield from batches
+
+
+def iter_rows(query, params=None, itersize=2000, row_format="dict"):
+    """Yield rows one by one from a named server-side cursor (see iter_batches)"""
+    if row_format == "numpy":
+        raise ValueError("row_format='numpy' is only supported by iter_batches")
+    for batch in iter_batches(query, params, itersize, row_format):
+        yield from batch
+
+
+def open_rows(query, params=None, itersize=2000):
+    """
+    (column names, row iterator) for a streamed response. Unlike iter_rows
+    the query runs and its first batch is fetched before this returns, so
+    SQL errors raise here instead of part-way through the response body;
+    the columns are known even when no row comes back.
+    """
+    batches = _batches(query, params, itersize, "dict")
+    description = next(batches)
+
+    def rows():
+        for batch in batches:
+            yield from batch
+    return [col.name for col in description], rows()
@@ -0,0 +1,68 @@
+import csv
+import io
+import zlib
+
+from json_provider import dumps
+
+# Rows buffered before a chunk is handed to the WSGI server
+CHUNK_ROWS = 500
+
+
+def _csv_chunks(rows, columns=None):
+    buf = io.StringIO()
+    writer = None
+    if columns is not None:
+        # Header even when no row follows
+        writer = csv.DictWriter(buf, fieldnames=columns)
+        writer.writeheader()
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buf, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _ndjson_chunks(rows, columns=None):
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) == CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    "csv": ("text/csv", _csv_chunks),
+    "ndjson": ("application/x-ndjson", _ndjson_chunks),
+}
+
+
+def stream(rows, fmt, gzip=False, columns=None):
+    """
+    Return (mimetype, byte-chunk generator) encoding rows in the given
+    format. columns, when known, gives CSV its header up front.
+    """
+    mimetype, encoder = FORMATS[fmt]
+    chunks = encoder(rows, columns)
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+    return mimetype, chunks
@@ -0,0 +1,341 @@
+import csv
+import io
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import asset_search
+import db
+from versions import bump
+
+# Per-row errors returned to the caller; the total is always reported
+MAX_REPORTED_ERRORS = 1000
+
+ASSET_COLUMNS = (
+    "line", "asset_code", "asset_name", "manufacturer", "model", "purchase_cost",
+    "purchase_date", "category_id", "asset_type", "department_id", "rfid_uid",
+)
+LOCATION_COLUMNS = ("line", "asset_code", "room_id", "floor_id", "building_id")
+
+STAGING_DDL = """
+CREATE TEMP TABLE stage_assets (
+    line INTEGER,
+    asset_code TEXT,
+    asset_name TEXT,
+    manufacturer TEXT,
+    model TEXT,
+    purchase_cost NUMERIC,
+    purchase_date DATE,
+    category_id INTEGER,
+    asset_type TEXT,
+    department_id INTEGER,
+    rfid_uid TEXT
+) ON COMMIT DROP;
+CREATE TEMP TABLE stage_locations (
+    line INTEGER,
+    asset_code TEXT,
+    room_id INTEGER,
+    floor_id INTEGER,
+    building_id INTEGER
+) ON COMMIT DROP;
+"""
+
+# Rows whose asset_code or rfid_uid already exists are reported and dropped
+CONFLICTS_SQL = """
+SELECT s.line, 'asset_code' AS field, 'asset_code already exists' AS message
+FROM stage_assets s
+WHERE EXISTS (SELECT 1 FROM assets a WHERE a.asset_code = s.asset_code)
+UNION ALL
+SELECT s.line, 'rfid_uid', 'rfid_uid already assigned to another asset'
+FROM stage_assets s
+WHERE s.rfid_uid IS NOT NULL
+  AND EXISTS (SELECT 1 FROM asset_tags t WHERE t.rfid_uid = s.rfid_uid)
+ORDER BY line
+"""
+
+MERGE_SQL = """
+DELETE FROM stage_assets WHERE line = ANY(%s);
+
+CREATE TEMP TABLE stage_ids (asset_id INTEGER, asset_code TEXT) ON COMMIT DROP;
+
+WITH inserted AS (
+    INSERT INTO assets (asset_code, asset_name, manufacturer, model, purchase_cost,
+                        purchase_date, category_id, asset_type)
+    SELECT asset_code, asset_name, manufacturer, model, purchase_cost,
+           purchase_date, category_id, asset_type
+    FROM stage_assets
+    ORDER BY line
+    RETURNING asset_id, asset_code
+)
+INSERT INTO stage_ids SELECT asset_id, asset_code FROM inserted;
+
+INSERT INTO asset_tags (asset_id, rfid_uid)
+SELECT i.asset_id, s.rfid_uid
+FROM stage_ids i
+JOIN stage_assets s ON s.asset_code = i.asset_code
+WHERE s.rfid_uid IS NOT NULL;
+
+INSERT INTO asset_department_mapping (asset_id, department_id)
+SELECT i.asset_id, s.department_id
+FROM stage_ids i
+JOIN stage_assets s ON s.asset_code = i.asset_code
+WHERE s.department_id IS NOT NULL;
+
+INSERT INTO asset_allowed_locations (asset_id, room_id, floor_id, building_id)
+SELECT i.asset_id, l.room_id, l.floor_id, l.building_id
+FROM stage_locations l
+JOIN stage_ids i ON i.asset_code = l.asset_code;
+"""
+
+COUNTS_SQL = """
+SELECT
+    COUNT(*) AS assets,
+    COUNT(s.rfid_uid) AS tags,
+    COUNT(s.department_id) AS department_mappings,
+    (SELECT COUNT(*) FROM stage_locations l JOIN stage_ids i ON i.asset_code = l.asset_code) AS allowed_locations
+FROM stage_ids i
+JOIN stage_assets s ON s.asset_code = i.asset_code
+"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.errors = []
+        self.error_count = 0
+        self.error_lines = set()
+
+    def error(self, line, field, message):
+        self.error_count += 1
+        self.error_lines.add(line)
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "field": field, "message": message})
+
+
+# ---------- parsing ----------
+def read_rows(stream, fmt):
+    """Yield (line_number, dict) from a CSV or NDJSON byte stream without buffering it"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {"__error__": f"invalid JSON: {e}"}
+                continue
+            yield line_number, row if isinstance(row, dict) else {"__error__": "expected a JSON object"}
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _text(value):
+    return None if _blank(value) else str(value).strip()
+
+
+def _int(value):
+    return None if _blank(value) else int(str(value).strip())
+
+
+def _id_list(value):
+    """Accept [1, 2], "1;2" or "1" for allowed-location columns"""
+    if _blank(value):
+        return []
+    if isinstance(value, (list, tuple)):
+        return [int(v) for v in value]
+    return [int(v) for v in str(value).replace(",", ";").split(";") if v.strip()]
+
+
+class _Lookups:
+    """Reference data loaded once per import for validation"""
+
+    def __init__(self):
+        departments = db.fetch_all("SELECT department_id, name FROM departments")
+        self.departments = {r["department_id"] for r in departments}
+        self.department_names = {r["name"].lower(): r["department_id"] for r in departments}
+        categories = db.fetch_all("SELECT category_id, name FROM asset_categories")
+        self.categories = {r["category_id"] for r in categories}
+        self.category_names = {r["name"].lower(): r["category_id"] for r in categories}
+        self.rooms = {r["room_id"] for r in db.fetch_all("SELECT room_id FROM rooms")}
+        self.floors = {r["floor_id"] for r in db.fetch_all("SELECT floor_id FROM floors")}
+        self.buildings = {r["building_id"] for r in db.fetch_all("SELECT building_id FROM buildings")}
+
+
+def _validate(line, raw, lookups, seen_codes, seen_uids, result):
+    """Return (asset_row, location_rows) or None when the row has errors"""
+    if "__error__" in raw:
+        result.error(line, None, raw["__error__"])
+        return None
+
+    ok = True
+
+    def fail(field, message):
+        nonlocal ok
+        ok = False
+        result.error(line, field, message)
+
+    code = _text(raw.get("asset_code"))
+    name = _text(raw.get("asset_name"))
+    if not code:
+        fail("asset_code", "asset_code is required")
+    elif code in seen_codes:
+        fail("asset_code", f"duplicate asset_code in file (first on line {seen_codes[code]})")
+    if not name:
+        fail("asset_name", "asset_name is required")
+
+    cost = None
+    if not _blank(raw.get("purchase_cost")):
+        try:
+            cost = Decimal(str(raw["purchase_cost"]).strip())
+            if cost < 0:
+                fail("purchase_cost", "purchase_cost must not be negative")
+        except InvalidOperation:
+            fail("purchase_cost", "purchase_cost must be a number")
+
+    purchase_date = None
+    if not _blank(raw.get("purchase_date")):
+        try:
+            purchase_date = date.fromisoformat(str(raw["purchase_date"]).strip()[:10])
+        except ValueError:
+            fail("purchase_date", "purchase_date must be YYYY-MM-DD")
+
+    category_id = None
+    try:
+        category_id = _int(raw.get("category_id"))
+    except ValueError:
+        fail("category_id", "category_id must be an integer")
+    if category_id is None and not _blank(raw.get("category")):
+        category_id = lookups.category_names.get(str(raw["category"]).strip().lower())
+        if category_id is None:
+            fail("category", f"unknown category '{raw['category']}'")
+    elif category_id is not None and category_id not in lookups.categories:
+        fail("category_id", f"unknown category_id {category_id}")
+
+    department_id = None
+    try:
+        department_id = _int(raw.get("department_id"))
+    except ValueError:
+        fail("department_id", "department_id must be an integer")
+    if department_id is None and not _blank(raw.get("department")):
+        department_id = lookups.department_names.get(str(raw["department"]).strip().lower())
+        if department_id is None:
+            fail("department", f"unknown department '{raw['department']}'")
+    elif department_id is not None and department_id not in lookups.departments:
+        fail("department_id", f"unknown department_id {department_id}")
+
+    uid = _text(raw.get("rfid_uid"))
+    if uid and uid in seen_uids:
+        fail("rfid_uid", f"duplicate rfid_uid in file (first on line {seen_uids[uid]})")
+
+    locations = []
+    for field, column, known in (
+        ("allowed_room_ids", "room_id", lookups.rooms),
+        ("allowed_floor_ids", "floor_id", lookups.floors),
+        ("allowed_building_ids", "building_id", lookups.buildings),
+    ):
+        try:
+            ids = _id_list(raw.get(field))
+        except ValueError:
+            fail(field, f"{field} must be integers separated by ';'")
+            continue
+        for location_id in ids:
+            if location_id not in known:
+                fail(field, f"unknown {column} {location_id}")
+            locations.append({column: location_id})
+
+    if not ok:
+        return None
+
+    seen_codes[code] = line
+    if uid:
+        seen_uids[uid] = line
+
+    asset = (line, code, name, _text(raw.get("manufacturer")), _text(raw.get("model")), cost,
+             purchase_date, category_id, _text(raw.get("asset_type")), department_id, uid)
+    location_rows = [
+        (line, code, loc.get("room_id"), loc.get("floor_id"), loc.get("building_id"))
+        for loc in locations
+    ]
+    return asset, location_rows
+
+
+# ---------- import ----------
+def import_assets(stream, fmt, dry_run=False):
+    """
+    Validate and bulk-load assets with their tags, department mappings and
+    allowed locations.
+
+    One streaming pass validates every row and writes the good ones to COPY
+    buffers; COPY fills temp staging tables and a single transaction merges
+    them. Rows conflicting with existing asset codes or RFID tags are reported
+    per line and skipped.
+    """
+    started = time.perf_counter()
+    result = ImportResult()
+    lookups = _Lookups()
+    seen_codes, seen_uids = {}, {}
+
+    assets_buf, locations_buf = io.StringIO(), io.StringIO()
+    assets_csv, locations_csv = csv.writer(assets_buf), csv.writer(locations_buf)
+
+    for line, raw in read_rows(stream, fmt):
+        result.rows += 1
+        validated = _validate(line, raw, lookups, seen_codes, seen_uids, result)
+        if validated is None:
+            continue
+        asset, location_rows = validated
+        assets_csv.writerow(asset)
+        locations_csv.writerows(location_rows)
+    validated_at = time.perf_counter()
+
+    counts = {"assets": 0, "tags": 0, "department_mappings": 0, "allowed_locations": 0}
+    valid = result.rows - len(result.error_lines)
+    if valid:
+        assets_buf.seek(0)
+        locations_buf.seek(0)
+        with db.transaction() as tx:
+            tx.rollback_only = dry_run
+            with tx.cursor() as cur:
+                cur.execute(STAGING_DDL)
+                cur.copy_expert(
+                    f"COPY stage_assets ({', '.join(ASSET_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    assets_buf,
+                )
+                cur.copy_expert(
+                    f"COPY stage_locations ({', '.join(LOCATION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    locations_buf,
+                )
+            conflicts = tx.fetch_all(CONFLICTS_SQL)
+            for row in conflicts:
+                result.error(row["line"], row["field"], row["message"])
+            tx.execute(MERGE_SQL, ([row["line"] for row in conflicts],))
+            counts = dict(tx.fetch_one(COUNTS_SQL))
+            asset_search.refresh_where(tx, "a.asset_id IN (SELECT asset_id FROM stage_ids)")
+            if counts["assets"] and not dry_run:
+                bump("assets", tx=tx)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "success": True,
+        "dry_run": dry_run,
+        "rows": result.rows,
+        "imported": counts,
+        "error_count": result.error_count,
+        "rejected_rows": len(result.error_lines),
+        "errors": result.errors,
+        "timing": {
+            "validate_ms": round((validated_at - started) * 1000, 1),
+            "load_ms": round((elapsed - (validated_at - started)) * 1000, 1),
+            "total_ms": round(elapsed * 1000, 1),
+            "rows_per_second": round(result.rows / elapsed, 1) if elapsed else None,
+        },
+    }
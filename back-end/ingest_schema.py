@@ -0,0 +1,32 @@
+"""
+Tables and settings shared with the MQTT ingest (missing_detector.py and
+reader_liveness.py at the repository root). The ingest is deployed on its
+own and creates these tables itself too, so its SCHEMA_SQL must stay the
+same as the DDL here; tests/test_ingest_schema.py compares them.
+"""
+import os
+from datetime import timedelta
+
+MISSING_THRESHOLDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS missing_asset_thresholds (
+    category_id INTEGER PRIMARY KEY REFERENCES asset_categories(category_id),
+    threshold_minutes INTEGER NOT NULL CHECK (threshold_minutes > 0)
+)
+"""
+
+READER_LIVENESS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reader_liveness (
+    reader_id INTEGER PRIMARY KEY REFERENCES room_rfid_readers(reader_id),
+    status TEXT NOT NULL,
+    status_since TIMESTAMP NOT NULL,
+    last_heartbeat TIMESTAMP,
+    wifi_quality INTEGER,
+    wifi_rssi INTEGER,
+    last_voltage NUMERIC,
+    offline_alert_id INTEGER
+)
+"""
+
+# Heartbeat age cut-offs, read from the same variables as reader_liveness.py
+READER_WARNING_AFTER = timedelta(seconds=int(os.getenv("READER_WARNING_SECONDS", 300)))
+READER_OFFLINE_AFTER = timedelta(seconds=int(os.getenv("READER_OFFLINE_SECONDS", 3600)))
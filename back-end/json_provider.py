@@ -0,0 +1,68 @@
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency, fall back to the stdlib encoder
+    orjson = None
+
+# Set JSON_ENCODER=stdlib to force the pure-Python path (e.g. for comparison)
+USE_ORJSON = orjson is not None and os.getenv("JSON_ENCODER", "orjson") == "orjson"
+
+
+def _default(obj):
+    """Encode the types psycopg2 hands back that JSON has no native form for"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if hasattr(obj, "tolist"):  # NumPy arrays / scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if USE_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(obj):
+    """Serialize obj to compact JSON text with the fastest available encoder"""
+    if USE_ORJSON:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+    return json.dumps(obj, default=_default, separators=(",", ":"))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes query results in one native pass.
+
+    Decimal, datetime and RealDictRow values are handled by the encoder itself
+    so routes can return fetch_all() output directly without fix-up loops.
+    """
+
+    default = staticmethod(_default)
+
+    if USE_ORJSON:
+        def dumps(self, obj, **kwargs):
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return dumps(obj)
+
+        def loads(self, s, **kwargs):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=_default, option=_OPTIONS)
+            return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,204 @@
+"""
+Maintained per (category, department, month) maintenance aggregates.
+
+Every write to asset_maintenance_records applies a signed delta here in the
+same transaction (-1 for the old version of a record, +1 for the new one),
+so the maintenance dashboards and cost reports read a few hundred rows
+instead of the whole history. rebuild() recomputes the table from scratch.
+
+Each record counts towards the month of its maintenance_start (records,
+pending, completed, completed_cost, completed_costed) and, once completed,
+towards the month of its maintenance_end (completed_in_month,
+completed_cost_in_month). completed_costed counts the completed records
+that have a cost, so averages skip unpriced work like AVG() does.
+maintenance_asset_totals keeps completed records per asset, since the
+number of distinct maintained assets cannot be summed from the monthly rows.
+Category and department are the asset's at the time of the write; 0 stands
+for none.
+
+    python maintenance_stats.py --rebuild
+"""
+import argparse
+
+from db import transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maintenance_aggregates (
+    category_id INTEGER NOT NULL,
+    department_id INTEGER NOT NULL,
+    month DATE NOT NULL,
+    records INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    completed_cost NUMERIC NOT NULL DEFAULT 0,
+    completed_in_month INTEGER NOT NULL DEFAULT 0,
+    completed_cost_in_month NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, department_id, month)
+);
+ALTER TABLE maintenance_aggregates
+    ADD COLUMN IF NOT EXISTS completed_costed INTEGER NOT NULL DEFAULT 0;
+CREATE TABLE IF NOT EXISTS maintenance_asset_totals (
+    category_id INTEGER NOT NULL,
+    asset_id INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, asset_id)
+);
+CREATE INDEX IF NOT EXISTS idx_maintenance_pending_start
+    ON asset_maintenance_records (maintenance_start)
+    WHERE maintenance_end IS NULL;
+"""
+
+RECORD_COLUMNS = "asset_id, maintenance_start, maintenance_end, maintenance_cost"
+
+# {source} yields (asset_id, s, e, cost); every statement adds sign * contribution
+AGGREGATE_SQL = """
+WITH r AS (
+    {source}
+),
+keyed AS (
+    SELECT
+        COALESCE(a.category_id, 0) AS category_id,
+        COALESCE(d.department_id, 0) AS department_id,
+        r.s, r.e, COALESCE(r.cost, 0) AS cost,
+        (r.e IS NOT NULL AND r.cost IS NOT NULL)::int AS completed_costed
+    FROM r
+    LEFT JOIN assets a ON a.asset_id = r.asset_id
+    LEFT JOIN LATERAL (
+        SELECT department_id
+        FROM asset_department_mapping
+        WHERE asset_id = r.asset_id
+        ORDER BY mapped_at DESC
+        LIMIT 1
+    ) d ON TRUE
+),
+contrib AS (
+    SELECT category_id, department_id, date_trunc('month', s)::date AS month,
+           1 AS records,
+           (e IS NULL)::int AS pending,
+           (e IS NOT NULL)::int AS completed,
+           CASE WHEN e IS NOT NULL THEN cost ELSE 0 END AS completed_cost,
+           completed_costed,
+           0 AS completed_in_month,
+           0 AS completed_cost_in_month
+    FROM keyed
+    WHERE s IS NOT NULL
+    UNION ALL
+    SELECT category_id, department_id, date_trunc('month', e)::date,
+           0, 0, 0, 0, 0, 1, cost
+    FROM keyed
+    WHERE e IS NOT NULL
+)
+INSERT INTO maintenance_aggregates AS m
+    (category_id, department_id, month, records, pending, completed,
+     completed_cost, completed_costed, completed_in_month, completed_cost_in_month)
+SELECT category_id, department_id, month,
+       %(sign)s * SUM(records), %(sign)s * SUM(pending), %(sign)s * SUM(completed),
+       %(sign)s * SUM(completed_cost), %(sign)s * SUM(completed_costed),
+       %(sign)s * SUM(completed_in_month), %(sign)s * SUM(completed_cost_in_month)
+FROM contrib
+GROUP BY category_id, department_id, month
+ON CONFLICT (category_id, department_id, month) DO UPDATE SET
+    records = m.records + EXCLUDED.records,
+    pending = m.pending + EXCLUDED.pending,
+    completed = m.completed + EXCLUDED.completed,
+    completed_cost = m.completed_cost + EXCLUDED.completed_cost,
+    completed_costed = m.completed_costed + EXCLUDED.completed_costed,
+    completed_in_month = m.completed_in_month + EXCLUDED.completed_in_month,
+    completed_cost_in_month = m.completed_cost_in_month + EXCLUDED.completed_cost_in_month
+"""
+
+# Same {source}; completed records per (category, asset)
+ASSET_TOTALS_SQL = """
+WITH r AS (
+    {source}
+)
+INSERT INTO maintenance_asset_totals AS m (category_id, asset_id, completed)
+SELECT COALESCE(a.category_id, 0), r.asset_id, %(sign)s * COUNT(*)
+FROM r
+LEFT JOIN assets a ON a.asset_id = r.asset_id
+WHERE r.e IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (category_id, asset_id) DO UPDATE SET
+    completed = m.completed + EXCLUDED.completed
+"""
+
+APPLY_SOURCE = """
+    SELECT * FROM unnest(%(asset_ids)s::int[], %(starts)s::timestamp[], %(ends)s::timestamp[], %(costs)s::numeric[])
+        AS r(asset_id, s, e, cost)
+"""
+APPLY_SQL = AGGREGATE_SQL.format(source=APPLY_SOURCE) + ";\n" + ASSET_TOTALS_SQL.format(source=APPLY_SOURCE)
+
+REBUILD_SOURCE = """
+    SELECT asset_id, maintenance_start AS s, maintenance_end AS e, maintenance_cost AS cost
+    FROM asset_maintenance_records
+"""
+REBUILD_SQL = (
+    "TRUNCATE maintenance_aggregates, maintenance_asset_totals;\n"
+    + AGGREGATE_SQL.format(source=REBUILD_SOURCE) + ";\n"
+    + ASSET_TOTALS_SQL.format(source=REBUILD_SOURCE)
+)
+
+_schema_ready = False
+
+
+def ensure_schema():
+    """Create the tables on first use and fill them from the existing history"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with transaction() as tx:
+        # The newest table: also missing on databases created before it was added
+        missing = tx.fetch_one("SELECT to_regclass('maintenance_asset_totals') IS NULL AS missing")["missing"]
+        tx.execute(SCHEMA)
+        if missing:
+            tx.execute(REBUILD_SQL, {"sign": 1})
+    _schema_ready = True
+
+
+def apply(tx, records, sign):
+    """
+    Add (+1) or remove (-1) maintenance records (dicts with RECORD_COLUMNS)
+    inside tx. Call ensure_schema() before opening tx: its DDL would wait on
+    the locks tx holds.
+    """
+    records = [r for r in records if r]
+    if not records:
+        return
+    tx.execute(APPLY_SQL, {
+        "sign": sign,
+        "asset_ids": [r["asset_id"] for r in records],
+        "starts": [r["maintenance_start"] for r in records],
+        "ends": [r["maintenance_end"] for r in records],
+        "costs": [r["maintenance_cost"] for r in records],
+    })
+
+
+def asset_records(tx, asset_id):
+    """An asset's maintenance records, locked, for re-keying when its department changes"""
+    return tx.fetch_all(f"""
+        SELECT {RECORD_COLUMNS}
+        FROM asset_maintenance_records
+        WHERE asset_id = %s
+        FOR UPDATE
+    """, (asset_id,))
+
+
+def rebuild():
+    """Recompute every aggregate from asset_maintenance_records"""
+    global _schema_ready
+    with transaction() as tx:
+        tx.execute(SCHEMA)
+        tx.execute(REBUILD_SQL, {"sign": 1})
+        rows = tx.fetch_one("SELECT COUNT(*) AS n FROM maintenance_aggregates")["n"]
+    _schema_ready = True
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute the aggregate table")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Rebuilt maintenance_aggregates: {rebuild()} rows")
+    else:
+        parser.print_help()
@@ -0,0 +1,421 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in order, and is recorded in schema_migrations.
+Version 1 is the base schema the API and the MQTT ingest assume, version 2
+the hot-path index pack (built CONCURRENTLY, so it is safe on a live
+database), version 3 the tables the API modules own (they still create
+them lazily, this just does it up front), version 4 the typeahead search
+table, whose fill and indexes are too heavy for the request path, version
+5 the shared state of background report jobs. Append new migrations to
+MIGRATIONS; never edit one that has shipped.
+
+An advisory lock keeps two deploys from migrating at once. A concurrent
+index build that failed half-way leaves an INVALID index behind; the next
+run drops and rebuilds it.
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # applied / pending
+    python migrations.py --check    # missing, invalid and unused indexes; exits 1 if any are missing
+"""
+import argparse
+import sys
+import time
+
+import ingest_schema
+from db import autocommit, transaction
+
+# Arbitrary key for pg_advisory_lock
+LOCK_KEY = 728341
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    duration_ms NUMERIC
+);
+"""
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buildings (
+    building_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS departments (
+    department_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS floors (
+    floor_id SERIAL PRIMARY KEY,
+    building_id INTEGER NOT NULL REFERENCES buildings(building_id),
+    floor_level INTEGER,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id SERIAL PRIMARY KEY,
+    floor_id INTEGER NOT NULL REFERENCES floors(floor_id),
+    room_name TEXT NOT NULL,
+    department_id INTEGER REFERENCES departments(department_id)
+);
+CREATE TABLE IF NOT EXISTS room_rfid_readers (
+    reader_id SERIAL PRIMARY KEY,
+    reader_code TEXT NOT NULL UNIQUE,
+    room_id INTEGER REFERENCES rooms(room_id)
+);
+CREATE TABLE IF NOT EXISTS asset_categories (
+    category_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor_id SERIAL PRIMARY KEY,
+    vendor_name TEXT NOT NULL,
+    contact_person TEXT,
+    phone TEXT,
+    email TEXT
+);
+CREATE TABLE IF NOT EXISTS roles (
+    role_id SERIAL PRIMARY KEY,
+    role_name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    department_id INTEGER REFERENCES departments(department_id),
+    password_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS user_roles (
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    role_id INTEGER NOT NULL REFERENCES roles(role_id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, role_id)
+);
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id SERIAL PRIMARY KEY,
+    asset_code TEXT NOT NULL UNIQUE,
+    asset_name TEXT NOT NULL,
+    manufacturer TEXT,
+    model TEXT,
+    purchase_cost NUMERIC(12, 2),
+    purchase_date DATE,
+    category_id INTEGER REFERENCES asset_categories(category_id),
+    asset_type TEXT
+);
+CREATE TABLE IF NOT EXISTS asset_tags (
+    tag_id SERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    rfid_uid TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS asset_department_mapping (
+    mapping_id SERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id),
+    department_id INTEGER NOT NULL REFERENCES departments(department_id),
+    mapped_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS asset_allowed_locations (
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    room_id INTEGER REFERENCES rooms(room_id),
+    floor_id INTEGER REFERENCES floors(floor_id),
+    building_id INTEGER REFERENCES buildings(building_id),
+    CHECK (num_nonnulls(room_id, floor_id, building_id) > 0)
+);
+CREATE TABLE IF NOT EXISTS asset_maintenance_records (
+    maintenance_id SERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    vendor_id INTEGER REFERENCES vendors(vendor_id),
+    maintenance_type TEXT,
+    description TEXT,
+    maintenance_start TIMESTAMP NOT NULL,
+    maintenance_end TIMESTAMP,
+    maintenance_cost NUMERIC(12, 2),
+    recorded_by INTEGER,
+    recorded_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+-- asset_id is NULL for Unknown Asset and Reader Offline alerts;
+-- acknowledged_by is 0 when the ingest auto-acknowledges
+CREATE TABLE IF NOT EXISTS alerts (
+    alert_id SERIAL PRIMARY KEY,
+    asset_id INTEGER REFERENCES assets(asset_id) ON DELETE CASCADE,
+    alert_type TEXT NOT NULL,
+    alert_message TEXT,
+    generated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    acknowledged_at TIMESTAMP,
+    acknowledged_by INTEGER
+);
+-- scan_time is naive local time (IST), as written by the ingest
+CREATE TABLE IF NOT EXISTS asset_room_scan_events (
+    scan_id BIGSERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    tag_id INTEGER REFERENCES asset_tags(tag_id) ON DELETE SET NULL,
+    reader_id INTEGER REFERENCES room_rfid_readers(reader_id),
+    room_id INTEGER NOT NULL REFERENCES rooms(room_id),
+    scan_time TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS asset_status (
+    status_id BIGSERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    status TEXT NOT NULL,
+    recorded_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS asset_utilization_log (
+    log_id BIGSERIAL PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets(asset_id) ON DELETE CASCADE,
+    event_type TEXT NOT NULL,
+    duration_minutes NUMERIC,
+    recorded_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS esp32_health_logs (
+    log_id BIGSERIAL PRIMARY KEY,
+    reader_id INTEGER NOT NULL REFERENCES room_rfid_readers(reader_id),
+    event_type TEXT NOT NULL,
+    recorded_at TIMESTAMP NOT NULL,
+    wifi_quality INTEGER,
+    wifi_rssi INTEGER
+);
+CREATE TABLE IF NOT EXISTS esp32_power_logs (
+    log_id BIGSERIAL PRIMARY KEY,
+    reader_id INTEGER NOT NULL REFERENCES room_rfid_readers(reader_id),
+    voltage NUMERIC,
+    recorded_at TIMESTAMP NOT NULL
+);
+"""
+
+# (name, table, definition): the indexes the hot queries rely on. Names the
+# API modules also create lazily are reused, so those become no-ops.
+HOT_PATH_INDEXES = (
+    # Latest scan per asset: LATERAL ... ORDER BY scan_time DESC LIMIT 1 in
+    # tracking, dashboard, utilization, reports and the missing detector
+    ("idx_scan_events_asset_time", "asset_room_scan_events", "(asset_id, scan_time DESC)"),
+    # Ingest duplicate suppression: same asset, same room, last 10 seconds
+    ("idx_scan_events_asset_room_time", "asset_room_scan_events", "(asset_id, room_id, scan_time)"),
+    # Time windows: recent movements, utilization trends, scan export
+    ("idx_scan_events_scan_time", "asset_room_scan_events", "(scan_time)"),
+    # Reader liveness seeding: latest heartbeat / voltage per reader
+    ("idx_health_logs_reader_time", "esp32_health_logs", "(reader_id, recorded_at DESC)"),
+    ("idx_power_logs_reader_time", "esp32_power_logs", "(reader_id, recorded_at DESC)"),
+    # Telemetry rollup windows and retention deletes
+    ("idx_esp32_health_logs_recorded_at", "esp32_health_logs", "(recorded_at)"),
+    ("idx_esp32_power_logs_recorded_at", "esp32_power_logs", "(recorded_at)"),
+    # Open alerts: the missing detector's "already alerted" probe, ingest
+    # auto-acknowledge, active alert list and counters
+    ("idx_alerts_open", "alerts", "(asset_id, alert_type) WHERE acknowledged_at IS NULL"),
+    ("idx_alerts_type_generated", "alerts", "(alert_type, generated_at DESC)"),
+    # Current department per asset: ORDER BY mapped_at DESC LIMIT 1
+    ("idx_department_mapping_asset", "asset_department_mapping", "(asset_id, mapped_at DESC)"),
+    ("idx_department_mapping_department", "asset_department_mapping", "(department_id)"),
+    ("idx_maintenance_asset", "asset_maintenance_records", "(asset_id)"),
+    ("idx_maintenance_start", "asset_maintenance_records", "(maintenance_start)"),
+    ("idx_maintenance_pending_start", "asset_maintenance_records",
+     "(maintenance_start) WHERE maintenance_end IS NULL"),
+    # Ingest: previous status before this scan
+    ("idx_asset_status_asset_time", "asset_status", "(asset_id, recorded_at DESC)"),
+    # Geofence check on every scan
+    ("idx_allowed_locations_asset", "asset_allowed_locations", "(asset_id)"),
+    ("idx_asset_tags_asset", "asset_tags", "(asset_id)"),
+    ("idx_assets_category", "assets", "(category_id)"),
+    ("idx_rooms_floor", "rooms", "(floor_id)"),
+    ("idx_floors_building", "floors", "(building_id)"),
+)
+
+INVALID_INDEXES_SQL = """
+SELECT c.relname AS name
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+"""
+
+EXISTING_INDEXES_SQL = """
+SELECT c.relname AS name, i.indisvalid AS valid
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = current_schema()
+"""
+
+# Indexes never scanned since the statistics were reset; unique and
+# primary-key indexes enforce constraints and are never "unused"
+UNUSED_INDEXES_SQL = """
+SELECT
+    s.relname AS table_name,
+    s.indexrelname AS index_name,
+    pg_relation_size(s.indexrelid) AS bytes,
+    s.idx_scan
+FROM pg_stat_user_indexes s
+JOIN pg_index i ON i.indexrelid = s.indexrelid
+WHERE s.schemaname = current_schema()
+  AND s.idx_scan = 0
+  AND NOT i.indisunique
+  AND NOT i.indisprimary
+ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+# Large tables read mostly by sequential scans: likely a missing index
+SEQ_SCAN_TABLES_SQL = """
+SELECT
+    relname AS table_name,
+    n_live_tup AS live_rows,
+    seq_scan,
+    seq_tup_read,
+    COALESCE(idx_scan, 0) AS idx_scan
+FROM pg_stat_user_tables
+WHERE schemaname = current_schema()
+  AND n_live_tup >= %s
+  AND seq_scan > COALESCE(idx_scan, 0)
+ORDER BY seq_tup_read DESC
+"""
+
+STATS_RESET_SQL = """
+SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()
+"""
+
+
+# ---------- steps ----------
+def _base_schema():
+    with transaction() as tx:
+        tx.execute(BASE_SCHEMA)
+        # The ingest's own tables, from its DDL
+        tx.execute(ingest_schema.MISSING_THRESHOLDS_SCHEMA)
+        tx.execute(ingest_schema.READER_LIVENESS_SCHEMA)
+
+
+def build_indexes(indexes):
+    """CREATE INDEX CONCURRENTLY each (name, table, definition), rebuilding INVALID leftovers"""
+    with autocommit() as cur:
+        cur.execute(INVALID_INDEXES_SQL, ([name for name, _, _ in indexes],))
+        for row in cur.fetchall():
+            print(f"  dropping invalid index {row['name']}", flush=True)
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row['name']}")
+        for name, table, definition in indexes:
+            started = time.perf_counter()
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+            print(f"  {name}: {(time.perf_counter() - started) * 1000:.0f} ms", flush=True)
+
+
+def _hot_path_indexes():
+    build_indexes(HOT_PATH_INDEXES)
+
+
+def _application_tables():
+    import maintenance_stats
+    import permissions
+    import report_scheduler
+    import telemetry
+    import versions
+
+    with transaction() as tx:
+        tx.execute(versions.SCHEMA, (list(versions.RESOURCES),))
+    telemetry.ensure_schema()
+    maintenance_stats.ensure_schema()
+    report_scheduler.ensure_schema()
+    permissions.ensure_schema()
+
+
+def _asset_search():
+    import asset_search
+
+    build_indexes(asset_search.create())
+
+
+def _report_jobs():
+    import report_jobs
+
+    report_jobs.ensure_schema()
+
+
+# (version, name, step); append only
+MIGRATIONS = (
+    (1, "base schema", _base_schema),
+    (2, "hot-path indexes", _hot_path_indexes),
+    (3, "application tables", _application_tables),
+    (4, "asset search", _asset_search),
+    (5, "report jobs", _report_jobs),
+)
+
+
+# ---------- runner ----------
+def applied():
+    """{version: row} for every recorded migration"""
+    with transaction() as tx:
+        tx.execute(SCHEMA)
+        return {r["version"]: r for r in tx.fetch_all("SELECT * FROM schema_migrations")}
+
+
+def pending():
+    done = applied()
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def migrate():
+    """Apply every pending migration in order; returns the versions applied"""
+    ran = []
+    with autocommit() as lock:
+        # Held on its own session for the whole run
+        lock.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        try:
+            for version, name, step in pending():
+                print(f"Migration {version}: {name}", flush=True)
+                started = time.perf_counter()
+                step()
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                with transaction() as tx:
+                    tx.execute(
+                        "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                        (version, name, duration_ms),
+                    )
+                ran.append(version)
+        finally:
+            lock.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+    return ran
+
+
+def check(min_rows=10000):
+    """Index health: expected indexes missing or invalid, unused indexes, seq-scan-heavy tables"""
+    # On the primary: a replica keeps its own usage statistics
+    with transaction() as tx:
+        existing = {r["name"]: r["valid"] for r in tx.fetch_all(EXISTING_INDEXES_SQL)}
+        return {
+            "missing": [{"index_name": n, "table_name": t, "definition": d}
+                        for n, t, d in HOT_PATH_INDEXES if n not in existing],
+            "invalid": [n for n, t, d in HOT_PATH_INDEXES if existing.get(n) is False],
+            "unused": tx.fetch_all(UNUSED_INDEXES_SQL),
+            "seq_scan_tables": tx.fetch_all(SEQ_SCAN_TABLES_SQL, (min_rows,)),
+            "stats_reset": tx.fetch_one(STATS_RESET_SQL)["stats_reset"],
+        }
+
+
+def _print_check(report):
+    for row in report["missing"]:
+        print(f"MISSING  {row['index_name']} ON {row['table_name']} {row['definition']}")
+    for name in report["invalid"]:
+        print(f"INVALID  {name} (interrupted concurrent build; rerun migrations.py)")
+    print(f"Unused indexes (no scans since {report['stats_reset'] or 'statistics were created'}):")
+    for row in report["unused"]:
+        print(f"  {row['table_name']:28s} {row['index_name']:40s} {row['bytes'] / 1048576:10.1f} MB")
+    print("Tables read mostly by sequential scans:")
+    for row in report["seq_scan_tables"]:
+        print(f"  {row['table_name']:28s} {row['live_rows']:>12,} rows  {row['seq_scan']:>8,} seq  "
+              f"{row['idx_scan']:>10,} idx  {row['seq_tup_read']:>14,} rows read")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="report missing, invalid and unused indexes")
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="--check: only flag sequential scans on tables at least this large")
+    args = parser.parse_args()
+
+    if args.status:
+        done = applied()
+        for version, name, _ in MIGRATIONS:
+            row = done.get(version)
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M} ({row['duration_ms']} ms)" if row else "pending"
+            print(f"{version:4d}  {name:24s} {state}")
+    elif args.check:
+        report = check(args.min_rows)
+        _print_check(report)
+        if report["missing"] or report["invalid"]:
+            sys.exit(1)
+    else:
+        ran = migrate()
+        print(f"Applied {len(ran)} migration(s)" if ran else "Schema is up to date")
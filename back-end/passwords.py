@@ -0,0 +1,90 @@
+"""
+bcrypt hashing on a bounded worker pool.
+
+bcrypt is deliberately slow (~250 ms at cost 12). Running it on the request
+thread lets a burst of logins pin every CPU and starve the rest of the API.
+Here it runs on BCRYPT_WORKERS threads (bcrypt releases the GIL), at most
+LOGIN_MAX_PENDING checks may be queued or running at once, and callers over
+that limit get Busy straight away instead of joining an ever-growing queue.
+Under gevent (serve.py) the workers are native threads from gevent's pool,
+so hashing never blocks the event loop.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", BCRYPT_WORKERS * 4))
+# How long (seconds) a caller waits for a pending slot before Busy
+LOGIN_QUEUE_TIMEOUT = float(os.getenv("LOGIN_QUEUE_TIMEOUT", 0.5))
+
+
+def _native_executor():
+    """Real OS threads even when threading is monkey-patched into greenlets"""
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers=BCRYPT_WORKERS)
+    except ImportError:  # gevent is only needed by serve.py
+        pass
+    return ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+_executor = _native_executor()
+_slots = threading.BoundedSemaphore(LOGIN_MAX_PENDING)
+_lock = threading.Lock()
+_stats = {"checks": 0, "hashes": 0, "rejected": 0, "pending": 0}
+
+
+class Busy(Exception):
+    pass
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=LOGIN_QUEUE_TIMEOUT):
+        with _lock:
+            _stats["rejected"] += 1
+        raise Busy(f"{LOGIN_MAX_PENDING} password checks already in progress")
+    with _lock:
+        _stats["pending"] += 1
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        with _lock:
+            _stats["pending"] -= 1
+        _slots.release()
+
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except Exception as e:
+        print(f"Password verification error: {e}")
+        return False
+
+
+def check(password: str, hashed: str) -> bool:
+    """Verify a password against a bcrypt hash; raises Busy when overloaded"""
+    with _lock:
+        _stats["checks"] += 1
+    return _run(_check, password, hashed)
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def hash_password(password: str, rounds=None) -> str:
+    """bcrypt hash at BCRYPT_ROUNDS; raises Busy when overloaded"""
+    with _lock:
+        _stats["hashes"] += 1
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, workers=BCRYPT_WORKERS, max_pending=LOGIN_MAX_PENDING, rounds=BCRYPT_ROUNDS)
@@ -0,0 +1,236 @@
+"""
+Request authentication and role permissions.
+
+One before_request hook authenticates every API call: the bearer token is
+resolved through the tokens cache and the user's role into a permission
+bitset held in memory, so a steady-state request costs two dict lookups and
+a bitwise AND, with no database round trip. Bitsets are reloaded when the
+"roles" resource version changes; user/role assignments follow the "users"
+version through the token cache.
+
+A view's requirement comes from @requires(...) / @public, or otherwise
+from its blueprint: the read permission for GET/HEAD, the write permission
+for everything else. AUTH_REQUIRED=false authenticates without enforcing
+(for rolling the frontend out).
+"""
+import os
+import threading
+
+import jwt
+from flask import current_app, g, jsonify, request
+
+import tokens
+from db import fetch_all, transaction
+from versions import snapshot
+
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "true").lower() in ("1", "true", "yes")
+
+PERMISSIONS = (
+    "assets:read", "assets:write",
+    "tracking:read",
+    "alerts:read", "alerts:ack",
+    "readers:read", "readers:manage",
+    "maintenance:read", "maintenance:write",
+    "vendors:read", "vendors:write",
+    "reports:read", "reports:manage",
+    "users:read", "users:manage",
+    "admin",
+)
+BITS = {name: 1 << i for i, name in enumerate(PERMISSIONS)}
+ALL = (1 << len(PERMISSIONS)) - 1
+
+
+def mask(*names):
+    """Bitset for permission names; unknown names are a programming error"""
+    value = 0
+    for name in names:
+        if name not in BITS:
+            raise ValueError(f"Unknown permission '{name}'")
+        value |= BITS[name]
+    return value
+
+
+def names(value):
+    return [name for name in PERMISSIONS if value & BITS[name]]
+
+
+_READ = ("assets:read", "tracking:read", "alerts:read", "readers:read",
+         "maintenance:read", "vendors:read", "reports:read")
+
+# Seeded into role_permissions by role name when the table is created;
+# other roles get FALLBACK_PERMISSIONS
+DEFAULT_ROLE_PERMISSIONS = {
+    "Admin": PERMISSIONS,
+    "Biomedical Engineer": _READ + ("assets:write", "alerts:ack", "readers:manage",
+                                    "maintenance:write", "vendors:write"),
+    "Inventory Manager": _READ + ("assets:write", "alerts:ack", "vendors:write", "reports:manage"),
+    "Doctor": ("assets:read", "tracking:read", "alerts:read", "alerts:ack",
+               "maintenance:read", "reports:read"),
+    "Nurse": ("assets:read", "tracking:read", "alerts:read", "alerts:ack", "maintenance:read"),
+}
+# Also what a user without a role gets
+FALLBACK_PERMISSIONS = ("assets:read", "tracking:read", "alerts:read")
+FALLBACK_MASK = mask(*FALLBACK_PERMISSIONS)
+
+# blueprint -> (read permission, write permission)
+BLUEPRINT_PERMISSIONS = {
+    "meta": ("assets:read", "admin"),
+    "dashboard": ("assets:read", "admin"),
+    "assets": ("assets:read", "assets:write"),
+    "tracking": ("tracking:read", "admin"),
+    "alerts": ("alerts:read", "alerts:ack"),
+    "readers": ("readers:read", "readers:manage"),
+    "maintenance": ("maintenance:read", "maintenance:write"),
+    "vendors": ("vendors:read", "vendors:write"),
+    "analytics": ("reports:read", "admin"),
+    "utilization": ("reports:read", "admin"),
+    "reports": ("reports:read", "reports:manage"),
+    "users": ("users:read", "users:manage"),
+    "roles": ("users:read", "users:manage"),
+    "admin": ("admin", "admin"),
+}
+_BLUEPRINT_MASKS = {bp: (mask(r), mask(w)) for bp, (r, w) in BLUEPRINT_PERMISSIONS.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS role_permissions (
+    role_id INTEGER NOT NULL REFERENCES roles(role_id) ON DELETE CASCADE,
+    permission TEXT NOT NULL,
+    PRIMARY KEY (role_id, permission)
+);
+"""
+
+
+_lock = threading.Lock()
+_schema_ready = False
+_role_masks = (None, {})   # (roles version, {role_id: bitset})
+
+
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with transaction() as tx:
+        missing = tx.fetch_one("SELECT to_regclass('role_permissions') IS NULL AS missing")["missing"]
+        tx.execute(SCHEMA)
+        if missing:
+            seed_defaults(tx)
+    _schema_ready = True
+
+
+def seed_defaults(tx):
+    """Give every role without permissions its default set"""
+    roles = tx.fetch_all("""
+        SELECT role_id, role_name
+        FROM roles r
+        WHERE NOT EXISTS (SELECT 1 FROM role_permissions rp WHERE rp.role_id = r.role_id)
+    """)
+    tx.execute_values(
+        "INSERT INTO role_permissions (role_id, permission) VALUES %s",
+        [(r["role_id"], p)
+         for r in roles
+         for p in DEFAULT_ROLE_PERMISSIONS.get(r["role_name"], FALLBACK_PERMISSIONS)]
+    )
+
+
+def _load_masks():
+    ensure_schema()
+    # A plain read: a transaction would count as a write and pin this
+    # process's reads to the primary on every cache miss
+    rows = fetch_all("""
+        SELECT r.role_id, rp.permission
+        FROM roles r
+        LEFT JOIN role_permissions rp ON rp.role_id = r.role_id
+    """)
+    # A role whose permissions were all removed keeps an empty bitset
+    masks = {}
+    for row in rows:
+        masks[row["role_id"]] = masks.get(row["role_id"], 0) | BITS.get(row["permission"], 0)
+    return masks
+
+
+def role_mask(role_id):
+    """Permission bitset for a role, reloaded only when the roles version moves"""
+    global _role_masks
+    (version,), _ = snapshot(("roles",))
+    cached_version, masks = _role_masks
+    if cached_version != version:
+        with _lock:
+            cached_version, masks = _role_masks
+            if cached_version != version:
+                masks = _load_masks()
+                _role_masks = (version, masks)
+    return masks.get(role_id, FALLBACK_MASK)
+
+
+def role_permissions(role_id):
+    return names(role_mask(role_id))
+
+
+# ---------- declarations ----------
+_UNSET = object()
+
+
+def requires(*permission_names):
+    """Declare the permissions a view needs; no names means any signed-in user"""
+    required = mask(*permission_names)
+
+    def decorator(view):
+        view.required_permissions = required
+        return view
+    return decorator
+
+
+def public(view):
+    """Serve a view without authentication"""
+    view.required_permissions = None
+    return view
+
+
+def _required(view):
+    required = getattr(view, "required_permissions", _UNSET)
+    if required is not _UNSET:
+        return required
+    masks = _BLUEPRINT_MASKS.get(request.blueprint)
+    if masks is None:
+        return 0
+    return masks[0] if request.method in ("GET", "HEAD") else masks[1]
+
+
+# ---------- middleware ----------
+def authenticate():
+    """before_request hook: set g.user / g.permissions and enforce the view's requirement"""
+    g.user = None
+    g.permissions = 0
+    if request.method == "OPTIONS":
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None:
+        return None
+    required = _required(view)
+
+    error = None
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        try:
+            user = tokens.verify(header[7:])
+            if user is None:
+                error = "User not found"
+            else:
+                g.user = user
+                g.permissions = role_mask(user["role_id"])
+        except jwt.ExpiredSignatureError:
+            error = "Token expired"
+        except jwt.InvalidTokenError:
+            error = "Invalid token"
+
+    if required is None or not AUTH_REQUIRED:
+        return None
+    if g.user is None:
+        return jsonify({"error": error or "Authentication required"}), 401
+    if g.permissions & required != required:
+        return jsonify({"error": "Forbidden", "missing": names(required & ~g.permissions)}), 403
+    return None
+
+
+def init_app(app):
+    app.before_request(authenticate)
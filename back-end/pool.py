@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe blocking PostgreSQL connection pool.
+
+    No connection is opened until the first getconn() (or prefill()), so
+    creating the pool never blocks on the database. getconn() waits up to
+    ``timeout`` seconds for a free connection instead of failing when all
+    ``maxconn`` are in use. Idle connections are validated
+    before reuse, recycled after ``max_lifetime`` / ``max_idle`` seconds, and
+    rolled back to a clean state when returned.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, max_lifetime=3600.0,
+                 max_idle=600.0, check_idle=5.0, statement_timeout_ms=None,
+                 application_name=None, **dsn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_idle = check_idle
+        self._dsn = dict(dsn)
+        if application_name:
+            self._dsn["application_name"] = application_name
+        if statement_timeout_ms:
+            self._dsn["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+
+        self._cond = threading.Condition()
+        self._idle = deque()    # (conn, last_used) - most recently used on the right
+        self._born = {}         # id(conn) -> created_at
+        self._size = 0          # open connections, idle + in use
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_recycled": 0,
+            "connections_failed_check": 0,
+        }
+
+    # ---------- internals ----------
+    def _connect(self):
+        conn = psycopg2.connect(**self._dsn)
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection and free its slot (caller holds the lock)"""
+        self._born.pop(id(conn), None)
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._cond.notify()
+
+    def _expired(self, conn, last_used, now):
+        if conn.closed:
+            return True
+        if self.max_lifetime and now - self._born.get(id(conn), now) > self.max_lifetime:
+            return True
+        return bool(self.max_idle) and now - last_used > self.max_idle
+
+    def _alive(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ---------- public API ----------
+    def getconn(self, timeout=None):
+        """Check out a connection, blocking up to timeout seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    now = time.monotonic()
+                    while self._idle:
+                        candidate, last_used = self._idle.pop()
+                        if self._expired(candidate, last_used, now):
+                            self._stats["connections_recycled"] += 1
+                            self._discard(candidate)
+                            continue
+                        conn = candidate
+                        break
+                    if conn is not None or self._size < self.maxconn:
+                        if conn is None:
+                            self._size += 1
+                        self._in_use += 1
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no connection available within {timeout:.1f}s "
+                            f"({self._in_use} in use, {self._waiters} waiting)"
+                        )
+                    waited = True
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif now - last_used > self.check_idle and not self._alive(conn):
+                with self._cond:
+                    self._stats["connections_failed_check"] += 1
+                    self._in_use -= 1
+                    self._discard(conn)
+                continue
+
+            wait = time.monotonic() - started
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time_total"] += wait
+                    self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait)
+            return conn
+
+    def prefill(self):
+        """Open idle connections up to minconn (e.g. once the service is ready)"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def putconn(self, conn, close=False):
+        """Return a connection, rolling back any open transaction"""
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            if close or self._closed or self._expired(conn, now, now):
+                if not close and not conn.closed:
+                    self._stats["connections_recycled"] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, now))
+                self._cond.notify()
+
+    def closeall(self):
+        """Close idle connections and refuse new checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool gauges and counters"""
+        with self._cond:
+            data = dict(self._stats)
+            data.update(
+                size=self._size,
+                max_size=self.maxconn,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                waiters=self._waiters,
+            )
+        data["wait_time_avg"] = data["wait_time_total"] / data["waits"] if data["waits"] else 0.0
+        return data
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger("db.queries")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Re-run slow SELECTs under EXPLAIN (ANALYZE, BUFFERS) and keep the plan.
+# Doubles the cost of the sampled query, so it is off by default.
+EXPLAIN_SLOW_QUERIES = os.getenv("EXPLAIN_SLOW_QUERIES", "false").lower() in ("1", "true", "yes")
+EXPLAIN_SAMPLES_PER_QUERY = int(os.getenv("EXPLAIN_SAMPLES_PER_QUERY", 3))
+# Latencies kept per fingerprint for the p95 estimate
+LATENCY_WINDOW = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+_COMMENTS = re.compile(r"--[^\n]*")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"IN \((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+
+
+class _QueryStat:
+    __slots__ = ("sql", "count", "total", "max", "rows", "latencies", "endpoints", "explains")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.endpoints = {}
+        self.explains = []
+
+    def p95(self):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def normalize(query):
+    """Collapse a query to its shape: no comments, literals or variable-length IN lists"""
+    sql = _COMMENTS.sub(" ", query)
+    sql = _IN_LISTS.sub("IN (...)", sql)
+    sql = _LITERALS.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    return "<background>"
+
+
+def _explain(conn, query, params):
+    """
+    Re-run a query under EXPLAIN ANALYZE on the connection it ran on,
+    inside a savepoint that is always rolled back, so a failed EXPLAIN
+    (timeout, cancel) leaves the connection's transaction usable.
+    """
+    savepoint = not conn.autocommit
+    try:
+        with conn.cursor() as cur:
+            if savepoint:
+                cur.execute("SAVEPOINT querystats_explain")
+            try:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+                return cur.fetchone()[0]
+            finally:
+                if savepoint:
+                    cur.execute("ROLLBACK TO SAVEPOINT querystats_explain")
+                    cur.execute("RELEASE SAVEPOINT querystats_explain")
+    except Exception as e:
+        logger.warning("EXPLAIN failed: %s", e)
+        return None
+
+
+def record(query, params, seconds, rows, conn=None):
+    """
+    Account one executed statement to its fingerprint and the current
+    request. Slow queries are logged by fingerprint and normalized SQL,
+    never with their parameters (auth queries bind password hashes). conn
+    is where a slow SELECT may be re-run under EXPLAIN; pass None to never
+    do that.
+    """
+    endpoint = current_endpoint()
+    if has_request_context():
+        g.db_time = g.get("db_time", 0.0) + seconds
+        g.db_queries = g.get("db_queries", 0) + 1
+
+    sql = normalize(query)
+    key = hashlib.sha1(sql.encode()).hexdigest()[:12]
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            stat = _stats[key] = _QueryStat(sql)
+        stat.count += 1
+        stat.total += seconds
+        stat.max = max(stat.max, seconds)
+        stat.rows += max(rows or 0, 0)
+        stat.latencies.append(seconds)
+        stat.endpoints[endpoint] = stat.endpoints.get(endpoint, 0) + 1
+        want_plan = (
+            EXPLAIN_SLOW_QUERIES
+            and conn is not None
+            and len(stat.explains) < EXPLAIN_SAMPLES_PER_QUERY
+            and sql.split(" ", 1)[0].upper() in ("SELECT", "WITH")
+        )
+
+    ms = seconds * 1000
+    if ms < SLOW_QUERY_MS:
+        return
+
+    logger.warning("slow query %.1f ms [%s] %s: %s", ms, endpoint, key, sql[:500])
+    if want_plan:
+        plan = _explain(conn, query, params)
+        if plan is not None:
+            with _lock:
+                stat.explains.append({"ms": round(ms, 2), "plan": plan})
+
+
+def record_commit():
+    if has_request_context():
+        g.db_commits = g.get("db_commits", 0) + 1
+
+
+def top(limit=20, sort="total"):
+    """Heaviest query fingerprints, sorted by total, p95, max, count or rows"""
+    with _lock:
+        items = [
+            {
+                "fingerprint": key,
+                "sql": stat.sql,
+                "count": stat.count,
+                "total_ms": round(stat.total * 1000, 2),
+                "avg_ms": round(stat.total * 1000 / stat.count, 2),
+                "p95_ms": round(stat.p95() * 1000, 2),
+                "max_ms": round(stat.max * 1000, 2),
+                "rows": stat.rows,
+                "endpoints": dict(stat.endpoints),
+                "explains": list(stat.explains),
+            }
+            for key, stat in _stats.items()
+        ]
+    sort_key = {"total": "total_ms", "p95": "p95_ms", "max": "max_ms"}.get(sort, sort)
+    if items and sort_key not in items[0]:
+        sort_key = "total_ms"
+    items.sort(key=lambda item: item[sort_key], reverse=True)
+    return items[:limit]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+# ---------- Server-Timing ----------
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _server_timing(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    total_ms = (time.perf_counter() - started) * 1000
+    db_ms = g.get("db_time", 0.0) * 1000
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{g.get("db_queries", 0)} queries, {g.get("db_commits", 0)} commits", '
+        f'app;dur={total_ms:.1f}',
+    )
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_timer)
+    app.after_request(_server_timing)
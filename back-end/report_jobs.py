@@ -0,0 +1,336 @@
+"""
+Background execution for heavy reports.
+
+A job runs a report query on a small local thread pool instead of inside
+the HTTP request; the client polls for status and fetches the result once
+it is done. Job state, progress and results live in the report_jobs table,
+so a poll answered by a different API process (or after a restart) still
+finds the job. The process that accepted a job runs it and refreshes its
+heartbeat; a queued or running job whose heartbeat is older than
+REPORT_JOB_STALE_SECONDS belonged to a process that went away and reads as
+failed. Identical requests (same report and parameters) that arrive while a
+job is queued or running share that job, across processes. Finished jobs
+are kept for REPORT_JOB_TTL_SECONDS.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+from json_provider import dumps
+from report_scheduler import params_key
+
+# Never more than a quarter of the primary pool, so interactive requests
+# always find a connection
+MAX_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", max(1, db.pool.maxconn // 4)))
+# Queued + running jobs across all processes
+MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", 50))
+RESULT_TTL_SECONDS = float(os.getenv("REPORT_JOB_TTL_SECONDS", 900))
+# Rows fetched per round trip; progress is reported per batch
+FETCH_BATCH = int(os.getenv("REPORT_JOB_FETCH_BATCH", 2000))
+# How often the owning process writes progress and proves it is alive
+HEARTBEAT_SECONDS = float(os.getenv("REPORT_JOB_HEARTBEAT_SECONDS", 2))
+STALE_SECONDS = float(os.getenv("REPORT_JOB_STALE_SECONDS", 60))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    job_id TEXT PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    dedup_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    rows_fetched INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_report_jobs_inflight
+    ON report_jobs (dedup_key) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_report_jobs_finished ON report_jobs (finished_at);
+"""
+
+# Everything but the result, with times as epoch seconds on the database clock
+JOB_COLUMNS = """
+    job_id, report_type, params, status, rows_fetched, error,
+    EXTRACT(EPOCH FROM created_at)::float8 AS created_at,
+    EXTRACT(EPOCH FROM started_at)::float8 AS started_at,
+    EXTRACT(EPOCH FROM finished_at)::float8 AS finished_at,
+    EXTRACT(EPOCH FROM NOW())::float8 AS now,
+    status IN ('queued', 'running')
+        AND heartbeat_at < NOW() - make_interval(secs => %(stale)s) AS stale
+"""
+
+_schema_ready = False
+
+
+class QueueFull(Exception):
+    pass
+
+
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with db.transaction() as tx:
+        tx.execute(SCHEMA)
+    _schema_ready = True
+
+
+class Job:
+    """One report_jobs row; result is only loaded by JobQueue.get(..., with_result=True)"""
+
+    def __init__(self, row, result=None):
+        self.id = row["job_id"]
+        self.report_type = row["report_type"]
+        self.params = row["params"]
+        self.status = row["status"]
+        self.rows_fetched = row["rows_fetched"]
+        self.error = row["error"]
+        self.created_at = row["created_at"]
+        self.started_at = row["started_at"]
+        self.finished_at = row["finished_at"]
+        self._now = row["now"]
+        self.result = result
+        if row["stale"]:
+            self.status = FAILED
+            self.error = "The process running this job stopped"
+            self.finished_at = self._now
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def to_dict(self):
+        now = self.finished_at or self._now
+        return {
+            "job_id": self.id,
+            "report_type": self.report_type,
+            "params": self.params,
+            "status": self.status,
+            "progress": {"phase": self.status, "rows_fetched": self.rows_fetched},
+            "error": self.error,
+            "queued_ms": round(((self.started_at or now) - self.created_at) * 1000, 1),
+            "run_ms": round((now - self.started_at) * 1000, 1) if self.started_at else None,
+            "expires_in": (round(self.finished_at + RESULT_TTL_SECONDS - self._now)
+                           if self.finished_at else None),
+        }
+
+
+class JobQueue:
+    def __init__(self, runner, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        # runner(report_type, args, on_rows) -> result body
+        self._runner = runner
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-job")
+        self._lock = threading.Lock()
+        self._local = {}      # job_id -> rows fetched, for jobs this process owns
+        self._futures = {}    # job_id -> Future while queued here
+        self._heartbeat = None
+
+    def _params(self, **params):
+        return dict(params, stale=STALE_SECONDS)
+
+    def _sweep(self, tx):
+        """Fail jobs whose process stopped (frees their dedup key) and drop expired ones"""
+        tx.execute("""
+            UPDATE report_jobs
+            SET status = 'failed', error = 'The process running this job stopped', finished_at = NOW()
+            WHERE status IN ('queued', 'running')
+              AND heartbeat_at < NOW() - make_interval(secs => %(stale)s)
+        """, self._params())
+        tx.execute("""
+            DELETE FROM report_jobs
+            WHERE finished_at < NOW() - make_interval(secs => %(ttl)s)
+        """, self._params(ttl=RESULT_TTL_SECONDS))
+
+    def submit(self, report_type, args):
+        """Return (job, deduplicated); raises QueueFull when too much work is pending"""
+        ensure_schema()
+        key = f"{report_type}?{params_key(args)}"
+        params = {k: v for k, v in args.items()}
+        with db.transaction() as tx:
+            self._sweep(tx)
+            existing = tx.fetch_one(f"""
+                SELECT {JOB_COLUMNS} FROM report_jobs
+                WHERE dedup_key = %(key)s AND status IN ('queued', 'running')
+            """, self._params(key=key))
+            if existing is not None:
+                return Job(existing), True
+            pending = tx.fetch_one(
+                "SELECT COUNT(*) AS n FROM report_jobs WHERE status IN ('queued', 'running')")["n"]
+            if pending >= self._max_pending:
+                raise QueueFull(f"{pending} report jobs already pending")
+            # A concurrent submit of the same job wins the unique index
+            row = tx.fetch_one(f"""
+                INSERT INTO report_jobs (job_id, report_type, params, dedup_key, status)
+                VALUES (%(job_id)s, %(report_type)s, %(params)s::jsonb, %(key)s, 'queued')
+                ON CONFLICT (dedup_key) WHERE status IN ('queued', 'running') DO NOTHING
+                RETURNING {JOB_COLUMNS}
+            """, self._params(job_id=uuid.uuid4().hex, report_type=report_type,
+                              params=dumps(params), key=key))
+            deduplicated = row is None
+            if deduplicated:
+                row = tx.fetch_one(f"""
+                    SELECT {JOB_COLUMNS} FROM report_jobs
+                    WHERE dedup_key = %(key)s AND status IN ('queued', 'running')
+                """, self._params(key=key))
+        job = Job(row)
+        if not deduplicated:
+            with self._lock:
+                self._local[job.id] = 0
+                self._futures[job.id] = self._executor.submit(self._run, job.id, report_type, args)
+                self._start_heartbeat()
+        return job, deduplicated
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._beat, daemon=True, name="report-job-heartbeat")
+            self._heartbeat.start()
+
+    def _beat(self):
+        """Write progress and liveness for this process's unfinished jobs until there are none"""
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                local = dict(self._local)
+            if not local:
+                with self._lock:
+                    if not self._local:
+                        self._heartbeat = None
+                        return
+                continue
+            try:
+                with db.transaction() as tx:
+                    tx.execute("""
+                        UPDATE report_jobs j
+                        SET heartbeat_at = NOW(), rows_fetched = p.rows_fetched
+                        FROM unnest(%s::text[], %s::int[]) AS p(job_id, rows_fetched)
+                        WHERE j.job_id = p.job_id AND j.status IN ('queued', 'running')
+                    """, (list(local), list(local.values())))
+            except Exception:
+                traceback.print_exc()
+
+    def _finish(self, job_id):
+        with self._lock:
+            self._local.pop(job_id, None)
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id, report_type, args):
+        try:
+            with db.transaction() as tx:
+                started = tx.execute("""
+                    UPDATE report_jobs
+                    SET status = 'running', started_at = NOW(), heartbeat_at = NOW()
+                    WHERE job_id = %s AND status = 'queued'
+                """, (job_id,))
+            if not started:
+                return  # cancelled, or failed as stale
+
+            def on_rows(count):
+                with self._lock:
+                    self._local[job_id] = self._local.get(job_id, 0) + count
+
+            try:
+                result = self._runner(report_type, args, on_rows)
+                status, error = DONE, None
+            except Exception as e:
+                traceback.print_exc()
+                result, status, error = None, FAILED, str(e)
+
+            with self._lock:
+                rows_fetched = self._local.get(job_id, 0)
+            with db.transaction() as tx:
+                tx.execute("""
+                    UPDATE report_jobs
+                    SET status = %s, error = %s, result = %s::jsonb, rows_fetched = %s,
+                        finished_at = NOW(), heartbeat_at = NOW()
+                    WHERE job_id = %s
+                """, (status, error, dumps(result) if result is not None else None, rows_fetched, job_id))
+        except Exception:
+            # Left queued/running: reads as failed once the heartbeat goes stale
+            traceback.print_exc()
+        finally:
+            self._finish(job_id)
+
+    def get(self, job_id, with_result=False):
+        ensure_schema()
+        # Possibly created by another process moments ago: replicas may lag
+        db.use_primary()
+        row = db.fetch_one(f"""
+            SELECT {JOB_COLUMNS}{', result' if with_result else ''}
+            FROM report_jobs
+            WHERE job_id = %(job_id)s
+              AND (finished_at IS NULL OR finished_at >= NOW() - make_interval(secs => %(ttl)s))
+        """, self._params(job_id=job_id, ttl=RESULT_TTL_SECONDS))
+        if row is None:
+            return None
+        return Job(row, row.get("result"))
+
+    def cancel(self, job_id):
+        """Cancel a queued job; running queries are left to finish"""
+        ensure_schema()
+        with db.transaction() as tx:
+            cancelled = tx.execute("""
+                UPDATE report_jobs
+                SET status = 'cancelled', finished_at = NOW()
+                WHERE job_id = %s AND status = 'queued'
+            """, (job_id,))
+        if not cancelled:
+            return False
+        # Queued in this process: free the worker slot too
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._finish(job_id)
+        return True
+
+    def stats(self):
+        ensure_schema()
+        rows = db.fetch_all("""
+            SELECT
+                CASE WHEN status IN ('queued', 'running')
+                      AND heartbeat_at < NOW() - make_interval(secs => %(stale)s)
+                     THEN 'failed' ELSE status END AS status,
+                COUNT(*) AS n
+            FROM report_jobs
+            WHERE finished_at IS NULL OR finished_at >= NOW() - make_interval(secs => %(ttl)s)
+            GROUP BY 1
+        """, self._params(ttl=RESULT_TTL_SECONDS))
+        with self._lock:
+            local = len(self._local)
+        return {
+            "workers": self._max_workers,
+            "max_pending": self._max_pending,
+            "jobs": {row["status"]: row["n"] for row in rows},
+            "this_process": local,
+        }
+
+
+def report_runner(reports):
+    """
+    Runner for JobQueue over a {report_type: (query builder, single row)}
+    registry; multi-row reports stream through a server-side cursor so
+    progress can be reported per batch.
+    """
+    def run(report_type, args, on_rows):
+        build, single = reports[report_type]
+        query, params = build(args)
+        if single:
+            row = db.fetch_one(query, params)
+            on_rows(1 if row else 0)
+            return row
+        rows = []
+        for batch in db.iter_batches(query, params, itersize=FETCH_BATCH):
+            rows.extend(batch)
+            on_rows(len(batch))
+        return {"data": rows}
+    return run
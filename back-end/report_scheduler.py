@@ -0,0 +1,321 @@
+"""
+Scheduled reports: cron-like definitions, a worker that runs them and
+versioned result snapshots the report endpoints can serve directly.
+
+    python report_scheduler.py            # worker loop
+    python report_scheduler.py --once     # run whatever is due and exit
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from db import fetch_all, fetch_one, transaction
+from json_provider import dumps
+
+POLL_SECONDS = float(os.getenv("REPORT_SCHEDULER_POLL_SECONDS", 30))
+# Snapshot versions kept per report + parameters
+SNAPSHOTS_KEPT = int(os.getenv("REPORT_SNAPSHOTS_KEPT", 10))
+# Older snapshots are ignored and the report is computed live instead
+SNAPSHOT_MAX_AGE = timedelta(hours=float(os.getenv("REPORT_SNAPSHOT_MAX_AGE_HOURS", 36)))
+
+# Request args that never change a report's result
+IGNORED_ARGS = ("fresh", "format", "gzip")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_schedules (
+    schedule_id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    report_type TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    cron TEXT NOT NULL,
+    enabled BOOLEAN NOT NULL DEFAULT TRUE,
+    next_run_at TIMESTAMP,
+    last_run_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS report_snapshots (
+    snapshot_id SERIAL PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    schedule_id INTEGER REFERENCES report_schedules(schedule_id) ON DELETE SET NULL,
+    generated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    duration_ms NUMERIC,
+    row_count INTEGER,
+    result JSONB NOT NULL,
+    UNIQUE (report_type, params_key, version)
+);
+CREATE TABLE IF NOT EXISTS report_runs (
+    run_id SERIAL PRIMARY KEY,
+    schedule_id INTEGER REFERENCES report_schedules(schedule_id) ON DELETE SET NULL,
+    report_type TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    status TEXT NOT NULL,
+    error TEXT,
+    snapshot_id INTEGER REFERENCES report_snapshots(snapshot_id) ON DELETE SET NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_schedules_due ON report_schedules (next_run_at) WHERE enabled;
+CREATE INDEX IF NOT EXISTS idx_report_runs_started ON report_runs (started_at);
+"""
+
+# Off-peak defaults for the reporting screen, created along with the table
+DEFAULT_SCHEDULES = (
+    ("Department summary (nightly)", "department-summary", {}, "0 2 * * *"),
+    ("TCO summary (nightly)", "tco-summary", {}, "10 2 * * *"),
+    ("Financial overview (nightly)", "financial-overview", {}, "20 2 * * *"),
+    ("Asset value by department (nightly)", "asset-value-by-department", {}, "30 2 * * *"),
+    ("Maintenance summary (nightly)", "maintenance-summary", {}, "40 2 * * *"),
+    ("Weekly utilization (hourly)", "utilization-trends", {"time_range": "week"}, "15 * * * *"),
+)
+
+_schema_ready = False
+
+
+# ---------- cron ----------
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@nightly": "0 2 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# (low, high) per field: minute hour day-of-month month day-of-week
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+class CronSchedule:
+    """Five-field cron expression (*, lists, ranges and /steps) or an @alias"""
+
+    def __init__(self, expr):
+        self.expr = expr.strip()
+        fields = CRON_ALIASES.get(self.expr, self.expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expr!r}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, _CRON_FIELDS)
+        )
+        # Standard cron: when both day fields are restricted, either may match
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = int(step)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(v) for v in part.split("-", 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if high == 6 and end == 7:
+                # 7 is Sunday too
+                values.add(0)
+                end = 6
+                if start == 7:
+                    continue
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, dt):
+        weekday = (dt.weekday() + 1) % 7  # cron: Sunday = 0
+        if self.any_day:
+            return weekday in self.weekdays
+        if self.any_weekday:
+            return dt.day in self.days
+        return dt.day in self.days or weekday in self.weekdays
+
+    def next_after(self, after):
+        """First matching minute strictly after ``after``"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"cron expression never fires: {self.expr!r}")
+
+
+# ---------- snapshots ----------
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with transaction() as tx:
+        created = tx.fetch_one("SELECT to_regclass('report_schedules') IS NULL AS missing")["missing"]
+        tx.execute(SCHEMA)
+        if created:
+            now = datetime.now()
+            tx.execute_batch("""
+                INSERT INTO report_schedules (name, report_type, params, cron, next_run_at)
+                VALUES (%s, %s, %s, %s, %s)
+            """, [
+                (name, report_type, json.dumps(params), cron, CronSchedule(cron).next_after(now))
+                for name, report_type, params, cron in DEFAULT_SCHEDULES
+            ])
+    _schema_ready = True
+
+
+def params_key(args):
+    """Canonical form of a report's parameters, e.g. 'time_range=week'"""
+    if isinstance(args, MultiDict):
+        items = args.items(multi=True)
+    else:
+        items = args.items()
+    return "&".join(f"{k}={v}" for k, v in sorted(items) if k not in IGNORED_ARGS)
+
+
+def latest(report_type, args):
+    """Newest snapshot row (result as JSON text) for these parameters, or None if missing or stale"""
+    row = fetch_one("""
+        SELECT snapshot_id, version, generated_at, result::text AS result
+        FROM report_snapshots
+        WHERE report_type = %s AND params_key = %s
+        ORDER BY version DESC
+        LIMIT 1
+    """, (report_type, params_key(args)))
+    if row is None or datetime.now() - row["generated_at"] > SNAPSHOT_MAX_AGE:
+        return None
+    return row
+
+
+def save_snapshot(tx, report_type, args, result, duration_ms, schedule_id=None):
+    """Store a new snapshot version and prune old ones; returns (snapshot_id, version)"""
+    key = params_key(args)
+    data = result.get("data") if isinstance(result, dict) else None
+    row = tx.fetch_one("""
+        INSERT INTO report_snapshots
+            (report_type, params_key, version, schedule_id, generated_at, duration_ms, row_count, result)
+        SELECT %s, %s, COALESCE(MAX(version), 0) + 1, %s, %s, %s, %s, %s::jsonb
+        FROM report_snapshots
+        WHERE report_type = %s AND params_key = %s
+        RETURNING snapshot_id, version
+    """, (report_type, key, schedule_id, datetime.now(), round(duration_ms, 1),
+          len(data) if isinstance(data, list) else 1, dumps(result), report_type, key))
+    tx.execute("""
+        DELETE FROM report_snapshots
+        WHERE report_type = %s AND params_key = %s AND version <= %s
+    """, (report_type, key, row["version"] - SNAPSHOTS_KEPT))
+    return row["snapshot_id"], row["version"]
+
+
+# ---------- worker ----------
+def _claim_due():
+    """Lock the most overdue schedule, move its next_run_at forward and return it"""
+    with transaction() as tx:
+        now = datetime.now()
+        schedule = tx.fetch_one("""
+            SELECT schedule_id, name, report_type, params, cron
+            FROM report_schedules
+            WHERE enabled AND next_run_at <= %s
+            ORDER BY next_run_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """, (now,))
+        if schedule is None:
+            return None
+        tx.execute("""
+            UPDATE report_schedules
+            SET next_run_at = %s, last_run_at = %s
+            WHERE schedule_id = %s
+        """, (CronSchedule(schedule["cron"]).next_after(now), now, schedule["schedule_id"]))
+    return schedule
+
+
+def run_schedule(schedule, compute):
+    """Compute one report and persist its snapshot plus a report_runs row"""
+    started_at = datetime.now()
+    started = time.perf_counter()
+    args = MultiDict(schedule["params"] or {})
+    try:
+        result = compute(schedule["report_type"], args)
+        duration_ms = (time.perf_counter() - started) * 1000
+        with transaction() as tx:
+            snapshot_id, version = save_snapshot(
+                tx, schedule["report_type"], args, result, duration_ms, schedule["schedule_id"])
+            tx.execute("""
+                INSERT INTO report_runs (schedule_id, report_type, started_at, finished_at, status, snapshot_id)
+                VALUES (%s, %s, %s, %s, 'success', %s)
+            """, (schedule["schedule_id"], schedule["report_type"], started_at, datetime.now(), snapshot_id))
+        return {"snapshot_id": snapshot_id, "version": version, "duration_ms": round(duration_ms, 1)}
+    except Exception as e:
+        with transaction() as tx:
+            tx.execute("""
+                INSERT INTO report_runs (schedule_id, report_type, started_at, finished_at, status, error)
+                VALUES (%s, %s, %s, %s, 'failed', %s)
+            """, (schedule["schedule_id"], schedule["report_type"], started_at, datetime.now(), str(e)))
+        raise
+
+
+def run_due(compute):
+    """Run every schedule that is due; safe to run in several workers at once"""
+    ensure_schema()
+    results = []
+    while True:
+        schedule = _claim_due()
+        if schedule is None:
+            return results
+        try:
+            outcome = run_schedule(schedule, compute)
+            print(f"Report '{schedule['name']}' -> snapshot v{outcome['version']} in {outcome['duration_ms']} ms", flush=True)
+            results.append({"schedule_id": schedule["schedule_id"], **outcome})
+        except Exception as e:
+            print(f"Report '{schedule['name']}' failed: {e}", flush=True)
+            results.append({"schedule_id": schedule["schedule_id"], "error": str(e)})
+
+
+def schedule_stats():
+    return fetch_all("""
+        SELECT
+            s.schedule_id, s.name, s.report_type, s.params, s.cron, s.enabled,
+            s.next_run_at, s.last_run_at,
+            r.status AS last_status, r.error AS last_error
+        FROM report_schedules s
+        LEFT JOIN LATERAL (
+            SELECT status, error
+            FROM report_runs
+            WHERE schedule_id = s.schedule_id
+            ORDER BY started_at DESC
+            LIMIT 1
+        ) r ON TRUE
+        ORDER BY s.next_run_at NULLS LAST
+    """)
+
+
+if __name__ == "__main__":
+    from routes.reports import compute_report
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run due schedules once and exit")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            run_due(compute_report)
+        except Exception as e:
+            print(f"Scheduler pass failed: {e}", flush=True)
+            if args.once:
+                raise
+        if args.once:
+            break
+        time.sleep(POLL_SECONDS)
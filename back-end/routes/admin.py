@@ -0,0 +1,33 @@
+from flask import Blueprint, jsonify, request
+import querystats
+import db
+import maintenance_stats
+from versions import bump
+
+admin_bp = Blueprint("admin", __name__)
+
+@admin_bp.route("/queries", methods=["GET"])
+def top_queries():
+    """Top query fingerprints by total time (or ?sort=p95|max|count|rows)"""
+    limit = request.args.get("limit", 20, type=int)
+    sort = request.args.get("sort", "total")
+    return jsonify({
+        "slow_query_ms": querystats.SLOW_QUERY_MS,
+        "db": db.stats(),
+        "queries": querystats.top(limit, sort)
+    })
+
+
+@admin_bp.route("/queries/reset", methods=["POST"])
+def reset_queries():
+    """Clear collected query statistics"""
+    querystats.reset()
+    return jsonify({"success": True})
+
+
+@admin_bp.route("/maintenance-aggregates/rebuild", methods=["POST"])
+def rebuild_maintenance_aggregates():
+    """Recompute maintenance_aggregates from asset_maintenance_records"""
+    rows = maintenance_stats.rebuild()
+    bump("maintenance")
+    return jsonify({"success": True, "rows": rows})
@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify, request
 from db import fetch_all, execute
+from versions import conditional, bump
 from datetime import datetime
 
 alerts_bp = Blueprint("alerts", __name__)
 
 @alerts_bp.route("/", methods=["GET"])
+@conditional("alerts", "assets", max_age=60)
 def get_alerts():
     """Get all alerts with filtering options - Only Geofencing and Unknown Asset alerts"""
     status = request.args.get("status", "all")  
@@ -43,10 +45,6 @@ def get_alerts():
     
     try:
         alerts = fetch_all(base_sql)
-        # Convert Decimal to float for JSON serialization
-        for alert in alerts:
-            if 'hours_open' in alert:
-                alert['hours_open'] = float(alert['hours_open'])
         return jsonify(alerts), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -74,6 +72,7 @@ def acknowledge_alert(alert_id):
     
     try:
         execute(sql, (acknowledged_by, alert_id))
+        bump("alerts")
         return jsonify({
             "success": True,
             "alert_id": alert_id,
@@ -112,6 +111,7 @@ def bulk_acknowledge():
     try:
         params = [acknowledged_by] + alert_ids
         execute(sql, params)
+        bump("alerts")
         return jsonify({
             "success": True,
             "acknowledged_count": len(alert_ids)
@@ -122,6 +122,7 @@ def bulk_acknowledge():
 
 
 @alerts_bp.route("/statistics", methods=["GET"])
+@conditional("alerts")
 def get_statistics():
     """Get alert statistics - Only Geofencing and Unknown Asset alerts"""
     sql = """
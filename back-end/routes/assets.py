@@ -1,9 +1,14 @@
 from flask import Blueprint, jsonify, request
-from db import fetch_all, execute_returning, execute
+from db import fetch_all, transaction
+from versions import conditional, bump
+import importer
+import maintenance_stats
+import asset_search
 
 assets_bp = Blueprint("assets", __name__)
 
 @assets_bp.route("/", methods=["GET"])
+@conditional("assets")
 def get_assets():
     """Get all assets with their categories and departments"""
     sql = """
@@ -34,39 +39,34 @@ def add_asset():
     """Add a new asset and optionally map it to a department"""
     try:
         data = request.json
-        print(f"Received data: {data}")  # Debug logging
         
         # Validate required fields
         if not data.get('asset_code') or not data.get('asset_name'):
             return jsonify({"error": "asset_code and asset_name are required"}), 400
         
-        # Insert the asset
-        insert_sql = """
-        INSERT INTO assets (asset_code, asset_name, manufacturer, model, purchase_cost)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING asset_id
-        """
-        
-        print(f"Inserting asset with values: {data['asset_code']}, {data['asset_name']}, {data.get('manufacturer')}, {data.get('model')}, {data.get('purchase_cost')}")
-        
-        asset_id = execute_returning(insert_sql, (
-            data['asset_code'],
-            data['asset_name'],
-            data.get('manufacturer'),
-            data.get('model'),
-            data.get('purchase_cost')
-        ))
-        
-        print(f"Asset created with ID: {asset_id}")
-        
-        # If department_id is provided, create the mapping
-        if data.get('department_id'):
-            mapping_sql = """
-            INSERT INTO asset_department_mapping (asset_id, department_id)
-            VALUES (%s, %s)
-            """
-            print(f"Creating department mapping: asset_id={asset_id}, department_id={data['department_id']}")
-            execute(mapping_sql, (asset_id, data['department_id']))
+        with transaction() as tx:
+            # Insert the asset
+            asset_id = tx.execute_returning("""
+                INSERT INTO assets (asset_code, asset_name, manufacturer, model, purchase_cost)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING asset_id
+            """, (
+                data['asset_code'],
+                data['asset_name'],
+                data.get('manufacturer'),
+                data.get('model'),
+                data.get('purchase_cost')
+            ))
+            
+            # If department_id is provided, create the mapping
+            if data.get('department_id'):
+                tx.execute("""
+                    INSERT INTO asset_department_mapping (asset_id, department_id)
+                    VALUES (%s, %s)
+                """, (asset_id, data['department_id']))
+            
+            asset_search.refresh(tx, [asset_id])
+            bump("assets", tx=tx)
         
         return jsonify({
             "success": True,
@@ -75,9 +75,54 @@ def add_asset():
         }), 201
         
     except Exception as e:
-        print(f"Error adding asset: {str(e)}")  # Debug logging
-        import traceback
-        traceback.print_exc()  # Print full stack trace
+        return jsonify({"error": str(e)}), 500
+
+
+@assets_bp.route("/import", methods=["POST"])
+def import_assets():
+    """
+    Bulk import assets with RFID tags, department mappings and allowed locations.
+
+    Accepts a CSV or NDJSON body (or multipart field "file"). Columns:
+    asset_code, asset_name, manufacturer, model, purchase_cost, purchase_date,
+    category_id|category, asset_type, department_id|department, rfid_uid,
+    allowed_room_ids, allowed_floor_ids, allowed_building_ids ("1;2;3").
+    ?dry_run=true validates and loads without committing.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, name, content_type = upload.stream, upload.filename or "", upload.mimetype
+    else:
+        stream, name, content_type = request.stream, "", request.mimetype
+
+    fmt = request.args.get("format")
+    if not fmt:
+        is_ndjson = "ndjson" in content_type or "jsonl" in content_type or name.endswith((".ndjson", ".jsonl"))
+        fmt = "ndjson" if is_ndjson else "csv"
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    dry_run = request.args.get("dry_run", "false").lower() in ("1", "true", "yes")
+
+    try:
+        result = importer.import_assets(stream, fmt, dry_run=dry_run)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@assets_bp.route("/search", methods=["GET"])
+@conditional("assets")
+def search_assets():
+    """
+    Typeahead search: ?q= matched against code, name, manufacturer, model,
+    RFID UID and department; prefixes rank first, then substrings and fuzzy
+    matches (from 3 characters). ?limit= (default 10, max 50).
+    """
+    try:
+        limit = request.args.get("limit", 10, type=int)
+        return jsonify(asset_search.search(request.args.get("q", ""), limit)), 200
+    except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
@@ -97,6 +142,7 @@ def get_departments():
 
 
 @assets_bp.route("/<int:asset_id>", methods=["GET"])
+@conditional("assets")
 def get_asset(asset_id):
     """Get a single asset by ID"""
     sql = """
@@ -131,40 +177,47 @@ def update_asset(asset_id):
     """Update an existing asset"""
     try:
         data = request.json
-        
-        # Update the asset
-        update_sql = """
-        UPDATE assets
-        SET asset_code = %s,
-            asset_name = %s,
-            manufacturer = %s,
-            model = %s,
-            purchase_cost = %s
-        WHERE asset_id = %s
-        """
-        
-        execute_returning(update_sql, (
-            data.get('asset_code'),
-            data.get('asset_name'),
-            data.get('manufacturer'),
-            data.get('model'),
-            data.get('purchase_cost'),
-            asset_id
-        ))
-        
-        # Update department mapping if provided
-        if 'department_id' in data:
-            # Delete existing mapping
-            delete_sql = "DELETE FROM asset_department_mapping WHERE asset_id = %s"
-            execute_returning(delete_sql, (asset_id,))
+        maintenance_stats.ensure_schema()
+        
+        with transaction() as tx:
+            # Update the asset
+            tx.execute("""
+                UPDATE assets
+                SET asset_code = %s,
+                    asset_name = %s,
+                    manufacturer = %s,
+                    model = %s,
+                    purchase_cost = %s
+                WHERE asset_id = %s
+            """, (
+                data.get('asset_code'),
+                data.get('asset_name'),
+                data.get('manufacturer'),
+                data.get('model'),
+                data.get('purchase_cost'),
+                asset_id
+            ))
             
-            # Insert new mapping if department_id is not null
-            if data['department_id']:
-                insert_sql = """
-                INSERT INTO asset_department_mapping (asset_id, department_id)
-                VALUES (%s, %s)
-                """
-                execute_returning(insert_sql, (asset_id, data['department_id']))
+            # Update department mapping if provided
+            if 'department_id' in data:
+                # Move the asset's maintenance aggregates to the new department
+                records = maintenance_stats.asset_records(tx, asset_id)
+                maintenance_stats.apply(tx, records, -1)
+
+                # Delete existing mapping
+                tx.execute("DELETE FROM asset_department_mapping WHERE asset_id = %s", (asset_id,))
+                
+                # Insert new mapping if department_id is not null
+                if data['department_id']:
+                    tx.execute("""
+                        INSERT INTO asset_department_mapping (asset_id, department_id)
+                        VALUES (%s, %s)
+                    """, (asset_id, data['department_id']))
+
+                maintenance_stats.apply(tx, records, +1)
+            
+            asset_search.refresh(tx, [asset_id])
+            bump("assets", tx=tx)
         
         return jsonify({
             "success": True,
@@ -179,13 +232,18 @@ def update_asset(asset_id):
 def delete_asset(asset_id):
     """Delete an asset"""
     try:
-        # Delete department mapping first (foreign key constraint)
-        delete_mapping_sql = "DELETE FROM asset_department_mapping WHERE asset_id = %s"
-        execute_returning(delete_mapping_sql, (asset_id,))
-        
-        # Delete the asset
-        delete_asset_sql = "DELETE FROM assets WHERE asset_id = %s"
-        execute_returning(delete_asset_sql, (asset_id,))
+        maintenance_stats.ensure_schema()
+        with transaction() as tx:
+            # Its maintenance records go with it (or block the delete)
+            maintenance_stats.apply(tx, maintenance_stats.asset_records(tx, asset_id), -1)
+
+            # Delete department mapping first (foreign key constraint)
+            tx.execute("DELETE FROM asset_department_mapping WHERE asset_id = %s", (asset_id,))
+            
+            # Delete the asset
+            tx.execute("DELETE FROM assets WHERE asset_id = %s", (asset_id,))
+            
+            bump("assets", tx=tx)
         
         return jsonify({
             "success": True,
@@ -193,4 +251,4 @@ def delete_asset(asset_id):
         }), 200
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -1,23 +1,23 @@
 from flask import Blueprint, request, jsonify
-from db import fetch_one
+from db import execute
+from versions import bump
 import jwt
-import bcrypt
-import os
-from datetime import datetime, timedelta
+import passwords
+import permissions
+import tokens
+from permissions import public, requires
 
 auth_bp = Blueprint('auth', __name__)
 
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except Exception as e:
-        print(f"Password verification error: {e}")
-        return False
+def _busy():
+    response = jsonify({"error": "Too many sign-in attempts in progress, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 
 @auth_bp.route("/login", methods=["POST", "OPTIONS"])
+@public
 def login():
     # Handle preflight OPTIONS request
     if request.method == "OPTIONS":
@@ -31,15 +31,7 @@ def login():
         return jsonify({"error": "Email and password required"}), 400
     
     # Fetch user from database INCLUDING password_hash
-    query = """
-        SELECT u.user_id, u.name, u.email, u.department_id, u.password_hash, r.role_name
-        FROM users u
-        LEFT JOIN user_roles ur ON u.user_id = ur.user_id
-        LEFT JOIN roles r ON ur.role_id = r.role_id
-        WHERE u.email = %s
-        LIMIT 1
-    """
-    user = fetch_one(query, (email,))
+    user = tokens.find_user(email=email)
     
     if not user:
         return jsonify({"error": "Invalid email or password"}), 401
@@ -48,29 +40,25 @@ def login():
     if not user.get('password_hash'):
         return jsonify({"error": "Account not configured. Please contact administrator."}), 401
     
-    # Verify password
-    if not verify_password(password, user['password_hash']):
+    # Verify password (on the bcrypt pool)
+    try:
+        valid = passwords.check(password, user['password_hash'])
+    except passwords.Busy:
+        return _busy()
+    if not valid:
         return jsonify({"error": "Invalid email or password"}), 401
     
     # Generate JWT token
-    token = jwt.encode({
-        'user_id': user['user_id'],
-        'email': user['email'],
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }, SECRET_KEY, algorithm='HS256')
+    token = tokens.issue(user)
     
     return jsonify({
         "token": token,
-        "user": {
-            "user_id": user['user_id'],
-            "name": user['name'],
-            "email": user['email'],
-            "department_id": user['department_id'],
-            "role": user['role_name']
-        }
+        "user": tokens.public_user(user),
+        "permissions": permissions.role_permissions(user['role_id'])
     }), 200
 
 @auth_bp.route("/verify", methods=["GET", "OPTIONS"])
+@public
 def verify_token():
     # Handle preflight OPTIONS request
     if request.method == "OPTIONS":
@@ -83,38 +71,27 @@ def verify_token():
     
     try:
         token = auth_header.split(' ')[1]
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
         
-        # Fetch fresh user data
-        query = """
-            SELECT u.user_id, u.name, u.email, u.department_id, r.role_name
-            FROM users u
-            LEFT JOIN user_roles ur ON u.user_id = ur.user_id
-            LEFT JOIN roles r ON ur.role_id = r.role_id
-            WHERE u.user_id = %s
-            LIMIT 1
-        """
-        user = fetch_one(query, (payload['user_id'],))
+        # Cached for a short TTL; role and password changes invalidate it
+        user = tokens.verify(token)
         
         if not user:
             return jsonify({"error": "User not found"}), 401
         
         return jsonify({
-            "user": {
-                "user_id": user['user_id'],
-                "name": user['name'],
-                "email": user['email'],
-                "department_id": user['department_id'],
-                "role": user['role_name']
-            }
+            "user": user,
+            "permissions": permissions.role_permissions(user['role_id'])
         }), 200
         
+    except IndexError:
+        return jsonify({"error": "Invalid token"}), 401
     except jwt.ExpiredSignatureError:
         return jsonify({"error": "Token expired"}), 401
     except jwt.InvalidTokenError:
         return jsonify({"error": "Invalid token"}), 401
 
 @auth_bp.route("/change-password", methods=["POST", "OPTIONS"])
+@requires()
 def change_password():
     """Allow users to change their password"""
     if request.method == "OPTIONS":
@@ -126,7 +103,7 @@ def change_password():
     
     try:
         token = auth_header.split(' ')[1]
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        payload = tokens.decode(token)
         user_id = payload['user_id']
         
         data = request.get_json()
@@ -140,20 +117,32 @@ def change_password():
             return jsonify({"error": "New password must be at least 6 characters"}), 400
         
         # Get current password hash
-        from db import fetch_one, execute
-        user = fetch_one("SELECT password_hash FROM users WHERE user_id = %s", (user_id,))
+        user = tokens.find_user(user_id=user_id)
         
-        if not user or not verify_password(old_password, user['password_hash']):
+        if not user or not passwords.check(old_password, user['password_hash']):
             return jsonify({"error": "Current password is incorrect"}), 401
         
         # Hash new password
-        salt = bcrypt.gensalt()
-        new_hash = bcrypt.hashpw(new_password.encode('utf-8'), salt).decode('utf-8')
+        new_hash = passwords.hash_password(new_password)
         
-        # Update password
+        # Update password; the bump invalidates cached tokens in every worker
         execute("UPDATE users SET password_hash = %s WHERE user_id = %s", (new_hash, user_id))
+        bump("users")
+        tokens.invalidate_user(user_id)
         
-        return jsonify({"message": "Password changed successfully"}), 200
+        return jsonify({
+            "message": "Password changed successfully",
+            "token": tokens.issue(dict(user, password_hash=new_hash))
+        }), 200
         
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
\ No newline at end of file
+    except passwords.Busy:
+        return _busy()
+    except (IndexError, jwt.InvalidTokenError):
+        return jsonify({"error": "Invalid token"}), 401
+
+
+@auth_bp.route("/stats", methods=["GET"])
+@requires("admin")
+def auth_stats():
+    """Token cache and bcrypt pool counters"""
+    return jsonify({"tokens": tokens.stats(), "passwords": passwords.stats()})
@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, current_app, jsonify, request
+import db
+from permissions import requires
+
+batch_bp = Blueprint("batch", __name__)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 20))
+# Sub-requests run in parallel, but never take more than this share of the
+# primary pool so interactive requests can still check out a connection
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", max(1, db.pool.maxconn // 2)))
+
+# Headers passed through to every sub-request
+FORWARDED_HEADERS = ("Authorization", "X-DB-Primary", "Cookie")
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
+
+
+def _run(app, item, headers):
+    """Dispatch one GET sub-request through the full Flask pipeline"""
+    started = time.perf_counter()
+    with app.test_request_context(item["path"], method="GET", headers=headers):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            response = app.make_response((jsonify({"error": str(e)}), 500))
+        body = response.get_json(silent=True)
+        if body is None:
+            body = response.get_data(as_text=True)
+    return {
+        "id": item["id"],
+        "path": item["path"],
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "body": body,
+    }
+
+
+@batch_bp.route("/batch", methods=["POST"])
+@requires()
+def batch():
+    """
+    Run several GET requests against existing routes in one round trip.
+
+    Body: {"requests": ["/api/reports/quick-stats", {"id": "tco", "path": "/api/reports/tco-summary"}, ...]}
+    Items run concurrently on a bounded thread pool; results keep request order.
+    """
+    data = request.get_json(silent=True) or {}
+    items = (data.get("requests") if isinstance(data, dict) else None) or []
+
+    if not isinstance(items, list):
+        return jsonify({"error": "requests must be a list"}), 400
+    if not items:
+        return jsonify({"error": "No requests provided"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} requests per batch"}), 400
+
+    normalized = []
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"path": item}
+        if not isinstance(item, dict):
+            return jsonify({"error": f"Request {i} must be a path or an object with a path"}), 400
+        path = item.get("path")
+        if not isinstance(path, str) or not path.startswith("/api/") or path.startswith("/api/batch"):
+            return jsonify({"error": f"Request {i}: invalid path: {path}"}), 400
+        normalized.append({"id": item.get("id", i), "path": path})
+
+    headers = {h: request.headers[h] for h in FORWARDED_HEADERS if h in request.headers}
+    app = current_app._get_current_object()
+
+    started = time.perf_counter()
+    results = list(_executor.map(lambda item: _run(app, item, headers), normalized))
+
+    return jsonify({
+        "results": results,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
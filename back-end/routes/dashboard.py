@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify
 from db import fetch_all
+from versions import conditional
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 @dashboard_bp.route("/", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def dashboard_assets():
     rows = fetch_all("""
         SELECT
@@ -0,0 +1,51 @@
+import time
+
+from flask import Blueprint, current_app, jsonify
+import db
+from permissions import public, requires
+
+health_bp = Blueprint("health", __name__)
+
+_started = time.monotonic()
+_draining = False
+
+
+def start_draining():
+    """Fail readiness from now on so load balancers stop routing here (shutdown)"""
+    global _draining
+    _draining = True
+
+
+@health_bp.route("/", methods=["GET"])
+@health_bp.route("/live", methods=["GET"])
+@public
+def live():
+    """Liveness: the process is up and serving; never touches the database"""
+    return jsonify({"status": "ok", "uptime_seconds": round(time.monotonic() - _started, 1)})
+
+
+@health_bp.route("/ready", methods=["GET"])
+@public
+def ready():
+    """Readiness: the primary answers within DB_READY_TIMEOUT; also warms the pool"""
+    if _draining:
+        return jsonify({"status": "draining"}), 503
+    timeout = current_app.config["DB_READY_TIMEOUT"]
+    try:
+        started = time.perf_counter()
+        db.ping(timeout=timeout)
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({
+        "status": "ready",
+        "db_latency_ms": latency_ms,
+        "startup_ms": current_app.config["STARTUP_MS"],
+        "blueprints": sorted(current_app.blueprints),
+    })
+
+
+@health_bp.route("/db", methods=["GET"])
+@requires("admin")
+def db_pool_stats():
+    return jsonify(db.stats())
@@ -1,9 +1,28 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from db import fetch_all, fetch_one, execute_returning_dict
+from db import fetch_all, fetch_one, transaction
+from versions import conditional, bump
+import maintenance_stats
+from maintenance_stats import RECORD_COLUMNS
 
 maintenance_bp = Blueprint("maintenance", __name__)
 
+
+@maintenance_bp.before_request
+def _ensure_aggregates():
+    maintenance_stats.ensure_schema()
+
+
+def _lock_record(tx, maintenance_id):
+    """Current version of a record, locked so its aggregate delta can be applied"""
+    return tx.fetch_one(f"""
+        SELECT {RECORD_COLUMNS}
+        FROM asset_maintenance_records
+        WHERE maintenance_id = %s
+        FOR UPDATE
+    """, (maintenance_id,))
+
+
 # --------------------------------------------------
 # Schedule
 # --------------------------------------------------
@@ -15,26 +34,29 @@ def schedule():
     if not all(k in data for k in required):
         return jsonify({"error": "Missing required fields"}), 400
 
-    query = """
+    query = f"""
     INSERT INTO asset_maintenance_records
     (asset_id, vendor_id, maintenance_type, description,
      maintenance_start, maintenance_cost, recorded_by, recorded_at)
     VALUES (%s,%s,%s,%s,%s,%s,%s,NOW())
-    RETURNING maintenance_id
+    RETURNING maintenance_id, {RECORD_COLUMNS}
     """
 
-    row = execute_returning_dict(query, (
-        data["asset_id"],
-        data.get("vendor_id"),
-        data["maintenance_type"],
-        data.get("description"),
-        data["scheduled_date"],
-        data.get("maintenance_cost"),
-        data["recorded_by"]
-    ))
+    with transaction() as tx:
+        row = tx.execute_returning_dict(query, (
+            data["asset_id"],
+            data.get("vendor_id"),
+            data["maintenance_type"],
+            data.get("description"),
+            data["scheduled_date"],
+            data.get("maintenance_cost"),
+            data["recorded_by"]
+        ))
+        maintenance_stats.apply(tx, [row], +1)
+        bump("maintenance", tx=tx)
 
     return jsonify({
-        "data": row,
+        "data": {"maintenance_id": row["maintenance_id"]},
         "message": "Maintenance scheduled"
     }), 201
 
@@ -46,22 +68,27 @@ def schedule():
 def complete():
     data = request.json
 
-    query = """
+    query = f"""
     UPDATE asset_maintenance_records
     SET maintenance_end = %s,
         maintenance_cost = COALESCE(%s, maintenance_cost)
     WHERE maintenance_id = %s
-    RETURNING maintenance_id
+    RETURNING {RECORD_COLUMNS}
     """
 
-    row = execute_returning_dict(query, (
-        data.get("completion_date", datetime.now()),
-        data.get("maintenance_cost"),
-        data["maintenance_id"]
-    ))
+    with transaction() as tx:
+        old = _lock_record(tx, data["maintenance_id"])
+        if not old:
+            return jsonify({"error": "Not found"}), 404
 
-    if not row:
-        return jsonify({"error": "Not found"}), 404
+        row = tx.execute_returning_dict(query, (
+            data.get("completion_date", datetime.now()),
+            data.get("maintenance_cost"),
+            data["maintenance_id"]
+        ))
+        maintenance_stats.apply(tx, [old], -1)
+        maintenance_stats.apply(tx, [row], +1)
+        bump("maintenance", tx=tx)
 
     return jsonify({"message": "Completed"})
 
@@ -73,20 +100,25 @@ def complete():
 def postpone():
     data = request.json
 
-    query = """
+    query = f"""
     UPDATE asset_maintenance_records
     SET maintenance_start = %s
     WHERE maintenance_id = %s
-    RETURNING maintenance_id
+    RETURNING {RECORD_COLUMNS}
     """
 
-    row = execute_returning_dict(query, (
-        data["new_date"],
-        data["maintenance_id"]
-    ))
+    with transaction() as tx:
+        old = _lock_record(tx, data["maintenance_id"])
+        if not old:
+            return jsonify({"error": "Not found"}), 404
 
-    if not row:
-        return jsonify({"error": "Not found"}), 404
+        row = tx.execute_returning_dict(query, (
+            data["new_date"],
+            data["maintenance_id"]
+        ))
+        maintenance_stats.apply(tx, [old], -1)
+        maintenance_stats.apply(tx, [row], +1)
+        bump("maintenance", tx=tx)
 
     return jsonify({"message": "Postponed"})
 
@@ -96,16 +128,19 @@ def postpone():
 # --------------------------------------------------
 @maintenance_bp.route("/delete/<int:maintenance_id>", methods=["DELETE"])
 def delete(maintenance_id):
-    query = """
+    query = f"""
     DELETE FROM asset_maintenance_records
     WHERE maintenance_id = %s
-    RETURNING maintenance_id
+    RETURNING {RECORD_COLUMNS}
     """
 
-    row = execute_returning_dict(query, (maintenance_id,))
+    with transaction() as tx:
+        row = tx.execute_returning_dict(query, (maintenance_id,))
+        if not row:
+            return jsonify({"error": "Maintenance record not found"}), 404
 
-    if not row:
-        return jsonify({"error": "Maintenance record not found"}), 404
+        maintenance_stats.apply(tx, [row], -1)
+        bump("maintenance", tx=tx)
 
     return jsonify({"message": "Maintenance record deleted successfully"}), 200
 
@@ -114,6 +149,7 @@ def delete(maintenance_id):
 # All Records
 # --------------------------------------------------
 @maintenance_bp.route("/all", methods=["GET"])
+@conditional("maintenance", "assets", max_age=60)
 def all_records():
 
     status = request.args.get("status")
@@ -153,19 +189,33 @@ def all_records():
 # Stats
 # --------------------------------------------------
 @maintenance_bp.route("/stats", methods=["GET"])
+@conditional("maintenance", max_age=60)
 def stats():
 
+    # Totals come from maintenance_aggregates; the date-window counts only
+    # touch pending records through the partial index on maintenance_start
     query = """
     SELECT
-        COUNT(*) FILTER (WHERE maintenance_end IS NULL AND maintenance_start < NOW()) AS overdue,
-        COUNT(*) FILTER (WHERE maintenance_end IS NULL) AS total_pending,
-        COUNT(*) FILTER (WHERE maintenance_end IS NOT NULL) AS completed_this_month,
-        COUNT(*) FILTER (
-            WHERE maintenance_end IS NULL
-            AND maintenance_start <= NOW() + INTERVAL '7 days'
-        ) AS due_this_week,
-        COALESCE(SUM(maintenance_cost) FILTER (WHERE maintenance_end IS NOT NULL), 0) AS total_cost_completed
-    FROM asset_maintenance_records
+        p.overdue,
+        COALESCE(m.total_pending, 0) AS total_pending,
+        COALESCE(m.completed_this_month, 0) AS completed_this_month,
+        p.due_this_week,
+        COALESCE(m.total_cost_completed, 0) AS total_cost_completed
+    FROM (
+        SELECT
+            SUM(pending) AS total_pending,
+            SUM(completed_in_month) FILTER (WHERE month = DATE_TRUNC('month', NOW())::date) AS completed_this_month,
+            SUM(completed_cost) AS total_cost_completed
+        FROM maintenance_aggregates
+    ) m
+    CROSS JOIN (
+        SELECT
+            COUNT(*) FILTER (WHERE maintenance_start < NOW()) AS overdue,
+            COUNT(*) AS due_this_week
+        FROM asset_maintenance_records
+        WHERE maintenance_end IS NULL
+          AND maintenance_start <= NOW() + INTERVAL '7 days'
+    ) p
     """
 
     row = fetch_one(query)
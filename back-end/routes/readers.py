@@ -1,51 +1,123 @@
-from flask import Blueprint, jsonify
-from db import fetch_all
+import threading
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+from db import fetch_all, execute
+from versions import conditional, snapshot
+import telemetry
+from ingest_schema import READER_LIVENESS_SCHEMA, READER_OFFLINE_AFTER, READER_WARNING_AFTER
 
 readers_bp = Blueprint("readers", __name__)
 
+# Written by the MQTT ingest process (reader_liveness.py); created here too so
+# the API works before the subscriber has ever run
+SCHEMA = READER_LIVENESS_SCHEMA
+
+READERS_SQL = """
+    SELECT
+        rr.reader_id,
+        rr.reader_code,
+        r.room_name,
+        f.name AS floor_name,
+        b.name AS building_name,
+        rl.status AS stored_status,
+        rl.status_since,
+        rl.last_heartbeat,
+        rl.last_voltage,
+        rl.wifi_quality,
+        rl.wifi_rssi
+    FROM room_rfid_readers rr
+    LEFT JOIN rooms r ON rr.room_id = r.room_id
+    LEFT JOIN floors f ON r.floor_id = f.floor_id
+    LEFT JOIN buildings b ON f.building_id = b.building_id
+    LEFT JOIN reader_liveness rl ON rl.reader_id = rr.reader_id
+    ORDER BY rr.reader_code
+"""
+
+_lock = threading.Lock()
+_cache = {"versions": None, "rows": None}
+_schema_ready = False
+
+
+def current_readers():
+    """Reader list with liveness, re-read only when the readers version moves"""
+    global _schema_ready
+    versions, _ = snapshot(("readers",))
+    with _lock:
+        if _cache["versions"] == versions:
+            return _cache["rows"]
+    if not _schema_ready:
+        execute(SCHEMA)
+        _schema_ready = True
+    rows = fetch_all(READERS_SQL)
+    with _lock:
+        _cache["versions"], _cache["rows"] = versions, rows
+    return rows
+
+
+def with_status(row, now):
+    """
+    Row with status from the heartbeat age at ``now``. The stored status is
+    only as fresh as the ingest's last flush, and stays Online forever if the
+    ingest stops; when the age disagrees, status_since becomes the moment
+    the cut-off passed.
+    """
+    row = dict(row)
+    stored = row.pop("stored_status")
+    heartbeat = row["last_heartbeat"]
+    if heartbeat is None:
+        status, crossed = "Offline", None
+    elif now - heartbeat >= READER_OFFLINE_AFTER:
+        status, crossed = "Offline", heartbeat + READER_OFFLINE_AFTER
+    elif now - heartbeat >= READER_WARNING_AFTER:
+        status, crossed = "Warning", heartbeat + READER_WARNING_AFTER
+    else:
+        status, crossed = "Online", heartbeat
+    row["status"] = status
+    if status != stored and crossed is not None:
+        row["status_since"] = crossed
+    return row
+
+
 @readers_bp.route("/", methods=["GET"])
+# Status moves with the clock as well as with writes
+@conditional("readers", max_age=30)
 def get_readers():
-    rows = fetch_all("""
-        SELECT
-            rr.reader_id,
-            rr.reader_code,
-            r.room_name,
-            f.name AS floor_name,
-            b.name AS building_name,
-
-            CASE
-                WHEN hl.recorded_at > NOW() - INTERVAL '5 minutes' THEN 'Online'
-                WHEN hl.recorded_at > NOW() - INTERVAL '1 hour' THEN 'Warning'
-                ELSE 'Offline'
-            END AS status,
-
-            hl.recorded_at AS last_heartbeat,
-            pl.voltage AS last_voltage,
-            hl.wifi_quality,
-            hl.wifi_rssi
-
-        FROM room_rfid_readers rr
-
-        LEFT JOIN rooms r ON rr.room_id = r.room_id
-        LEFT JOIN floors f ON r.floor_id = f.floor_id
-        LEFT JOIN buildings b ON f.building_id = b.building_id
-
-        LEFT JOIN LATERAL (
-            SELECT *
-            FROM esp32_health_logs
-            WHERE reader_id = rr.reader_id
-            ORDER BY recorded_at DESC
-            LIMIT 1
-        ) hl ON TRUE
-
-        LEFT JOIN LATERAL (
-            SELECT *
-            FROM esp32_power_logs
-            WHERE reader_id = rr.reader_id
-            ORDER BY recorded_at DESC
-            LIMIT 1
-        ) pl ON TRUE
-
-        ORDER BY rr.reader_code
-    """)
-    return jsonify(rows)
+    # Naive local time, like last_heartbeat
+    now = datetime.now()
+    return jsonify([with_status(row, now) for row in current_readers()])
+
+
+def _parse_ts(value):
+    # Rollup buckets are naive local time, like recorded_at
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+@readers_bp.route("/<int:reader_id>/telemetry", methods=["GET"])
+def reader_telemetry(reader_id):
+    """
+    RSSI / wifi quality / voltage history for one reader between ?from= and
+    ?to= (default: last 24 hours). ?resolution=1m|1h|1d overrides the
+    automatic choice, which picks the finest rollup still retained for the range.
+    """
+    now = datetime.now()
+    try:
+        end = _parse_ts(request.args["to"]) if request.args.get("to") else now
+        start = _parse_ts(request.args["from"]) if request.args.get("from") else end - timedelta(hours=24)
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO timestamps"}), 400
+    if start >= end:
+        return jsonify({"error": "from must be before to"}), 400
+
+    resolution = request.args.get("resolution")
+    if resolution and resolution not in telemetry.LEVELS:
+        return jsonify({"error": f"resolution must be one of {', '.join(telemetry.LEVELS)}"}), 400
+
+    resolution, points = telemetry.history(reader_id, start, end, now, resolution)
+    return jsonify({
+        "reader_id": reader_id,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "points": points,
+    })
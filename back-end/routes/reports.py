@@ -1,15 +1,28 @@
-from flask import Blueprint, request, jsonify
-from db import fetch_all, fetch_one
-from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify
+from werkzeug.datastructures import MultiDict
+from db import fetch_all, fetch_one, open_rows, transaction
+import exporters
+import maintenance_stats
+import report_jobs
+import report_scheduler
+from permissions import requires
+from report_scheduler import CronSchedule
+from datetime import datetime
+import json
 
 reports_bp = Blueprint("reports", __name__)
 
+
+@reports_bp.before_request
+def _ensure_report_tables():
+    report_scheduler.ensure_schema()
+    maintenance_stats.ensure_schema()
+
 # =====================================================
 # DEPARTMENT REPORTS
 # =====================================================
-@reports_bp.route("/department-summary", methods=["GET"])
-def department_summary():
-    """Get asset distribution and value by department"""
+def department_summary_query(args):
+    """Query and params for /department-summary"""
     query = """
     SELECT 
         d.name AS department,
@@ -57,17 +70,21 @@ def department_summary():
     HAVING COUNT(a.asset_id) > 0
     ORDER BY total_value DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
+
+    return query, None
+
+
+@reports_bp.route("/department-summary", methods=["GET"])
+def department_summary():
+    """Get asset distribution and value by department"""
+    return serve_report("department-summary")
 
 # =====================================================
 # UTILIZATION REPORTS
 # =====================================================
-@reports_bp.route("/utilization-trends", methods=["GET"])
-def utilization_trends():
-    """Get asset utilization trends with detailed metrics"""
-    time_range = request.args.get('time_range', 'week')  # day, week, month, quarter, year
+def utilization_trends_query(args):
+    """Query and params for /utilization-trends"""
+    time_range = args.get('time_range', 'week')  # day, week, month, quarter, year
     
     # Map time ranges to intervals
     interval_map = {
@@ -125,18 +142,22 @@ def utilization_trends():
     GROUP BY a.asset_id, a.asset_code, a.asset_name, ac.name
     ORDER BY avg_utilization DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
+
+    return query, None
+
+
+@reports_bp.route("/utilization-trends", methods=["GET"])
+def utilization_trends():
+    """Get asset utilization trends with detailed metrics"""
+    return serve_report("utilization-trends")
 
 
 # =====================================================
 # MAINTENANCE REPORTS
 # =====================================================
-@reports_bp.route("/maintenance-history", methods=["GET"])
-def maintenance_history():
-    """Get maintenance history with detailed information"""
-    time_range = request.args.get('time_range', 'month')
+def maintenance_history_query(args):
+    """Query and params for /maintenance-history"""
+    time_range = args.get('time_range', 'month')
     
     interval_map = {
         'week': '7 days',
@@ -181,127 +202,163 @@ def maintenance_history():
     WHERE m.maintenance_start >= NOW() - INTERVAL '{interval}'
     ORDER BY m.maintenance_start DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
 
+    return query, None
 
-@reports_bp.route("/maintenance-summary", methods=["GET"])
-def maintenance_summary():
-    """Get maintenance cost summary by category"""
+
+@reports_bp.route("/maintenance-history", methods=["GET"])
+def maintenance_history():
+    """Get maintenance history with detailed information"""
+    return serve_report("maintenance-history")
+
+
+def maintenance_summary_query(args):
+    """Query and params for /maintenance-summary"""
     query = """
     SELECT 
         ac.name AS category,
-        COUNT(DISTINCT a.asset_id) AS asset_count,
-        COUNT(m.maintenance_id) AS maintenance_count,
-        COALESCE(SUM(m.maintenance_cost), 0) AS total_maintenance_cost,
-        COALESCE(AVG(m.maintenance_cost), 0) AS avg_cost_per_maintenance,
-        COALESCE(
-            SUM(m.maintenance_cost) / NULLIF(COUNT(DISTINCT a.asset_id), 0),
-            0
-        ) AS cost_per_asset
-    FROM asset_categories ac
-    LEFT JOIN assets a ON ac.category_id = a.category_id
-    LEFT JOIN asset_maintenance_records m ON a.asset_id = m.asset_id
-    WHERE m.maintenance_end IS NOT NULL  -- Only completed maintenance
-    GROUP BY ac.name
+        COALESCE(a.asset_count, 0) AS asset_count,
+        m.maintenance_count,
+        m.total_maintenance_cost,
+        COALESCE(m.total_maintenance_cost / NULLIF(m.costed_count, 0), 0) AS avg_cost_per_maintenance,
+        COALESCE(m.total_maintenance_cost / NULLIF(a.asset_count, 0), 0) AS cost_per_asset
+    FROM (
+        -- Completed maintenance per category from maintenance_aggregates
+        SELECT
+            category_id,
+            SUM(completed) AS maintenance_count,
+            SUM(completed_costed) AS costed_count,
+            SUM(completed_cost) AS total_maintenance_cost
+        FROM maintenance_aggregates
+        GROUP BY category_id
+        HAVING SUM(completed) > 0
+    ) m
+    JOIN asset_categories ac ON ac.category_id = m.category_id
+    LEFT JOIN (
+        -- Assets with completed maintenance
+        SELECT category_id, COUNT(*) AS asset_count
+        FROM maintenance_asset_totals
+        WHERE completed > 0
+        GROUP BY category_id
+    ) a ON a.category_id = m.category_id
     ORDER BY total_maintenance_cost DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
+
+    return query, None
+
+
+@reports_bp.route("/maintenance-summary", methods=["GET"])
+def maintenance_summary():
+    """Get maintenance cost summary by category"""
+    return serve_report("maintenance-summary")
 
 
 # =====================================================
 # FINANCIAL REPORTS (TCO)
 # =====================================================
-@reports_bp.route("/tco-summary", methods=["GET"])
-def tco_summary():
-    """Total Cost of Ownership summary"""
+def tco_summary_query(args):
+    """Query and params for /tco-summary"""
     query = """
     SELECT 
         ac.name AS category,
-        COUNT(a.asset_id) AS asset_count,
+        a.asset_count,
         
         -- Purchase costs
-        COALESCE(SUM(a.purchase_cost), 0) AS total_purchase_cost,
+        a.total_purchase_cost,
         
         -- Maintenance costs (completed only)
-        COALESCE(
-            SUM(m.maintenance_cost) FILTER (WHERE m.maintenance_end IS NOT NULL),
-            0
-        ) AS total_maintenance_cost,
+        COALESCE(m.total_maintenance_cost, 0) AS total_maintenance_cost,
         
         -- Total TCO
-        COALESCE(SUM(a.purchase_cost), 0) + 
-        COALESCE(
-            SUM(m.maintenance_cost) FILTER (WHERE m.maintenance_end IS NOT NULL),
-            0
-        ) AS total_tco,
+        a.total_purchase_cost + COALESCE(m.total_maintenance_cost, 0) AS total_tco,
         
         -- Cost per asset
-        (
-            COALESCE(SUM(a.purchase_cost), 0) + 
-            COALESCE(
-                SUM(m.maintenance_cost) FILTER (WHERE m.maintenance_end IS NOT NULL),
-                0
-            )
-        ) / NULLIF(COUNT(a.asset_id), 0) AS cost_per_asset
+        (a.total_purchase_cost + COALESCE(m.total_maintenance_cost, 0)) / a.asset_count AS cost_per_asset
         
     FROM asset_categories ac
-    LEFT JOIN assets a ON ac.category_id = a.category_id
-    LEFT JOIN asset_maintenance_records m ON a.asset_id = m.asset_id
-    GROUP BY ac.name
-    HAVING COUNT(a.asset_id) > 0
+    JOIN (
+        SELECT
+            category_id,
+            COUNT(*) AS asset_count,
+            COALESCE(SUM(purchase_cost), 0) AS total_purchase_cost
+        FROM assets
+        GROUP BY category_id
+    ) a ON a.category_id = ac.category_id
+    LEFT JOIN (
+        SELECT category_id, SUM(completed_cost) AS total_maintenance_cost
+        FROM maintenance_aggregates
+        GROUP BY category_id
+    ) m ON m.category_id = ac.category_id
     ORDER BY total_tco DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
 
+    return query, None
 
-@reports_bp.route("/financial-overview", methods=["GET"])
-def financial_overview():
-    """Get overall financial metrics"""
+
+@reports_bp.route("/tco-summary", methods=["GET"])
+def tco_summary():
+    """Total Cost of Ownership summary"""
+    return serve_report("tco-summary")
+
+
+def financial_overview_query(args):
+    """Query and params for /financial-overview"""
     query = """
     SELECT 
         -- Total acquisition cost
-        (SELECT COALESCE(SUM(purchase_cost), 0) FROM assets) AS total_acquisition_cost,
+        a.total_acquisition_cost,
         
         -- Maintenance cost YTD
-        (SELECT COALESCE(SUM(maintenance_cost), 0) 
-         FROM asset_maintenance_records 
-         WHERE EXTRACT(YEAR FROM maintenance_start) = EXTRACT(YEAR FROM NOW())
-         AND maintenance_end IS NOT NULL) AS maintenance_cost_ytd,
+        m.maintenance_cost_ytd,
         
         -- Maintenance cost this month
-        (SELECT COALESCE(SUM(maintenance_cost), 0) 
-         FROM asset_maintenance_records 
-         WHERE DATE_TRUNC('month', maintenance_start) = DATE_TRUNC('month', NOW())
-         AND maintenance_end IS NOT NULL) AS maintenance_cost_this_month,
+        m.maintenance_cost_this_month,
         
         -- Average cost per asset
-        (SELECT COALESCE(AVG(purchase_cost), 0) FROM assets) AS avg_asset_cost,
+        a.avg_asset_cost,
         
         -- Total assets
-        (SELECT COUNT(*) FROM assets) AS total_assets,
+        a.total_assets,
         
         -- Completed maintenance count
-        (SELECT COUNT(*) 
-         FROM asset_maintenance_records 
-         WHERE maintenance_end IS NOT NULL) AS completed_maintenance_count
+        m.completed_maintenance_count
+    FROM (
+        -- One pass over assets
+        SELECT
+            COALESCE(SUM(purchase_cost), 0) AS total_acquisition_cost,
+            COALESCE(AVG(purchase_cost), 0) AS avg_asset_cost,
+            COUNT(*) AS total_assets
+        FROM assets
+    ) a
+    CROSS JOIN (
+        -- Completed maintenance by start month, from maintenance_aggregates
+        SELECT
+            COALESCE(SUM(completed_cost) FILTER (
+                WHERE month >= DATE_TRUNC('year', NOW())::date
+                  AND month < (DATE_TRUNC('year', NOW()) + INTERVAL '1 year')::date
+            ), 0) AS maintenance_cost_ytd,
+            COALESCE(SUM(completed_cost) FILTER (
+                WHERE month = DATE_TRUNC('month', NOW())::date
+            ), 0) AS maintenance_cost_this_month,
+            COALESCE(SUM(completed), 0) AS completed_maintenance_count
+        FROM maintenance_aggregates
+    ) m
     """
-    
-    row = fetch_one(query)
-    return jsonify(row)
+
+    return query, None
+
+
+@reports_bp.route("/financial-overview", methods=["GET"])
+def financial_overview():
+    """Get overall financial metrics"""
+    return serve_report("financial-overview")
 
 
 # =====================================================
 # ASSET VALUE REPORTS
 # =====================================================
-@reports_bp.route("/asset-value-by-department", methods=["GET"])
-def asset_value_by_department():
-    """Get total asset value grouped by department"""
+def asset_value_by_department_query(args):
+    """Query and params for /asset-value-by-department"""
     query = """
     SELECT 
         d.name AS department,
@@ -314,46 +371,57 @@ def asset_value_by_department():
     GROUP BY d.name
     ORDER BY total_value DESC
     """
-    
-    rows = fetch_all(query)
-    return jsonify({"data": rows})
+
+    return query, None
+
+
+@reports_bp.route("/asset-value-by-department", methods=["GET"])
+def asset_value_by_department():
+    """Get total asset value grouped by department"""
+    return serve_report("asset-value-by-department")
 
 
 # =====================================================
 # QUICK STATS FOR DASHBOARD
 # =====================================================
-@reports_bp.route("/quick-stats", methods=["GET"])
-def quick_stats():
-    """Get quick statistics for the reporting dashboard"""
+def quick_stats_query(args):
+    """Query and params for /quick-stats"""
     query = """
     SELECT 
-        (SELECT COALESCE(SUM(purchase_cost), 0) FROM assets) AS total_asset_value,
-        (SELECT COUNT(*) FROM assets) AS total_assets,
+        COALESCE(SUM(purchase_cost), 0) AS total_asset_value,
+        COUNT(*) AS total_assets,
         
         -- Average asset age in months
-        (SELECT COALESCE(
+        COALESCE(
             AVG(EXTRACT(EPOCH FROM (NOW() - purchase_date)) / (30 * 24 * 60 * 60)),
             0
-        ) FROM assets) AS avg_asset_age_months,
+        ) AS avg_asset_age_months,
         
-        -- Reports generated (mock - you can track this in a reports_log table)
-        47 AS reports_generated_this_month,
+        -- Scheduled report runs this month
+        (SELECT COUNT(*)
+         FROM report_runs
+         WHERE status = 'success'
+           AND started_at >= date_trunc('month', NOW())) AS reports_generated_this_month,
         
-        -- Scheduled reports (mock - you can store this in a scheduled_reports table)
-        12 AS scheduled_reports_count
+        (SELECT COUNT(*) FROM report_schedules WHERE enabled) AS scheduled_reports_count
+    FROM assets
     """
-    
-    row = fetch_one(query)
-    return jsonify(row)
+
+    return query, None
+
+
+@reports_bp.route("/quick-stats", methods=["GET"])
+def quick_stats():
+    """Get quick statistics for the reporting dashboard"""
+    return serve_report("quick-stats")
 
 
 # =====================================================
 # LOST/MISSING ASSETS REPORT
 # =====================================================
-@reports_bp.route("/missing-assets", methods=["GET"])
-def missing_assets():
-    """Get assets that haven't been scanned in a long time (potentially lost)"""
-    days_threshold = request.args.get('days', 30, type=int)
+def missing_assets_query(args):
+    """Query and params for /missing-assets"""
+    days_threshold = args.get('days', 30, type=int)
     
     query = """
     SELECT 
@@ -391,33 +459,337 @@ def missing_assets():
         EXTRACT(DAY FROM (NOW() - MAX(s.scan_time))) >= %s
     ORDER BY days_since_seen DESC
     """
-    
-    rows = fetch_all(query, (days_threshold,))
+
+    return query, (days_threshold,)
+
+
+@reports_bp.route("/missing-assets", methods=["GET"])
+def missing_assets():
+    """Get assets that haven't been scanned in a long time (potentially lost)"""
+    return serve_report("missing-assets")
+
+
+# =====================================================
+# RAW SCAN HISTORY (export only)
+# =====================================================
+def _timestamp_arg(args, name):
+    """Optional ISO date/timestamp query parameter; ValueError when malformed"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or timestamp, got '{value}'")
+
+
+def scan_history_query(args):
+    """Query and params for raw scan history between ?from= and ?to= (default: last 24 hours)"""
+    start = _timestamp_arg(args, 'from')
+    end = _timestamp_arg(args, 'to')
+
+    query = """
+    SELECT
+        s.scan_id,
+        s.scan_time,
+        a.asset_code,
+        a.asset_name,
+        t.rfid_uid,
+        rr.reader_code,
+        r.room_name,
+        f.name AS floor_name,
+        b.name AS building_name
+    FROM asset_room_scan_events s
+    JOIN assets a ON s.asset_id = a.asset_id
+    LEFT JOIN asset_tags t ON s.tag_id = t.tag_id
+    LEFT JOIN room_rfid_readers rr ON s.reader_id = rr.reader_id
+    LEFT JOIN rooms r ON s.room_id = r.room_id
+    LEFT JOIN floors f ON r.floor_id = f.floor_id
+    LEFT JOIN buildings b ON f.building_id = b.building_id
+    WHERE s.scan_time >= COALESCE(%s::timestamp, NOW() - INTERVAL '24 hours')
+      AND s.scan_time < COALESCE(%s::timestamp, NOW())
+    ORDER BY s.scan_time
+    """
+
+    return query, (start, end)
+
+
+# =====================================================
+# SNAPSHOT-BACKED REPORTS
+# =====================================================
+# report type -> (query builder, returns a single row)
+REPORTS = {
+    'department-summary': (department_summary_query, False),
+    'utilization-trends': (utilization_trends_query, False),
+    'maintenance-history': (maintenance_history_query, False),
+    'maintenance-summary': (maintenance_summary_query, False),
+    'tco-summary': (tco_summary_query, False),
+    'financial-overview': (financial_overview_query, True),
+    'asset-value-by-department': (asset_value_by_department_query, False),
+    'quick-stats': (quick_stats_query, True),
+    'missing-assets': (missing_assets_query, False),
+}
+
+
+def compute_report(report_type, args):
+    """Run a report live and return its response body"""
+    maintenance_stats.ensure_schema()
+    build, single = REPORTS[report_type]
+    query, params = build(args)
+    if single:
+        return fetch_one(query, params)
+    return {"data": fetch_all(query, params)}
+
+
+def serve_report(report_type):
+    """
+    Latest scheduled snapshot for these parameters when there is one, else
+    the live result. ?fresh=true always computes live.
+    """
+    fresh = request.args.get('fresh', 'false').lower() in ('1', 'true', 'yes')
+    if not fresh:
+        snapshot = report_scheduler.latest(report_type, request.args)
+        if snapshot is not None:
+            response = Response(snapshot["result"], mimetype="application/json")
+            response.headers["X-Report-Snapshot"] = str(snapshot["version"])
+            response.headers["X-Report-Generated-At"] = snapshot["generated_at"].isoformat()
+            return response
+    return jsonify(compute_report(report_type, request.args))
+
+
+# =====================================================
+# BACKGROUND REPORT JOBS
+# =====================================================
+jobs = report_jobs.JobQueue(report_jobs.report_runner(REPORTS))
+
+
+@reports_bp.route("/jobs", methods=["POST"])
+@requires("reports:read")
+def submit_report_job():
+    """
+    Queue a report. Body: {"report_type": "missing-assets", "params": {"days": 30}}.
+    Returns 202 with a job id; an identical job already queued or running is reused.
+    """
+    data = request.get_json() or {}
+    report_type = data.get('report_type')
+    if report_type not in REPORTS:
+        return jsonify({"error": f"report_type must be one of: {', '.join(REPORTS)}"}), 400
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({"error": "params must be an object"}), 400
+
+    try:
+        job, deduplicated = jobs.submit(report_type, MultiDict(params))
+    except report_jobs.QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    body = job.to_dict()
+    body["deduplicated"] = deduplicated
+    return jsonify(body), 202, {"Location": f"{request.script_root}/api/reports/jobs/{job.id}"}
+
+
+@reports_bp.route("/jobs", methods=["GET"])
+def report_job_stats():
+    return jsonify(jobs.stats())
+
+
+@reports_bp.route("/jobs/<job_id>", methods=["GET"])
+def report_job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job.to_dict())
+
+
+@reports_bp.route("/jobs/<job_id>/result", methods=["GET"])
+def report_job_result(job_id):
+    """Result of a finished job; ?format=csv|ndjson streams it like /export"""
+    job = jobs.get(job_id, with_result=True)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    if not job.finished:
+        return jsonify(job.to_dict()), 202, {"Retry-After": "2"}
+    if job.status != report_jobs.DONE:
+        return jsonify(job.to_dict()), 409 if job.status == report_jobs.CANCELLED else 500
+
+    fmt = request.args.get('format')
+    if fmt is None:
+        return jsonify(job.result)
+    if fmt not in exporters.FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+    rows = job.result.get("data", []) if "data" in (job.result or {}) else [job.result or {}]
+    mimetype, chunks = exporters.stream(iter(rows), fmt, gzip=False)
+    filename = f"{job.report_type}-{job.id[:8]}.{fmt}"
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@reports_bp.route("/jobs/<job_id>", methods=["DELETE"])
+@requires("reports:read")
+def cancel_report_job(job_id):
+    """Cancel a job that has not started yet"""
+    if not jobs.cancel(job_id):
+        return jsonify({"error": "Job not found or already running"}), 409
+    return jsonify({"success": True})
+
+
+# =====================================================
+# REPORT SCHEDULES
+# =====================================================
+def _schedule_fields(data):
+    """Validate a schedule body; returns (fields, error)"""
+    report_type = data.get('report_type')
+    if report_type not in REPORTS:
+        return None, f"report_type must be one of: {', '.join(REPORTS)}"
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return None, "params must be an object"
+    try:
+        cron = CronSchedule(data.get('cron', ''))
+    except ValueError as e:
+        return None, str(e)
+    return {
+        "name": data.get('name') or report_type,
+        "report_type": report_type,
+        "params": params,
+        "cron": cron.expr,
+        "enabled": bool(data.get('enabled', True)),
+        "next_run_at": cron.next_after(datetime.now()),
+    }, None
+
+
+@reports_bp.route("/schedules", methods=["GET"])
+def list_schedules():
+    """Report schedules with their next run and last outcome"""
+    return jsonify({"data": report_scheduler.schedule_stats()})
+
+
+@reports_bp.route("/schedules", methods=["POST"])
+def create_schedule():
+    """Body: {"name", "report_type", "params": {...}, "cron": "0 2 * * *", "enabled"}"""
+    fields, error = _schedule_fields(request.get_json() or {})
+    if error:
+        return jsonify({"error": error}), 400
+
+    with transaction() as tx:
+        row = tx.execute_returning_dict("""
+            INSERT INTO report_schedules (name, report_type, params, cron, enabled, next_run_at)
+            VALUES (%s, %s, %s::jsonb, %s, %s, %s)
+            RETURNING *
+        """, (fields["name"], fields["report_type"], json.dumps(fields["params"]),
+              fields["cron"], fields["enabled"], fields["next_run_at"]))
+    return jsonify(row), 201
+
+
+@reports_bp.route("/schedules/<int:schedule_id>", methods=["PUT"])
+def update_schedule(schedule_id):
+    fields, error = _schedule_fields(request.get_json() or {})
+    if error:
+        return jsonify({"error": error}), 400
+
+    with transaction() as tx:
+        row = tx.execute_returning_dict("""
+            UPDATE report_schedules
+            SET name = %s, report_type = %s, params = %s::jsonb, cron = %s, enabled = %s, next_run_at = %s
+            WHERE schedule_id = %s
+            RETURNING *
+        """, (fields["name"], fields["report_type"], json.dumps(fields["params"]),
+              fields["cron"], fields["enabled"], fields["next_run_at"], schedule_id))
+    if row is None:
+        return jsonify({"error": "Schedule not found"}), 404
+    return jsonify(row)
+
+
+@reports_bp.route("/schedules/<int:schedule_id>", methods=["DELETE"])
+def delete_schedule(schedule_id):
+    with transaction() as tx:
+        deleted = tx.execute("DELETE FROM report_schedules WHERE schedule_id = %s", (schedule_id,))
+    if not deleted:
+        return jsonify({"error": "Schedule not found"}), 404
+    return jsonify({"success": True})
+
+
+@reports_bp.route("/schedules/<int:schedule_id>/run", methods=["POST"])
+def run_schedule_now(schedule_id):
+    """Produce a new snapshot immediately, outside the schedule"""
+    schedule = fetch_one("""
+        SELECT schedule_id, name, report_type, params, cron
+        FROM report_schedules
+        WHERE schedule_id = %s
+    """, (schedule_id,))
+    if schedule is None:
+        return jsonify({"error": "Schedule not found"}), 404
+    return jsonify(report_scheduler.run_schedule(schedule, compute_report))
+
+
+@reports_bp.route("/snapshots", methods=["GET"])
+def list_snapshots():
+    """Stored snapshot versions (without results), optionally for one ?report_type="""
+    rows = fetch_all("""
+        SELECT snapshot_id, report_type, params_key, version, schedule_id,
+               generated_at, duration_ms, row_count
+        FROM report_snapshots
+        WHERE %(report_type)s::text IS NULL OR report_type = %(report_type)s
+        ORDER BY report_type, params_key, version DESC
+    """, {"report_type": request.args.get('report_type')})
     return jsonify({"data": rows})
 
 
+@reports_bp.route("/snapshots/<int:snapshot_id>", methods=["GET"])
+def get_snapshot(snapshot_id):
+    """One snapshot version's stored result"""
+    row = fetch_one("SELECT result::text AS result FROM report_snapshots WHERE snapshot_id = %s", (snapshot_id,))
+    if row is None:
+        return jsonify({"error": "Snapshot not found"}), 404
+    return Response(row["result"], mimetype="application/json")
+
+
 # =====================================================
-# EXPORT FUNCTIONALITY (CSV/PDF preparation)
+# EXPORT FUNCTIONALITY (streamed CSV / NDJSON)
 # =====================================================
+EXPORTS = {
+    'department': department_summary_query,
+    'utilization': utilization_trends_query,
+    'maintenance': maintenance_history_query,
+    'maintenance-summary': maintenance_summary_query,
+    'tco': tco_summary_query,
+    'financial': financial_overview_query,
+    'asset-value': asset_value_by_department_query,
+    'quick-stats': quick_stats_query,
+    'missing': missing_assets_query,
+    'history': scan_history_query,
+}
+
+
 @reports_bp.route("/export/<report_type>", methods=["GET"])
-def prepare_export(report_type):
-    """Prepare data for export - frontend will handle actual download"""
-    
-    # Map report types to their respective endpoints
-    report_map = {
-        'department': '/api/reports/department-summary',
-        'utilization': '/api/reports/utilization-trends',
-        'maintenance': '/api/reports/maintenance-history',
-        'tco': '/api/reports/tco-summary',
-        'missing': '/api/reports/missing-assets'
-    }
-    
-    if report_type not in report_map:
+def export_report(report_type):
+    """
+    Stream a report as CSV or NDJSON straight from a server-side cursor.
+
+    Query params: format=csv|ndjson (default csv), gzip=true, plus the
+    report's own filters (time_range, days, from/to, ...). The query runs
+    and its first batch is fetched before the 200 goes out, so bad filters
+    and SQL errors come back as 400 / 500 rather than a truncated file.
+    """
+    if report_type not in EXPORTS:
         return jsonify({"error": "Invalid report type"}), 400
-    
-    return jsonify({
-        "message": "Export data prepared",
-        "report_type": report_type,
-        "timestamp": datetime.now().isoformat(),
-        "endpoint": report_map[report_type]
-    })
\ No newline at end of file
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporters.FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+
+    use_gzip = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+
+    try:
+        query, params = EXPORTS[report_type](request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    columns, rows = open_rows(query, params)
+    mimetype, chunks = exporters.stream(rows, fmt, gzip=use_gzip, columns=columns)
+
+    filename = f"{report_type}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(chunks, mimetype=mimetype, headers=headers)
@@ -1,5 +1,7 @@
-from flask import Blueprint, jsonify
-from db import fetch_all
+from flask import Blueprint, jsonify, request
+from db import fetch_all, transaction
+from versions import bump
+import permissions
 
 roles_bp = Blueprint("roles", __name__)
 
@@ -13,3 +15,40 @@ def get_roles():
         ORDER BY role_name
     """)
     return jsonify(rows)
+
+
+@roles_bp.route("/permissions", methods=["GET"])
+def list_permissions():
+    """Every permission name, in bit order"""
+    return jsonify(list(permissions.PERMISSIONS))
+
+
+@roles_bp.route("/<int:role_id>/permissions", methods=["GET"])
+def get_role_permissions(role_id):
+    return jsonify({"role_id": role_id, "permissions": permissions.role_permissions(role_id)})
+
+
+@roles_bp.route("/<int:role_id>/permissions", methods=["PUT"])
+def set_role_permissions(role_id):
+    """Replace a role's permissions. Body: {"permissions": ["assets:read", ...]}"""
+    data = request.get_json() or {}
+    names = data.get("permissions")
+    if not isinstance(names, list):
+        return jsonify({"error": "permissions must be a list"}), 400
+    unknown = [n for n in names if n not in permissions.BITS]
+    if unknown:
+        return jsonify({"error": f"Unknown permissions: {', '.join(map(str, unknown))}"}), 400
+
+    permissions.ensure_schema()
+    with transaction() as tx:
+        if not tx.fetch_one("SELECT 1 AS found FROM roles WHERE role_id = %s", (role_id,)):
+            return jsonify({"error": "Role not found"}), 404
+        tx.execute("DELETE FROM role_permissions WHERE role_id = %s", (role_id,))
+        tx.execute_values(
+            "INSERT INTO role_permissions (role_id, permission) VALUES %s",
+            [(role_id, n) for n in sorted(set(names))]
+        )
+        # Every worker reloads its permission bitsets on the next request
+        bump("roles", tx=tx)
+
+    return jsonify({"role_id": role_id, "permissions": permissions.role_permissions(role_id)})
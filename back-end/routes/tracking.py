@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify
 from db import fetch_all
+from versions import conditional
 
 tracking_bp = Blueprint("tracking", __name__)
 
 @tracking_bp.route("/current", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def current_locations():
     """Get current location of all assets with building and floor information"""
     rows = fetch_all("""
@@ -40,6 +42,7 @@ def current_locations():
 
 
 @tracking_bp.route("/history", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def movement_history():
     """Get asset movement history for the last 24 hours"""
     rows = fetch_all("""
@@ -88,6 +91,7 @@ def get_floors():
 
 
 @tracking_bp.route("/building/<int:building_id>/assets", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def assets_by_building(building_id):
     """Get all assets currently in a specific building"""
     rows = fetch_all("""
@@ -125,6 +129,7 @@ def assets_by_building(building_id):
 
 
 @tracking_bp.route("/floor/<int:floor_id>/assets", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def assets_by_floor(floor_id):
     """Get all assets currently on a specific floor"""
     rows = fetch_all("""
@@ -162,6 +167,7 @@ def assets_by_floor(floor_id):
 
 
 @tracking_bp.route("/room/<int:room_id>/assets", methods=["GET"])
+@conditional("tracking", "assets", max_age=60)
 def assets_by_room(room_id):
     """Get all assets currently in a specific room"""
     rows = fetch_all("""
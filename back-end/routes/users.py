@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify, request
-from db import fetch_all, execute, execute_returning
+from db import fetch_all, transaction
+from versions import conditional, bump
 
 users_bp = Blueprint("users", __name__)
 
 @users_bp.route("/", methods=["GET"])
+@conditional("users")
 def get_users():
     rows = fetch_all("""
         SELECT
@@ -40,24 +42,26 @@ def create_user():
         if not data.get('name') or not data.get('email') or not data.get('role_id'):
             return jsonify({"error": "Missing required fields"}), 400
         
-        # Insert user and get the new user_id using execute_returning
-        user_id = execute_returning("""
-            INSERT INTO users (name, email, department_id)
-            VALUES (%s, %s, NULL)
-            RETURNING user_id
-        """, (data['name'], data['email']))
-        
-        if not user_id:
-            return jsonify({"error": "Failed to create user"}), 500
-        
-        # Assign role to user
-        execute("""
-            INSERT INTO user_roles (user_id, role_id)
-            VALUES (%s, %s)
-        """, (user_id, data['role_id']))
+        with transaction() as tx:
+            # Insert user and get the new user_id
+            user_id = tx.execute_returning("""
+                INSERT INTO users (name, email, department_id)
+                VALUES (%s, %s, NULL)
+                RETURNING user_id
+            """, (data['name'], data['email']))
+            
+            if not user_id:
+                return jsonify({"error": "Failed to create user"}), 500
+            
+            # Assign role to user
+            tx.execute("""
+                INSERT INTO user_roles (user_id, role_id)
+                VALUES (%s, %s)
+            """, (user_id, data['role_id']))
+            bump("users", tx=tx)
         
         return jsonify({"success": True, "user_id": user_id}), 201
         
     except Exception as e:
         print(f"Error creating user: {str(e)}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
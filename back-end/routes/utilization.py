@@ -0,0 +1,144 @@
+from flask import Blueprint, jsonify
+from db import fetch_all
+from versions import conditional
+from permissions import requires
+
+utilization_bp = Blueprint("utilization", __name__)
+
+EXPECTED_DAILY_SCANS = 20
+
+@utilization_bp.route("/utilization/daily-by-department", methods=["GET"])
+@requires("reports:read")
+def daily_utilization_by_department():
+    query = """
+    SELECT
+        TO_CHAR(date_trunc('day', s.scan_time), 'Dy') AS day,
+        d.name AS department_name,
+        ROUND(COUNT(*) * 100.0 / %s, 2) AS utilization
+    FROM asset_room_scan_events s
+    JOIN assets a ON s.asset_id = a.asset_id
+    JOIN asset_department_mapping adm ON a.asset_id = adm.asset_id
+    JOIN departments d ON adm.department_id = d.department_id
+    WHERE s.scan_time >= NOW() - INTERVAL '7 days'
+    GROUP BY day, d.name
+    ORDER BY day;
+    """
+    return jsonify(fetch_all(query, (EXPECTED_DAILY_SCANS,)))
+
+@utilization_bp.route("/utilization/assets", methods=["GET"])
+@requires("reports:read")
+def asset_utilization():
+    query = """
+    SELECT
+        a.asset_id,
+        a.asset_code,
+        a.asset_name,
+        d.name AS department_name,
+        cr.room_id AS current_room_id,
+        COUNT(s.scan_id) AS scan_count,
+        ROUND(
+            COUNT(s.scan_id) * 100.0 / %s,
+            2
+        ) AS utilization_rate,
+        COALESCE(
+            EXTRACT(EPOCH FROM (NOW() - MAX(s.scan_time))) / 60,
+            0
+        ) AS minutes_since_seen
+    FROM assets a
+    LEFT JOIN asset_department_mapping adm
+        ON adm.mapping_id = (
+            SELECT mapping_id
+            FROM asset_department_mapping
+            WHERE asset_id = a.asset_id
+            ORDER BY mapped_at DESC
+            LIMIT 1
+        )
+    LEFT JOIN departments d
+        ON adm.department_id = d.department_id
+    LEFT JOIN asset_room_scan_events s
+        ON a.asset_id = s.asset_id
+        AND DATE(s.scan_time) = CURRENT_DATE
+    LEFT JOIN asset_room_scan_events cr
+        ON cr.scan_id = (
+            SELECT scan_id
+            FROM asset_room_scan_events
+            WHERE asset_id = a.asset_id
+            ORDER BY scan_time DESC
+            LIMIT 1
+        )
+    GROUP BY
+        a.asset_id,
+        a.asset_code,
+        a.asset_name,
+        d.name,
+        cr.room_id
+    ORDER BY utilization_rate DESC;
+    """
+    return jsonify(fetch_all(query, (EXPECTED_DAILY_SCANS,)))
+
+@utilization_bp.route("/utilization/department-weekly", methods=["GET"])
+@requires("reports:read")
+def department_weekly_utilization():
+    query = """
+    SELECT
+        TO_CHAR(DATE(s.scan_time), 'Dy') AS day,
+        d.name AS department_name,
+        ROUND(
+            COUNT(*) * 100.0 / %s,
+            2
+        ) AS utilization
+    FROM asset_room_scan_events s
+    JOIN assets a
+        ON s.asset_id = a.asset_id
+    JOIN asset_department_mapping adm
+        ON a.asset_id = adm.asset_id
+    JOIN departments d
+        ON adm.department_id = d.department_id
+    WHERE s.scan_time >= CURRENT_DATE - INTERVAL '6 days'
+    GROUP BY day, d.name
+    ORDER BY day;
+    """
+    rows = fetch_all(query, (EXPECTED_DAILY_SCANS,))
+    
+    # reshape for Recharts
+    response = {}
+    for r in rows:
+        day = r["day"]
+        if day not in response:
+            response[day] = {"name": day}
+        response[day][r["department_name"]] = r["utilization"]
+    
+    return jsonify(list(response.values()))
+
+@utilization_bp.route("/assets/category-distribution", methods=["GET"])
+@requires("assets:read")
+@conditional("assets")
+def asset_category_distribution():
+    query = """
+    SELECT
+        ac.name AS name,
+        COUNT(a.asset_id) AS value
+    FROM asset_categories ac
+    LEFT JOIN assets a
+        ON a.category_id = ac.category_id
+    GROUP BY ac.name
+    ORDER BY value DESC;
+    """
+    return jsonify(fetch_all(query))
+
+@utilization_bp.route("/utilization/peak-hours-by-department", methods=["GET"])
+@requires("reports:read")
+def peak_hour_utilization_by_department():
+    query = """
+    SELECT
+        EXTRACT(HOUR FROM s.scan_time) AS hour,
+        COALESCE(d.name, 'Unknown') AS department_name,
+        COUNT(*) AS scan_count
+    FROM asset_room_scan_events s
+    LEFT JOIN rooms r ON s.room_id = r.room_id
+    LEFT JOIN departments d ON r.department_id = d.department_id
+    WHERE s.scan_time >= NOW() - INTERVAL '7 days'
+    GROUP BY hour, department_name
+    ORDER BY hour, department_name;
+    """
+    return jsonify(fetch_all(query))
@@ -0,0 +1,81 @@
+"""
+Production server: gevent WSGI with green psycopg2.
+
+Every request runs in a greenlet and psycopg2 yields to the event loop
+while it waits on Postgres (psycogreen), so a slow report no longer pins
+an OS thread: one process holds up to SERVER_MAX_CONCURRENCY requests in
+flight. They share a DB pool of DB_POOL_MAX connections, sized to what the
+database can run at once rather than to the number of requests; a request
+that cannot get a connection within DB_POOL_TIMEOUT gets a 503. Run one
+process per core (or per container) behind the load balancer and keep
+processes x DB_POOL_MAX under Postgres' max_connections.
+
+SIGTERM / SIGINT drain gracefully: /api/health/ready starts failing,
+after SHUTDOWN_DRAIN_SECONDS the listener closes, in-flight requests get up
+to SHUTDOWN_GRACE_SECONDS to finish, then the pools are closed.
+
+    pip install gevent psycogreen
+    python serve.py
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import os  # noqa: E402
+import signal  # noqa: E402
+
+from psycogreen.gevent import patch_psycopg  # noqa: E402
+
+patch_psycopg()
+
+import gevent  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+PORT = int(os.getenv("SERVER_PORT", os.getenv("FLASK_PORT", 5000)))
+MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", 1000))
+BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes")
+DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", 5))
+GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", 25))
+
+# Green defaults for the DB pool, applied before db.py reads them: enough
+# connections to keep Postgres busy, and a short checkout wait so overload
+# turns into quick 503s instead of a pile of stuck requests
+os.environ.setdefault("DB_POOL_MAX", "20")
+os.environ.setdefault("DB_POOL_TIMEOUT", "5")
+
+from app import create_app  # noqa: E402
+import db  # noqa: E402
+from routes import health  # noqa: E402
+
+
+def main():
+    app = create_app()
+    server = WSGIServer(
+        (HOST, PORT), app,
+        spawn=Pool(MAX_CONCURRENCY),
+        backlog=BACKLOG,
+        log="default" if ACCESS_LOG else None,
+    )
+
+    def shutdown(signum):
+        print(f"Signal {signum}: draining for {DRAIN_SECONDS}s, then up to {GRACE_SECONDS}s "
+              f"for {len(server.pool)} in-flight requests", flush=True)
+        health.start_draining()
+        gevent.sleep(DRAIN_SECONDS)
+        server.stop(timeout=GRACE_SECONDS)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(signum, gevent.spawn, shutdown, signum)
+
+    print(f"Serving on {HOST}:{PORT} (gevent, {MAX_CONCURRENCY} concurrent requests, "
+          f"DB pool {db.pool.maxconn}, startup {app.config['STARTUP_MS']} ms)", flush=True)
+    server.serve_forever()
+    db.close()
+    print("Stopped", flush=True)
+
+
+if __name__ == "__main__":
+    main()
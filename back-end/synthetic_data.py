@@ -0,0 +1,477 @@
+"""
+Deterministic synthetic dataset for performance work.
+
+Generates a hospital: buildings, floors, rooms (each floor belongs to a
+department), one RFID reader per room, categories, vendors, roles, users,
+assets with tags, department mappings and allowed locations, maintenance
+history, alerts, reader heartbeats, and --days of asset_room_scan_events.
+
+Scans follow a diurnal curve (day shifts busy, nights and weekends quiet)
+and a movement model: each asset has a home room, mobile categories
+(wheelchairs, pumps) wander more, moves mostly stay on the floor, assets
+drift back home, and a small share go missing part-way through. Leaving
+the allowed floor sometimes raises a Geofencing Alert.
+
+Everything is a pure function of --seed and the size options (timestamps
+count back from --end), so two runs with the same arguments load the same
+rows. Asset chunks and reader chunks are generated and COPYed by --workers
+processes in parallel; the chunk seed does not depend on which worker runs
+it. Scale with --assets and --scans-per-day: the defaults (5,000 assets x 30
+days x 8/day) give ~1M scans, 500k assets x 180 days x 3/day ~230M.
+
+Loads into the configured database (DB_* env, as db.py). Create the
+schema with migrations.py first; the target tables must be empty, and
+--truncate empties them.
+
+    python synthetic_data.py --assets 5000 --days 30 --truncate
+    python synthetic_data.py --assets 500000 --days 180 --workers 16 --seed 7 --end 2026-01-01 --truncate
+"""
+import argparse
+import io
+import math
+import os
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEPARTMENTS = ("Emergency", "ICU", "Radiology", "Cardiology", "Oncology", "Pediatrics",
+               "Surgery", "Orthopedics", "Neurology", "Maternity", "Pharmacy", "Biomedical")
+
+# name, asset_type, mobility (chance a scan finds it moved), cost range
+CATEGORIES = (
+    ("Infusion Pump", "Medical", 0.25, (1500, 4000)),
+    ("Syringe Pump", "Medical", 0.25, (1200, 3000)),
+    ("Wheelchair", "Mobility", 0.40, (200, 900)),
+    ("Patient Monitor", "Medical", 0.10, (3000, 12000)),
+    ("Ventilator", "Medical", 0.08, (15000, 45000)),
+    ("Defibrillator", "Medical", 0.12, (2000, 6000)),
+    ("Ultrasound", "Imaging", 0.06, (20000, 90000)),
+    ("ECG Machine", "Diagnostic", 0.10, (3000, 15000)),
+    ("Hospital Bed", "Furniture", 0.03, (1000, 7000)),
+    ("Oxygen Concentrator", "Medical", 0.20, (600, 2500)),
+)
+MANUFACTURERS = ("Philips", "GE Healthcare", "Siemens", "Medtronic", "Baxter", "Mindray",
+                 "Drager", "B. Braun", "Stryker", "Hill-Rom", "Nihon Kohden", "Fresenius")
+ROLES = ("Admin", "Biomedical Engineer", "Doctor", "Nurse", "Inventory Manager")
+MAINTENANCE_TYPES = ("Preventive", "Calibration", "Repair", "Inspection")
+
+# Relative scan activity per hour of day
+HOUR_WEIGHTS = (2, 1, 1, 1, 1, 2, 5, 9, 12, 12, 11, 10, 9, 10, 11, 11, 10, 8, 6, 5, 4, 4, 3, 2)
+HOUR_CUM = [sum(HOUR_WEIGHTS[:i + 1]) for i in range(24)]
+WEEKEND_FACTOR = 0.55
+
+MISSING_SHARE = 0.01          # assets that stop being scanned part-way through
+GEOFENCE_ALERT_CHANCE = 0.15  # per scan outside the allowed floor
+COPY_FLUSH_BYTES = 8 << 20
+
+# Tables this generator owns, parents first
+TABLES = (
+    "buildings", "departments", "floors", "rooms", "room_rfid_readers", "asset_categories",
+    "vendors", "roles", "users", "user_roles", "assets", "asset_tags", "asset_department_mapping",
+    "asset_allowed_locations", "asset_maintenance_records", "alerts", "asset_room_scan_events",
+    "esp32_health_logs", "esp32_power_logs",
+)
+# (table, id column) whose sequences follow the explicit ids
+SEQUENCES = (
+    ("buildings", "building_id"), ("departments", "department_id"), ("floors", "floor_id"),
+    ("rooms", "room_id"), ("room_rfid_readers", "reader_id"), ("asset_categories", "category_id"),
+    ("vendors", "vendor_id"), ("roles", "role_id"), ("users", "user_id"), ("assets", "asset_id"),
+    ("asset_tags", "tag_id"),
+)
+
+
+def dsn():
+    return dict(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), database=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+                application_name="synthetic-data")
+
+
+def _rng(seed, *parts):
+    # str seeds hash with SHA-512: stable across processes and PYTHONHASHSEED
+    return random.Random(":".join(str(p) for p in (seed,) + parts))
+
+
+def _copy(cur, table, columns, buf):
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+def _text(value):
+    """COPY text-format field"""
+    if value is None:
+        return r"\N"
+    return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+
+def _rows(rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_text(v) for v in row))
+        buf.write("\n")
+    return buf
+
+
+# ---------- the static world ----------
+class World:
+    """Layout and asset attributes; rebuilt identically in every worker from the options"""
+
+    def __init__(self, opts):
+        self.opts = opts
+        seed = opts.seed
+        rng = _rng(seed, "world")
+
+        room_count = max(20, math.ceil(opts.assets / opts.assets_per_room))
+        floors_per_building = opts.floors_per_building
+        rooms_per_floor = max(5, math.ceil(room_count / (opts.buildings * floors_per_building)))
+
+        self.buildings = [(b, f"Block {chr(64 + b) if b <= 26 else b}") for b in range(1, opts.buildings + 1)]
+        self.departments = [(d, name) for d, name in enumerate(DEPARTMENTS, 1)]
+        self.floors = []      # (floor_id, building_id, name, department_id, floor_level)
+        self.rooms = []       # (room_id, floor_id, room_name, department_id)
+        self.floor_rooms = {}
+        floor_id = room_id = 0
+        for building_id, _ in self.buildings:
+            for level in range(floors_per_building):
+                floor_id += 1
+                department_id = (floor_id - 1) % len(DEPARTMENTS) + 1
+                self.floors.append((floor_id, building_id, f"Floor {level}", department_id, level))
+                for n in range(rooms_per_floor):
+                    room_id += 1
+                    self.rooms.append((room_id, floor_id, f"{building_id}-{level}{n + 1:02d}", department_id))
+                    self.floor_rooms.setdefault(floor_id, []).append(room_id)
+        self.room_floor = {r[0]: r[1] for r in self.rooms}
+        self.floor_building = {f[0]: f[1] for f in self.floors}
+        self.room_name = {r[0]: r[2] for r in self.rooms}
+        self.room_ids = [r[0] for r in self.rooms]
+        # One reader per room, same id
+        self.readers = [(r[0], f"RDR-{r[0]:05d}", r[0]) for r in self.rooms]
+
+        self.categories = [(c, spec[0]) for c, spec in enumerate(CATEGORIES, 1)]
+        self.vendors = [(v, f"{MANUFACTURERS[(v - 1) % len(MANUFACTURERS)]} Service {v}")
+                        for v in range(1, opts.vendors + 1)]
+        self.roles = [(r, name) for r, name in enumerate(ROLES, 1)]
+
+        # Per-asset attributes as parallel lists indexed by asset_id - 1
+        self.category = []
+        self.home = []
+        self.missing_day = []
+        self.purchase = []
+        end = opts.end
+        for _ in range(opts.assets):
+            self.category.append(rng.randrange(len(CATEGORIES)) + 1)
+            self.home.append(rng.choice(self.room_ids))
+            self.missing_day.append(rng.randrange(opts.days) if rng.random() < MISSING_SHARE else None)
+            self.purchase.append(end - timedelta(days=opts.days + rng.randrange(5 * 365)))
+
+    def asset_code(self, asset_id):
+        return f"AST-{asset_id:07d}"
+
+    def rfid_uid(self, asset_id):
+        return f"E200{(asset_id * 2654435761) % (1 << 32):08X}{asset_id:08X}"
+
+
+# ---------- loading the world ----------
+def load_world(conn, world, password_hash):
+    opts = world.opts
+    rng = _rng(opts.seed, "assets")
+    with conn.cursor() as cur:
+        _copy(cur, "buildings", ("building_id", "name"), _rows(world.buildings))
+        _copy(cur, "departments", ("department_id", "name"), _rows(world.departments))
+        _copy(cur, "floors", ("floor_id", "building_id", "name", "floor_level"),
+              _rows((f[0], f[1], f[2], f[4]) for f in world.floors))
+        _copy(cur, "rooms", ("room_id", "floor_id", "room_name", "department_id"), _rows(world.rooms))
+        _copy(cur, "room_rfid_readers", ("reader_id", "reader_code", "room_id"), _rows(world.readers))
+        _copy(cur, "asset_categories", ("category_id", "name"), _rows(world.categories))
+        _copy(cur, "vendors", ("vendor_id", "vendor_name"), _rows(world.vendors))
+        _copy(cur, "roles", ("role_id", "role_name"), _rows(world.roles))
+
+        users = [(1, "Admin", "admin@example.com", None, password_hash)]
+        for u in range(2, opts.users + 1):
+            users.append((u, f"User {u}", f"user{u}@example.com", (u - 1) % len(DEPARTMENTS) + 1, password_hash))
+        _copy(cur, "users", ("user_id", "name", "email", "department_id", "password_hash"), _rows(users))
+        _copy(cur, "user_roles", ("user_id", "role_id"),
+              _rows((u[0], 1 if u[0] == 1 else (u[0] % (len(ROLES) - 1)) + 2) for u in users))
+
+        assets, tags, mappings, allowed = io.StringIO(), io.StringIO(), io.StringIO(), io.StringIO()
+        for i in range(opts.assets):
+            asset_id = i + 1
+            name, asset_type, _, (low, high) = CATEGORIES[world.category[i] - 1]
+            manufacturer = rng.choice(MANUFACTURERS)
+            home = world.home[i]
+            floor_id = world.room_floor[home]
+            department_id = world.rooms[home - 1][3]
+            assets.write(f"{asset_id}\t{world.asset_code(asset_id)}\t{name} {asset_id}\t{manufacturer}\t"
+                         f"{manufacturer[:3].upper()}-{rng.randrange(100, 999)}\t{rng.randrange(low, high)}.00\t"
+                         f"{world.purchase[i]}\t{world.category[i]}\t{asset_type}\n")
+            tags.write(f"{asset_id}\t{asset_id}\t{world.rfid_uid(asset_id)}\n")
+            mappings.write(f"{asset_id}\t{department_id}\t{world.purchase[i]} 09:00:00\n")
+            allowed.write(f"{asset_id}\t\\N\t{floor_id}\t\\N\n")
+            if rng.random() < 0.2:
+                allowed.write(f"{asset_id}\t\\N\t\\N\t{world.floor_building[floor_id]}\n")
+        _copy(cur, "assets", ("asset_id", "asset_code", "asset_name", "manufacturer", "model",
+                              "purchase_cost", "purchase_date", "category_id", "asset_type"), assets)
+        _copy(cur, "asset_tags", ("tag_id", "asset_id", "rfid_uid"), tags)
+        _copy(cur, "asset_department_mapping", ("asset_id", "department_id", "mapped_at"), mappings)
+        _copy(cur, "asset_allowed_locations", ("asset_id", "room_id", "floor_id", "building_id"), allowed)
+
+        for table, column in SEQUENCES:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                        f"(SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}), false)")
+    conn.commit()
+
+
+# ---------- parallel chunks ----------
+_world = None
+_times = None
+
+
+def _init_worker(opts):
+    global _world, _times
+    _world = World(opts)
+    _times = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)]
+
+
+class _Writer:
+    """COPY buffers per table, flushed every COPY_FLUSH_BYTES"""
+
+    def __init__(self, cur, columns):
+        self.cur = cur
+        self.columns = columns
+        self.bufs = {table: io.StringIO() for table in columns}
+        self.rows = dict.fromkeys(columns, 0)
+
+    def write(self, table, line):
+        buf = self.bufs[table]
+        buf.write(line)
+        self.rows[table] += 1
+        if buf.tell() > COPY_FLUSH_BYTES:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in [table] if table else list(self.bufs):
+            buf = self.bufs[name]
+            if buf.tell():
+                _copy(self.cur, name, self.columns[name], buf)
+                self.bufs[name] = io.StringIO()
+
+
+def _asset_chunk(start):
+    """Scans, alerts and maintenance for assets [start, start + chunk)"""
+    world, opts = _world, _world.opts
+    rng = _rng(opts.seed, "chunk", start)
+    stop = min(start + opts.chunk_assets, opts.assets)
+    first_day = opts.end - timedelta(days=opts.days)
+    days = [(first_day + timedelta(days=d)) for d in range(opts.days)]
+    day_strs = [d.isoformat() for d in days]
+    weekend = [d.weekday() >= 5 for d in days]
+    times = _times
+
+    conn = psycopg2.connect(**dsn())
+    try:
+        with conn.cursor() as cur:
+            out = _Writer(cur, {
+                "asset_room_scan_events": ("asset_id", "tag_id", "reader_id", "room_id", "scan_time"),
+                "alerts": ("asset_id", "alert_type", "alert_message", "generated_at",
+                           "acknowledged_at", "acknowledged_by"),
+                "asset_maintenance_records": ("asset_id", "vendor_id", "maintenance_type", "description",
+                                              "maintenance_start", "maintenance_end", "maintenance_cost",
+                                              "recorded_by", "recorded_at"),
+            })
+            for i in range(start, stop):
+                asset_id = i + 1
+                code = world.asset_code(asset_id)
+                home = world.home[i]
+                home_floor = world.room_floor[home]
+                mobility = CATEGORIES[world.category[i] - 1][2]
+                missing_day = world.missing_day[i]
+                room = home
+
+                for d in range(opts.days):
+                    if missing_day is not None and d >= missing_day:
+                        break
+                    rate = opts.scans_per_day * (WEEKEND_FACTOR if weekend[d] else 1.0)
+                    count = int(rate * 2 * rng.random() + 0.5)
+                    seconds = sorted(
+                        bisect(HOUR_CUM, rng.random() * HOUR_CUM[-1]) * 3600 + rng.randrange(3600)
+                        for _ in range(count)
+                    )
+                    for s in seconds:
+                        roll = rng.random()
+                        if roll < mobility:
+                            if rng.random() < 0.7:
+                                room = rng.choice(world.floor_rooms[world.room_floor[room]])
+                            else:
+                                room = rng.choice(world.room_ids)
+                        elif room != home and roll < mobility + 0.3:
+                            room = home
+                        ts = f"{day_strs[d]} {times[s]}"
+                        out.write("asset_room_scan_events", f"{asset_id}\t{asset_id}\t{room}\t{room}\t{ts}\n")
+                        if world.room_floor[room] != home_floor and rng.random() < GEOFENCE_ALERT_CHANCE:
+                            acked = d < opts.days - 1 and rng.random() < 0.9
+                            ack = f"{ts}\t1" if acked else "\\N\t\\N"
+                            out.write("alerts", f"{asset_id}\tGeofencing Alert\tAsset {code} detected in "
+                                                f"unauthorized room {world.room_name[room]}\t{ts}\t{ack}\n")
+
+                # Maintenance: a few records spread over the asset's life, the latest may be open
+                for n in range(rng.randrange(opts.maintenance_max + 1)):
+                    start_day = opts.end - timedelta(days=rng.randrange(max(1, (opts.end - world.purchase[i]).days)))
+                    begin = f"{start_day} {times[rng.randrange(8 * 3600, 17 * 3600)]}"
+                    done = start_day + timedelta(days=rng.randrange(1, 10))
+                    end = f"{done} 16:00:00" if done < opts.end and rng.random() < 0.9 else "\\N"
+                    out.write("asset_maintenance_records",
+                              f"{asset_id}\t{rng.randrange(1, opts.vendors + 1)}\t{rng.choice(MAINTENANCE_TYPES)}\t"
+                              f"Synthetic record\t{begin}\t{end}\t{rng.randrange(50, 2000)}.00\t1\t{begin}\n")
+            out.flush()
+        conn.commit()
+    finally:
+        conn.close()
+    return stop - start, out.rows
+
+
+def _reader_chunk(start):
+    """Heartbeats (health + power logs) for readers [start, start + chunk)"""
+    world, opts = _world, _world.opts
+    rng = _rng(opts.seed, "readers", start)
+    stop = min(start + opts.chunk_readers, len(world.readers))
+    step = opts.heartbeat_minutes * 60
+    first = datetime.combine(opts.end - timedelta(days=opts.days), datetime.min.time())
+    beats = opts.days * 86400 // step
+
+    conn = psycopg2.connect(**dsn())
+    try:
+        with conn.cursor() as cur:
+            out = _Writer(cur, {
+                "esp32_health_logs": ("reader_id", "event_type", "recorded_at", "wifi_quality", "wifi_rssi"),
+                "esp32_power_logs": ("reader_id", "voltage", "recorded_at"),
+            })
+            for reader_id, _, _ in world.readers[start:stop]:
+                base_rssi = rng.randrange(-80, -45)
+                ts = first + timedelta(seconds=rng.randrange(step))
+                out.write("esp32_health_logs", f"{reader_id}\tBOOT\t{ts}\t\\N\t\\N\n")
+                for _ in range(beats):
+                    rssi = base_rssi + rng.randrange(-6, 7)
+                    quality = max(0, min(100, 2 * (rssi + 100)))
+                    out.write("esp32_health_logs", f"{reader_id}\tHEARTBEAT\t{ts}\t{quality}\t{rssi}\n")
+                    out.write("esp32_power_logs", f"{reader_id}\t{4.6 + rng.random() * 0.5:.2f}\t{ts}\n")
+                    ts += timedelta(seconds=step)
+            out.flush()
+        conn.commit()
+    finally:
+        conn.close()
+    return stop - start, out.rows
+
+
+# ---------- driver ----------
+def _password_hash(password):
+    try:
+        import bcrypt
+    except ImportError:
+        return None
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(10)).decode()
+
+
+def _refresh_derived():
+    """Rebuild tables derived from the loaded data, when their modules are in use"""
+    import asset_search
+    import maintenance_stats
+    import permissions
+    from db import transaction
+    from versions import RESOURCES, bump
+
+    maintenance_stats.rebuild()
+    asset_search.rebuild()
+    permissions.ensure_schema()
+    with transaction() as tx:
+        permissions.seed_defaults(tx)
+        bump(*RESOURCES, tx=tx)
+
+
+def generate(opts):
+    started = time.perf_counter()
+    conn = psycopg2.connect(**dsn())
+    try:
+        with conn.cursor() as cur:
+            if opts.truncate:
+                cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+            else:
+                cur.execute("SELECT EXISTS (SELECT 1 FROM assets) OR EXISTS (SELECT 1 FROM buildings)")
+                if cur.fetchone()[0]:
+                    raise SystemExit("Target tables are not empty; pass --truncate to replace their contents")
+        world = World(opts)
+        load_world(conn, world, _password_hash(opts.password))
+    finally:
+        conn.close()
+    print(f"World: {len(world.buildings)} buildings, {len(world.floors)} floors, {len(world.rooms)} rooms, "
+          f"{opts.assets} assets ({time.perf_counter() - started:.1f}s)", flush=True)
+
+    tasks = [(_asset_chunk, s) for s in range(0, opts.assets, opts.chunk_assets)]
+    if opts.heartbeat_minutes:
+        tasks += [(_reader_chunk, s) for s in range(0, len(world.readers), opts.chunk_readers)]
+    totals = {}
+    with Pool(opts.workers, initializer=_init_worker, initargs=(opts,)) as pool:
+        done = 0
+        for count, rows in pool.imap_unordered(_run_task, tasks):
+            done += 1
+            for table, n in rows.items():
+                totals[table] = totals.get(table, 0) + n
+            if done % max(1, len(tasks) // 20) == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - started
+                scans = totals.get("asset_room_scan_events", 0)
+                print(f"  {done}/{len(tasks)} chunks, {scans:,} scans, {scans / elapsed:,.0f} scans/s", flush=True)
+
+    conn = psycopg2.connect(**dsn())
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {', '.join(TABLES)}")
+    finally:
+        conn.close()
+    if not opts.skip_derived:
+        _refresh_derived()
+
+    elapsed = time.perf_counter() - started
+    for table, n in sorted(totals.items()):
+        print(f"  {table:28s} {n:>14,}")
+    print(f"Done in {elapsed:.1f}s")
+    return totals
+
+
+def _run_task(task):
+    fn, start = task
+    return fn(start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--assets", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=30, help="days of scan history")
+    parser.add_argument("--scans-per-day", type=float, default=8, help="mean scans per asset per weekday")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="history ends at this date (YYYY-MM-DD); fix it for reproducible runs")
+    parser.add_argument("--buildings", type=int, default=3)
+    parser.add_argument("--floors-per-building", type=int, default=6)
+    parser.add_argument("--assets-per-room", type=int, default=15)
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--password", default="password", help="password for every generated user")
+    parser.add_argument("--maintenance-max", type=int, default=6, help="max maintenance records per asset")
+    parser.add_argument("--heartbeat-minutes", type=int, default=15, help="reader heartbeat interval, 0 for none")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--chunk-assets", type=int, default=2000)
+    parser.add_argument("--chunk-readers", type=int, default=50)
+    parser.add_argument("--truncate", action="store_true", help="empty the generated tables first")
+    parser.add_argument("--skip-derived", action="store_true",
+                        help="do not rebuild maintenance aggregates, search index and permissions")
+    generate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
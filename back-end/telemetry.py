@@ -0,0 +1,361 @@
+"""
+Downsampling and retention for ESP32 reader telemetry.
+
+Raw esp32_health_logs / esp32_power_logs rows are rolled up into 1-minute,
+1-hour and 1-day buckets in reader_telemetry_rollups; each coarser level is
+built from the one below, so raw rows are scanned exactly once. Raw rows and
+fine buckets are then deleted past their retention horizon in bounded
+batches, never before they have been rolled up. The (recorded_at) indexes
+the windows and deletes rely on are built CONCURRENTLY by migrations.py
+(HOT_PATH_INDEXES), never from here.
+
+    python telemetry.py            # run every TELEMETRY_ROLLUP_SECONDS
+    python telemetry.py --once     # single pass (cron)
+"""
+import argparse
+import os
+import time
+from datetime import timedelta
+
+from db import fetch_all, fetch_one, transaction
+
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_ROLLUP_SECONDS", 60))
+# Raw rows arriving later than this after the minute closes are not rolled up
+ROLLUP_LAG = timedelta(seconds=int(os.getenv("TELEMETRY_ROLLUP_LAG_SECONDS", 120)))
+DELETE_BATCH_SIZE = int(os.getenv("TELEMETRY_DELETE_BATCH", 5000))
+# Pause between delete batches so retention never hogs I/O
+DELETE_PAUSE_SECONDS = float(os.getenv("TELEMETRY_DELETE_PAUSE", 0.05))
+
+# How long each level is kept; None keeps it forever
+RETENTION = {
+    "raw": timedelta(days=int(os.getenv("TELEMETRY_RAW_DAYS", 7))),
+    "1m": timedelta(days=int(os.getenv("TELEMETRY_MINUTE_DAYS", 30))),
+    "1h": timedelta(days=int(os.getenv("TELEMETRY_HOUR_DAYS", 365))),
+    "1d": None,
+}
+
+# resolution -> (date_trunc unit, source level, largest window per transaction)
+LEVELS = {
+    "1m": ("minute", "raw", timedelta(hours=6)),
+    "1h": ("hour", "1m", timedelta(days=7)),
+    "1d": ("day", "1h", timedelta(days=90)),
+}
+
+RAW_TABLES = ("esp32_health_logs", "esp32_power_logs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reader_telemetry_rollups (
+    resolution TEXT NOT NULL,
+    reader_id INTEGER NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    boots INTEGER NOT NULL DEFAULT 0,
+    rssi_count INTEGER NOT NULL DEFAULT 0,
+    rssi_sum BIGINT,
+    rssi_min INTEGER,
+    rssi_max INTEGER,
+    quality_count INTEGER NOT NULL DEFAULT 0,
+    quality_sum BIGINT,
+    voltage_count INTEGER NOT NULL DEFAULT 0,
+    voltage_sum NUMERIC,
+    voltage_min NUMERIC,
+    voltage_max NUMERIC,
+    PRIMARY KEY (resolution, reader_id, bucket)
+);
+CREATE TABLE IF NOT EXISTS reader_telemetry_watermarks (
+    resolution TEXT PRIMARY KEY,
+    rolled_until TIMESTAMP NOT NULL
+);
+"""
+
+ROLLUP_COLUMNS = """
+    resolution, reader_id, bucket, events, boots,
+    rssi_count, rssi_sum, rssi_min, rssi_max, quality_count, quality_sum,
+    voltage_count, voltage_sum, voltage_min, voltage_max
+"""
+
+# Buckets are recomputed whole, so re-running a window is harmless
+UPSERT = """
+ON CONFLICT (resolution, reader_id, bucket) DO UPDATE SET
+    events = EXCLUDED.events,
+    boots = EXCLUDED.boots,
+    rssi_count = EXCLUDED.rssi_count,
+    rssi_sum = EXCLUDED.rssi_sum,
+    rssi_min = EXCLUDED.rssi_min,
+    rssi_max = EXCLUDED.rssi_max,
+    quality_count = EXCLUDED.quality_count,
+    quality_sum = EXCLUDED.quality_sum,
+    voltage_count = EXCLUDED.voltage_count,
+    voltage_sum = EXCLUDED.voltage_sum,
+    voltage_min = EXCLUDED.voltage_min,
+    voltage_max = EXCLUDED.voltage_max
+"""
+
+ROLLUP_RAW_SQL = f"""
+WITH health AS (
+    SELECT
+        reader_id,
+        date_trunc('minute', recorded_at) AS bucket,
+        COUNT(*) AS events,
+        COUNT(*) FILTER (WHERE event_type = 'BOOT') AS boots,
+        COUNT(wifi_rssi) AS rssi_count,
+        SUM(wifi_rssi) AS rssi_sum,
+        MIN(wifi_rssi) AS rssi_min,
+        MAX(wifi_rssi) AS rssi_max,
+        COUNT(wifi_quality) AS quality_count,
+        SUM(wifi_quality) AS quality_sum
+    FROM esp32_health_logs
+    WHERE recorded_at >= %(start)s AND recorded_at < %(end)s
+    GROUP BY 1, 2
+),
+power AS (
+    SELECT
+        reader_id,
+        date_trunc('minute', recorded_at) AS bucket,
+        COUNT(voltage) AS voltage_count,
+        SUM(voltage) AS voltage_sum,
+        MIN(voltage) AS voltage_min,
+        MAX(voltage) AS voltage_max
+    FROM esp32_power_logs
+    WHERE recorded_at >= %(start)s AND recorded_at < %(end)s
+    GROUP BY 1, 2
+)
+INSERT INTO reader_telemetry_rollups ({ROLLUP_COLUMNS})
+SELECT
+    '1m',
+    COALESCE(h.reader_id, p.reader_id),
+    COALESCE(h.bucket, p.bucket),
+    COALESCE(h.events, 0),
+    COALESCE(h.boots, 0),
+    COALESCE(h.rssi_count, 0), h.rssi_sum, h.rssi_min, h.rssi_max,
+    COALESCE(h.quality_count, 0), h.quality_sum,
+    COALESCE(p.voltage_count, 0), p.voltage_sum, p.voltage_min, p.voltage_max
+FROM health h
+FULL JOIN power p ON p.reader_id = h.reader_id AND p.bucket = h.bucket
+{UPSERT}
+"""
+
+ROLLUP_LEVEL_SQL = f"""
+INSERT INTO reader_telemetry_rollups ({ROLLUP_COLUMNS})
+SELECT
+    %(resolution)s,
+    reader_id,
+    date_trunc(%(unit)s, bucket),
+    SUM(events), SUM(boots),
+    SUM(rssi_count), SUM(rssi_sum), MIN(rssi_min), MAX(rssi_max),
+    SUM(quality_count), SUM(quality_sum),
+    SUM(voltage_count), SUM(voltage_sum), MIN(voltage_min), MAX(voltage_max)
+FROM reader_telemetry_rollups
+WHERE resolution = %(source)s
+  AND bucket >= %(start)s AND bucket < %(end)s
+GROUP BY reader_id, date_trunc(%(unit)s, bucket)
+{UPSERT}
+"""
+
+HISTORY_SQL = """
+SELECT
+    bucket,
+    events,
+    boots,
+    ROUND(rssi_sum::numeric / NULLIF(rssi_count, 0), 1) AS rssi_avg,
+    rssi_min,
+    rssi_max,
+    ROUND(quality_sum::numeric / NULLIF(quality_count, 0), 1) AS wifi_quality_avg,
+    ROUND(voltage_sum / NULLIF(voltage_count, 0), 3) AS voltage_avg,
+    voltage_min,
+    voltage_max
+FROM reader_telemetry_rollups
+WHERE resolution = %s
+  AND reader_id = %s
+  AND bucket >= %s AND bucket < %s
+ORDER BY bucket
+"""
+
+_schema_ready = False
+
+
+def ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        with transaction() as tx:
+            tx.execute(SCHEMA)
+        _schema_ready = True
+
+
+def _truncate(ts, unit):
+    if unit == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if unit == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# ---------- rollups ----------
+def _watermarks(tx):
+    return {r["resolution"]: r["rolled_until"]
+            for r in tx.fetch_all("SELECT resolution, rolled_until FROM reader_telemetry_watermarks")}
+
+
+def _first_raw(tx):
+    row = tx.fetch_one("""
+        SELECT LEAST(
+            (SELECT MIN(recorded_at) FROM esp32_health_logs),
+            (SELECT MIN(recorded_at) FROM esp32_power_logs)
+        ) AS first
+    """)
+    return row["first"]
+
+
+def _limit(resolution, now, marks):
+    """Exclusive end of the complete buckets that can be rolled up at this level"""
+    unit, source, _ = LEVELS[resolution]
+    if source == "raw":
+        return _truncate(now - ROLLUP_LAG, unit)
+    return _truncate(marks[source], unit) if source in marks else None
+
+
+def rollup(resolution, now):
+    """Roll one level forward from its watermark; returns the number of buckets written"""
+    unit, source, window = LEVELS[resolution]
+    written = 0
+    while True:
+        with transaction() as tx:
+            marks = _watermarks(tx)
+            end_limit = _limit(resolution, now, marks)
+            if end_limit is None:
+                return written
+            start = marks.get(resolution)
+            if start is None:
+                first = _first_raw(tx)
+                if first is None:
+                    return written
+                start = _truncate(first, unit)
+            if start >= end_limit:
+                return written
+            end = min(start + window, end_limit)
+            if source == "raw":
+                written += tx.execute(ROLLUP_RAW_SQL, {"start": start, "end": end})
+            else:
+                written += tx.execute(ROLLUP_LEVEL_SQL, {
+                    "resolution": resolution, "unit": unit, "source": source,
+                    "start": start, "end": end,
+                })
+            tx.execute("""
+                INSERT INTO reader_telemetry_watermarks (resolution, rolled_until)
+                VALUES (%s, %s)
+                ON CONFLICT (resolution) DO UPDATE SET rolled_until = EXCLUDED.rolled_until
+            """, (resolution, end))
+        if end >= end_limit:
+            return written
+
+
+# ---------- retention ----------
+def _delete_batches(query, params):
+    deleted = 0
+    while True:
+        with transaction() as tx:
+            count = tx.execute(query, params + (DELETE_BATCH_SIZE,))
+        deleted += count
+        if count < DELETE_BATCH_SIZE:
+            return deleted
+        time.sleep(DELETE_PAUSE_SECONDS)
+
+
+def _cutoff(level, now, marks):
+    """Delete horizon for a level: its retention, but never past what the next level has consumed"""
+    keep = RETENTION[level]
+    if keep is None:
+        return None
+    consumer = {"raw": "1m", "1m": "1h", "1h": "1d"}[level]
+    if consumer not in marks:
+        return None
+    return min(now - keep, marks[consumer])
+
+
+def prune(now):
+    """Delete raw rows and fine buckets past retention; returns rows deleted per level"""
+    with transaction() as tx:
+        marks = _watermarks(tx)
+    deleted = {}
+
+    cutoff = _cutoff("raw", now, marks)
+    if cutoff is not None:
+        deleted["raw"] = sum(
+            _delete_batches(f"""
+                DELETE FROM {table}
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM {table} WHERE recorded_at < %s LIMIT %s
+                ))
+            """, (cutoff,))
+            for table in RAW_TABLES
+        )
+
+    for level in ("1m", "1h"):
+        cutoff = _cutoff(level, now, marks)
+        if cutoff is not None:
+            deleted[level] = _delete_batches("""
+                DELETE FROM reader_telemetry_rollups
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM reader_telemetry_rollups
+                    WHERE resolution = %s AND bucket < %s
+                    LIMIT %s
+                ))
+            """, (level, cutoff))
+    return deleted
+
+
+def run_once():
+    ensure_schema()
+    started = time.perf_counter()
+    now = fetch_one("SELECT LOCALTIMESTAMP AS now")["now"]
+    written = {level: rollup(level, now) for level in LEVELS}
+    deleted = prune(now)
+    return {
+        "rolled_up": written,
+        "deleted": deleted,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# ---------- reads ----------
+def pick_resolution(start, end, now):
+    """
+    Finest level that keeps a range to a chartable number of points and still
+    holds data for its start.
+    """
+    span = end - start
+    if span <= timedelta(hours=6):
+        candidates = ("1m", "1h", "1d")
+    elif span <= timedelta(days=31):
+        candidates = ("1h", "1d")
+    else:
+        candidates = ("1d",)
+    for level in candidates:
+        keep = RETENTION[level]
+        if keep is None or start >= now - keep:
+            return level
+    return "1d"
+
+
+def history(reader_id, start, end, now, resolution=None):
+    """(resolution, buckets) for one reader between start and end"""
+    ensure_schema()
+    resolution = resolution or pick_resolution(start, end, now)
+    return resolution, fetch_all(HISTORY_SQL, (resolution, reader_id, start, end))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run a single rollup/retention pass and exit")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            print(run_once(), flush=True)
+        except Exception as e:
+            print(f"Telemetry pass failed: {e}", flush=True)
+            if args.once:
+                raise
+        if args.once:
+            break
+        time.sleep(ROLLUP_INTERVAL_SECONDS)
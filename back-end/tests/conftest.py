@@ -0,0 +1,103 @@
+"""
+Shared fixtures. Nothing here talks to PostgreSQL: routes run against the
+real Flask app with the database calls they make stubbed out.
+
+    cd back-end && python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asset_search  # noqa: E402
+import db  # noqa: E402
+import maintenance_stats  # noqa: E402
+import permissions  # noqa: E402
+import report_jobs  # noqa: E402
+import report_scheduler  # noqa: E402
+import versions  # noqa: E402
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Authentication would look the token up in the database
+    monkeypatch.setattr(permissions, "AUTH_REQUIRED", False)
+    # Lazily created tables: pretend they exist so no DDL runs
+    monkeypatch.setattr(versions, "_schema_ready", True)
+    monkeypatch.setattr(asset_search, "_schema_ready", True)
+    monkeypatch.setattr(maintenance_stats, "_schema_ready", True)
+    monkeypatch.setattr(report_scheduler, "_schema_ready", True)
+    monkeypatch.setattr(report_jobs, "_schema_ready", True)
+    return create_app({"TESTING": True, "BLUEPRINTS": {"assets", "users", "reports"}})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class FakeCursor:
+    def __init__(self, conn, dict_rows):
+        self.connection = conn
+        self.dict_rows = dict_rows
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.statements.append(query)
+        if self.connection.fail_on and self.connection.fail_on in query:
+            raise db.psycopg2.Error(f"failed on {self.connection.fail_on}")
+        self.rowcount = 1
+
+    def fetchone(self):
+        return {} if self.dict_rows else (1,)
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    """Records statements, commits and rollbacks; fail_on makes a statement raise"""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_on = None
+
+    def cursor(self, cursor_factory=None, name=None):
+        return FakeCursor(self, dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    """Hand out one FakeConnection from the primary pool and track its return"""
+    fake = FakeConnection()
+    fake.returned = 0
+
+    def getconn(timeout=None):
+        return fake
+
+    def putconn(c, close=False):
+        assert c is fake
+        fake.returned += 1
+
+    monkeypatch.setattr(db.pool, "getconn", getconn)
+    monkeypatch.setattr(db.pool, "putconn", putconn)
+    return fake
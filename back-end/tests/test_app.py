@@ -0,0 +1,18 @@
+import pytest
+
+import app as app_module
+from app import create_app
+
+
+def test_every_listed_blueprint_registers():
+    app = create_app({"TESTING": True})
+    assert {name for name, *_ in app_module.BLUEPRINTS} <= set(app.blueprints)
+
+
+def test_missing_blueprint_module_stops_startup(monkeypatch, caplog):
+    monkeypatch.setattr(app_module, "BLUEPRINTS", app_module.BLUEPRINTS + (
+        ("gone", "routes.gone", "gone_bp", "/api/gone"),
+    ))
+    with pytest.raises(ModuleNotFoundError):
+        create_app({"TESTING": True, "BLUEPRINTS": {"gone"}})
+    assert "routes.gone" in caplog.text
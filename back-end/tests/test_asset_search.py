@@ -0,0 +1,47 @@
+"""The request path only checks that the migration created asset_search"""
+import pytest
+
+import asset_search
+
+
+class FakeTx:
+    def __init__(self, ready):
+        self.ready = ready
+        self.checks = 0
+        self.statements = []
+
+    def fetch_one(self, query, params=None):
+        self.checks += 1
+        return {"ready": self.ready, "trigram": False}
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+
+
+@pytest.fixture(autouse=True)
+def unchecked(monkeypatch):
+    monkeypatch.setattr(asset_search, "_schema_ready", False)
+    monkeypatch.setattr(asset_search, "_trigram", False)
+
+
+def test_refresh_is_skipped_until_migrated():
+    tx = FakeTx(ready=False)
+    asset_search.refresh(tx, [1])
+    asset_search.refresh(tx, [2])
+    assert tx.statements == []
+    # Not cached while missing, so the migration is noticed without a restart
+    assert tx.checks == 2
+
+    tx.ready = True
+    asset_search.refresh(tx, [3])
+    asset_search.refresh(tx, [4])
+    assert len(tx.statements) == 2
+    assert tx.checks == 3
+    assert not any("CREATE" in s for s in tx.statements)
+
+
+def test_search_before_migration_fails_without_ddl(monkeypatch):
+    monkeypatch.setattr(asset_search, "fetch_one", FakeTx(ready=False).fetch_one)
+    monkeypatch.setattr(asset_search, "fetch_all", lambda *a: pytest.fail("searched"))
+    with pytest.raises(RuntimeError, match="migrations.py"):
+        asset_search.search("pump")
@@ -0,0 +1,68 @@
+"""ETag / 304 handling of versions.conditional on GET /api/assets/"""
+import pytest
+
+from routes import assets
+import versions
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Calls to the asset list query (the route's own fetch_all binding)"""
+    calls = []
+
+    def fetch_all(query, params=None):
+        calls.append(query)
+        return [{"asset_id": 1, "asset_code": "A-1"}]
+
+    monkeypatch.setattr(assets, "fetch_all", fetch_all)
+    return calls
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    """resource_versions held in memory, read by sync() and incremented by bump()"""
+    table = {"assets": 1}
+
+    def fetch_all(query, params=None):
+        return [{"resource": r, "version": v, "updated_at": None} for r, v in table.items()]
+
+    def execute(query, params=None):
+        for resource in params[0]:
+            table[resource] = table.get(resource, 0) + 1
+        return len(params[0])
+
+    monkeypatch.setattr(versions, "fetch_all", fetch_all)
+    monkeypatch.setattr(versions, "execute", execute)
+    monkeypatch.setattr(versions, "_versions", {})
+    monkeypatch.setattr(versions, "_synced_at", 0.0)
+    return table
+
+
+def test_matching_etag_is_304_without_running_the_query(client, queries, monkeypatch):
+    monkeypatch.setattr(versions, "snapshot", lambda resources: ((7,), None))
+
+    first = client.get("/api/assets/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag
+
+    queries.clear()
+    second = client.get("/api/assets/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.data == b""
+    assert queries == []
+
+
+def test_bump_changes_the_etag(client, queries, counters):
+    etag = client.get("/api/assets/").headers["ETag"]
+    assert client.get("/api/assets/", headers={"If-None-Match": etag}).status_code == 304
+
+    versions.bump("assets")
+    assert counters["assets"] == 2
+
+    queries.clear()
+    response = client.get("/api/assets/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(queries) == 1
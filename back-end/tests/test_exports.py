@@ -0,0 +1,39 @@
+"""Streamed report exports fail before the 200 goes out, not mid-file"""
+import psycopg2
+import pytest
+
+import exporters
+from routes import reports
+
+
+def test_malformed_timestamp_is_400(client, monkeypatch):
+    def open_rows(query, params=None):
+        pytest.fail("the query ran")
+
+    monkeypatch.setattr(reports, "open_rows", open_rows)
+    response = client.get("/api/reports/export/history?from=yesterday")
+    assert response.status_code == 400
+    assert "from" in response.get_json()["error"]
+
+
+def test_sql_error_is_500_before_streaming(client, monkeypatch):
+    def open_rows(query, params=None):
+        raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+
+    monkeypatch.setattr(reports, "open_rows", open_rows)
+    response = client.get("/api/reports/export/history?from=2026-01-01&to=2026-02-01")
+    assert response.status_code == 500
+    assert "statement timeout" in response.get_json()["error"]
+
+
+def test_empty_csv_export_has_header(client, monkeypatch):
+    monkeypatch.setattr(reports, "open_rows", lambda query, params=None: (["scan_id", "scan_time"], iter(())))
+    response = client.get("/api/reports/export/history")
+    assert response.status_code == 200
+    assert response.data.decode().splitlines() == ["scan_id,scan_time"]
+
+
+def test_csv_header_comes_from_columns():
+    _, chunks = exporters.stream(iter([{"a": 1, "b": 2}]), "csv", columns=["a", "b"])
+    assert b"".join(chunks).decode().splitlines() == ["a,b", "1,2"]
+
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import ingest_schema
+
+# The MQTT ingest modules live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import missing_detector  # noqa: E402
+import reader_liveness  # noqa: E402
+
+
+def test_ingest_creates_the_same_tables():
+    assert missing_detector.SCHEMA_SQL == ingest_schema.MISSING_THRESHOLDS_SCHEMA
+    assert reader_liveness.SCHEMA_SQL == ingest_schema.READER_LIVENESS_SCHEMA
+
+
+def test_reader_cutoffs_match():
+    assert reader_liveness.WARNING_AFTER == ingest_schema.READER_WARNING_AFTER
+    assert reader_liveness.OFFLINE_AFTER == ingest_schema.READER_OFFLINE_AFTER
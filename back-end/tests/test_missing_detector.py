@@ -0,0 +1,113 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# The MQTT ingest modules live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import missing_detector  # noqa: E402
+from missing_detector import MissingAssetDetector  # noqa: E402
+
+NOW = datetime(2026, 1, 1, 12, 0)
+DEFAULT = missing_detector.DEFAULT_THRESHOLD_MINUTES
+
+
+class Database:
+    """Answers the detector's statements from plain attributes"""
+
+    def __init__(self):
+        self.version = 1
+        self.assets = {1: DEFAULT, 2: DEFAULT}   # asset_id -> threshold minutes
+        self.last_scan = {1: NOW - timedelta(minutes=10)}
+        self.statements = []
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class Cursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        db = self.db
+        db.statements.append(query)
+        if query == missing_detector.ASSETS_VERSION_SQL:
+            self.rows = [(db.version,)]
+        elif query == missing_detector.LOAD_SQL:
+            self.rows = [(a, m, db.last_scan.get(a), False) for a, m in db.assets.items()]
+        elif query == missing_detector.THRESHOLDS_SQL:
+            self.rows = list(db.assets.items())
+        elif query == missing_detector.NEW_ASSETS_SQL:
+            self.rows = [(a, db.last_scan.get(a), False) for a in params[0]]
+        else:
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def database():
+    return Database()
+
+
+@pytest.fixture
+def detector(database):
+    d = MissingAssetDetector(lambda: database, lambda conn: None, lambda: NOW)
+    d.load()
+    return d
+
+
+def deadline(detector, asset_id):
+    entry = detector._deadlines.get(asset_id)
+    return entry and entry[0]
+
+
+def test_refresh_waits_for_the_interval_or_a_version_bump(detector, database):
+    database.statements.clear()
+    assert detector.refresh() is False
+    assert missing_detector.THRESHOLDS_SQL not in database.statements
+
+    database.version += 1
+    assert detector.refresh() is True
+    assert detector.refresh() is False
+
+
+def test_new_asset_gets_a_deadline(detector, database):
+    database.assets[3] = 30
+    database.version += 1
+    detector.refresh()
+    assert deadline(detector, 3) == NOW + timedelta(minutes=30)
+
+
+def test_threshold_change_moves_armed_deadline(detector, database):
+    database.assets[1] = 60
+    detector.refresh(force=True)
+    assert deadline(detector, 1) == database.last_scan[1] + timedelta(minutes=60)
+    assert detector._threshold(1) == timedelta(minutes=60)
+
+
+def test_deleted_asset_is_dropped(detector, database):
+    del database.assets[2]
+    detector.refresh(force=True)
+    assert deadline(detector, 2) is None
+    assert 2 not in detector._thresholds
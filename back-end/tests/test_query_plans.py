@@ -0,0 +1,203 @@
+"""
+Query-plan regression tests for the hot SQL.
+
+Each test runs EXPLAIN (FORMAT JSON) on a query the API or the MQTT ingest
+sends and asserts on the plan: the indexes it must use, no sequential scan
+of an append-only history table (LARGE_TABLES), and for per-asset queries
+an estimated cost ceiling per asset. Plans depend on statistics, so point
+DB_* at a database loaded with realistic volumes. PLAN_TEST_LOAD=1 applies
+migrations.py and loads a synthetic dataset first (it truncates the
+generated tables):
+
+    PLAN_TEST_LOAD=1 PLAN_TEST_ASSETS=20000 python -m pytest -q tests/test_query_plans.py
+
+Without a reachable database every test is skipped.
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import date
+
+import psycopg2
+import pytest
+from flask import Flask
+from psycopg2.pool import PoolError
+from werkzeug.datastructures import MultiDict
+
+import db
+from routes import reports, tracking
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The MQTT ingest modules live at the repository root
+sys.path.append(os.path.dirname(BACKEND))
+
+import missing_detector  # noqa: E402
+import reader_liveness  # noqa: E402
+
+# Append-only history tables; reading one end to end is always a regression
+LARGE_TABLES = ("asset_room_scan_events", "esp32_health_logs", "esp32_power_logs", "asset_status")
+
+SCAN_SEEK = "idx_scan_events_asset_time"
+SCAN_TIME = "idx_scan_events_scan_time"
+
+# Ingest duplicate suppression, as in mqtt_subsciber.py (not importable: it
+# connects and subscribes at import time)
+DUPLICATE_SCAN_SQL = """
+SELECT 1 FROM asset_room_scan_events
+WHERE asset_id = %s
+  AND room_id = %s
+  AND scan_time > %s
+"""
+
+
+def _view_sql(view, *args):
+    """(sql, params) a tracking view sends, captured instead of run"""
+    calls = []
+
+    def fetch_all(query, params=None):
+        calls.append((query, params))
+        return []
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(tracking, "fetch_all", fetch_all)
+        with Flask(__name__).test_request_context():
+            # Past @conditional: only the query matters here
+            view.__wrapped__(*args)
+    return calls[0]
+
+
+def _report(report_type, **args):
+    build, _ = reports.REPORTS[report_type]
+    return build(MultiDict(args))
+
+
+# name -> (builder returning (sql, params), rules). Rules: "indexes" must all
+# appear in the plan (a tuple entry accepts any of its names),
+# "max_cost_per_asset" caps the estimated total cost divided by the number
+# of assets, "seq_scans_allowed" exempts large tables the query reads whole
+# by design.
+CHECKS = {
+    "tracking.current": (lambda: _view_sql(tracking.current_locations),
+                         {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 50}),
+    "tracking.building": (lambda: _view_sql(tracking.assets_by_building, 1),
+                          {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 50}),
+    "tracking.floor": (lambda: _view_sql(tracking.assets_by_floor, 1),
+                       {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 50}),
+    "tracking.room": (lambda: _view_sql(tracking.assets_by_room, 1),
+                      {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 50}),
+    "tracking.history": (lambda: _view_sql(tracking.movement_history),
+                         {"indexes": (SCAN_TIME,)}),
+    "reports.department_summary": (lambda: _report("department-summary"),
+                                   {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 100}),
+    # MAX(scan_time) per asset aggregates every scan; the check pins the
+    # correlated last_known_location probe to the index
+    "reports.missing_assets": (lambda: _report("missing-assets"),
+                               {"indexes": (SCAN_SEEK,), "seq_scans_allowed": ("asset_room_scan_events",)}),
+    "reports.utilization_trends": (lambda: _report("utilization-trends", time_range="day"), {}),
+    "reports.scan_history": (lambda: reports.scan_history_query(MultiDict()),
+                             {"indexes": (SCAN_TIME,)}),
+    "reports.maintenance_history": (lambda: _report("maintenance-history"), {}),
+    "reports.maintenance_summary": (lambda: _report("maintenance-summary"), {}),
+    "reports.tco_summary": (lambda: _report("tco-summary"), {}),
+    "reports.financial_overview": (lambda: _report("financial-overview"), {}),
+    "reports.asset_value_by_department": (lambda: _report("asset-value-by-department"), {}),
+    "reports.quick_stats": (lambda: _report("quick-stats"), {}),
+    "ingest.missing_detector_load": (
+        lambda: (missing_detector.LOAD_SQL, (missing_detector.DEFAULT_THRESHOLD_MINUTES,)),
+        {"indexes": (SCAN_SEEK,), "max_cost_per_asset": 50}),
+    "ingest.missing_detector_new_assets": (
+        lambda: (missing_detector.NEW_ASSETS_SQL, ([1, 2, 3],)),
+        {"indexes": (SCAN_SEEK,)}),
+    "ingest.reader_liveness_load": (
+        lambda: (reader_liveness.LOAD_SQL, None),
+        {"indexes": ("idx_health_logs_reader_time", "idx_power_logs_reader_time")}),
+    "ingest.duplicate_scan": (
+        lambda: (DUPLICATE_SCAN_SQL, (1, 1, f"{date.today()} 00:00:00")),
+        {"indexes": (("idx_scan_events_asset_room_time", SCAN_SEEK),)}),
+}
+
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from walk(child)
+
+
+def summarize(plan):
+    """Cost, indexes used and sequential scans of an EXPLAIN (FORMAT JSON) plan"""
+    root = plan[0]["Plan"]
+    nodes = list(walk(root))
+    return {
+        "cost": root["Total Cost"],
+        "indexes": {n["Index Name"] for n in nodes if "Index Name" in n},
+        "seq_scans": {n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"},
+    }
+
+
+def evaluate(summary, rules, assets):
+    failures = []
+    allowed = rules.get("seq_scans_allowed", ())
+    for table in sorted(summary["seq_scans"]):
+        if table in LARGE_TABLES and table not in allowed:
+            failures.append(f"sequential scan on {table}")
+    for wanted in rules.get("indexes", ()):
+        options = wanted if isinstance(wanted, tuple) else (wanted,)
+        if not set(options) & summary["indexes"]:
+            failures.append(f"does not use {' or '.join(options)}")
+    ceiling = rules.get("max_cost_per_asset")
+    if ceiling and assets and summary["cost"] / assets > ceiling:
+        failures.append(f"cost {summary['cost'] / assets:.1f} per asset exceeds {ceiling}")
+    return failures
+
+
+def render(plan):
+    lines = []
+
+    def show(node, depth):
+        target = node.get("Index Name") or node.get("Relation Name") or ""
+        lines.append(f"{'  ' * depth}{node['Node Type']} {target} "
+                     f"(cost={node['Total Cost']:.0f} rows={node['Plan Rows']})")
+        for child in node.get("Plans", ()):
+            show(child, depth + 1)
+    show(plan[0]["Plan"], 0)
+    return "\n".join(lines)
+
+
+def _load():
+    import migrations
+    migrations.migrate()
+    subprocess.run(
+        [sys.executable, "synthetic_data.py",
+         "--assets", os.getenv("PLAN_TEST_ASSETS", "20000"),
+         "--days", os.getenv("PLAN_TEST_DAYS", "30"),
+         "--seed", os.getenv("PLAN_TEST_SEED", "1"), "--truncate"],
+        cwd=BACKEND, check=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def assets():
+    """Number of assets in the database under test; skips when it is unreachable"""
+    try:
+        db.ping(timeout=2)
+    except (psycopg2.Error, PoolError) as e:
+        pytest.skip(f"no database for plan tests: {e}")
+    if os.getenv("PLAN_TEST_LOAD", "").lower() in ("1", "true", "yes"):
+        _load()
+    return db.fetch_one("SELECT COUNT(*) AS n FROM assets")["n"]
+
+
+@pytest.mark.parametrize("name", sorted(CHECKS))
+def test_plan(assets, name):
+    build, rules = CHECKS[name]
+    sql, params = build()
+    with db.transaction() as tx:
+        tx.rollback_only = True
+        with tx.cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    failures = evaluate(summarize(plan), rules, assets)
+    assert not failures, f"{name}: {'; '.join(failures)}\n{render(plan)}"
@@ -0,0 +1,49 @@
+"""Slow-query sampling must not disturb the caller's connection or leak parameters"""
+import logging
+
+import pytest
+
+import querystats
+from conftest import FakeConnection
+
+QUERY = "SELECT user_id FROM users WHERE password_hash = %s"
+
+
+@pytest.fixture
+def slow(monkeypatch):
+    monkeypatch.setattr(querystats, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(querystats, "EXPLAIN_SLOW_QUERIES", True)
+    querystats.reset()
+    yield
+    querystats.reset()
+
+
+def test_failed_explain_is_rolled_back_to_a_savepoint(slow):
+    conn = FakeConnection()
+    conn.fail_on = "EXPLAIN"
+    querystats.record(QUERY, ("$2b$12$secret",), 1.0, 1, conn)
+    assert conn.statements == [
+        "SAVEPOINT querystats_explain",
+        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + QUERY,
+        "ROLLBACK TO SAVEPOINT querystats_explain",
+        "RELEASE SAVEPOINT querystats_explain",
+    ]
+    assert querystats.top()[0]["explains"] == []
+
+
+def test_no_explain_without_a_connection(slow):
+    querystats.record(QUERY, ("$2b$12$secret",), 1.0, 1, None)
+    assert querystats.top()[0]["explains"] == []
+
+
+def test_slow_query_log_has_no_parameters(slow, caplog):
+    with caplog.at_level(logging.WARNING, logger="db.queries"):
+        querystats.record(QUERY, ("$2b$12$secret",), 1.0, 1, None)
+    assert "slow query" in caplog.text
+    assert "secret" not in caplog.text
+
+
+def test_statements_in_a_transaction_are_not_explained(slow, client, conn):
+    response = client.post("/api/users/", json={"name": "Ana", "email": "ana@example.com", "role_id": 2})
+    assert response.status_code == 201
+    assert not [s for s in conn.statements if "EXPLAIN" in s]
@@ -0,0 +1,49 @@
+"""Read-after-write routing is per client, not per process"""
+import time
+
+import pytest
+
+import db
+
+
+class FakeReplica:
+    def healthy(self):
+        return True
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    target = FakeReplica()
+    monkeypatch.setattr(db, "replicas", [target])
+    return target
+
+
+def _target(app, **kwargs):
+    with app.test_request_context("/api/assets/", **kwargs):
+        return db._read_target()
+
+
+def test_reads_go_to_the_replica(app, replica):
+    assert _target(app) is replica
+
+
+def test_write_sets_the_cookie_for_that_client_only(app, client, conn, replica):
+    response = client.post("/api/assets/", json={"asset_code": "A-1", "asset_name": "Pump"})
+    assert response.status_code == 201
+    cookie = response.headers["Set-Cookie"]
+    assert cookie.startswith(f"{db.READ_AFTER_WRITE_COOKIE}=")
+
+    until = cookie.split(";")[0].split("=")[1]
+    assert _target(app, headers={"Cookie": f"{db.READ_AFTER_WRITE_COOKIE}={until}"}) is db.primary
+    # Other clients (no cookie) keep reading from the replica
+    assert _target(app) is replica
+
+
+def test_expired_or_malformed_cookie_reads_the_replica(app, replica):
+    expired = f"{db.READ_AFTER_WRITE_COOKIE}={time.time() - 1:.3f}"
+    assert _target(app, headers={"Cookie": expired}) is replica
+    assert _target(app, headers={"Cookie": f"{db.READ_AFTER_WRITE_COOKIE}=soon"}) is replica
+
+
+def test_header_forces_the_primary(app, replica):
+    assert _target(app, headers={"X-DB-Primary": "1"}) is db.primary
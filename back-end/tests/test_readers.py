@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from ingest_schema import READER_OFFLINE_AFTER, READER_WARNING_AFTER
+from routes.readers import with_status
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+def row(status, heartbeat, since=NOW - timedelta(days=1)):
+    return {"reader_id": 1, "stored_status": status, "status_since": since, "last_heartbeat": heartbeat}
+
+
+def test_recent_heartbeat_keeps_stored_status():
+    heartbeat = NOW - timedelta(seconds=10)
+    out = with_status(row("Online", heartbeat), NOW)
+    assert out["status"] == "Online"
+    assert out["status_since"] == NOW - timedelta(days=1)
+    assert "stored_status" not in out
+
+
+def test_stale_online_row_is_reported_offline():
+    # The ingest stopped flushing: the stored status still says Online
+    heartbeat = NOW - READER_OFFLINE_AFTER - timedelta(minutes=5)
+    out = with_status(row("Online", heartbeat), NOW)
+    assert out["status"] == "Offline"
+    assert out["status_since"] == heartbeat + READER_OFFLINE_AFTER
+
+
+def test_warning_between_cutoffs():
+    heartbeat = NOW - READER_WARNING_AFTER - timedelta(seconds=1)
+    assert with_status(row("Online", heartbeat), NOW)["status"] == "Warning"
+
+
+def test_never_seen_reader_is_offline():
+    out = with_status(row(None, None, since=None), NOW)
+    assert out["status"] == "Offline"
+    assert out["status_since"] is None
@@ -0,0 +1,45 @@
+"""Multi-statement writes run in one transaction: one commit, or a rollback"""
+import pytest
+
+# (method, path, body, statement that fails mid-transaction)
+WRITES = {
+    "add_asset": ("post", "/api/assets/",
+                  {"asset_code": "A-1", "asset_name": "Pump", "department_id": 2},
+                  "asset_department_mapping"),
+    "update_asset": ("put", "/api/assets/5",
+                     {"asset_code": "A-1", "asset_name": "Pump", "department_id": 3},
+                     "DELETE FROM asset_department_mapping"),
+    "delete_asset": ("delete", "/api/assets/5", None,
+                     "DELETE FROM assets"),
+    "create_user": ("post", "/api/users/",
+                    {"name": "Ana", "email": "ana@example.com", "role_id": 2},
+                    "user_roles"),
+}
+
+
+def _send(client, name):
+    method, path, body, _ = WRITES[name]
+    return getattr(client, method)(path, json=body)
+
+
+@pytest.mark.parametrize("name", sorted(WRITES))
+def test_commits_once(client, conn, name):
+    response = _send(client, name)
+    assert response.status_code in (200, 201), response.get_json()
+    assert len(conn.statements) > 1
+    assert conn.commits == 1
+    assert conn.rollbacks == 0
+    assert conn.returned == 1
+
+
+@pytest.mark.parametrize("name", sorted(WRITES))
+def test_error_mid_transaction_rolls_back(client, conn, name):
+    conn.fail_on = WRITES[name][3]
+    response = _send(client, name)
+    assert response.status_code == 500
+    # Statements ran before the failing one, and none of them were committed
+    assert conn.fail_on in conn.statements[-1]
+    assert len(conn.statements) > 1
+    assert conn.commits == 0
+    assert conn.rollbacks == 1
+    assert conn.returned == 1
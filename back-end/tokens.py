@@ -0,0 +1,127 @@
+"""
+JWT issue and verification with a short-lived cache of verified tokens.
+
+The frontend verifies its token on every app load, and each verification
+used to decode the JWT and join users, user_roles and roles. A verified
+token now maps to its user record for TOKEN_CACHE_TTL_SECONDS. Entries
+carry the "users" resource version, so role and password changes (which
+bump it) invalidate them. Tokens also carry a fingerprint of the password
+hash they were issued under, so changing a password revokes older tokens.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import jwt
+
+from db import fetch_one
+from versions import snapshot
+
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+TOKEN_HOURS = float(os.getenv("JWT_TOKEN_HOURS", 24))
+CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 60))
+CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+
+USER_SQL = """
+    SELECT u.user_id, u.name, u.email, u.department_id, u.password_hash,
+           ur.role_id, r.role_name
+    FROM users u
+    LEFT JOIN user_roles ur ON u.user_id = ur.user_id
+    LEFT JOIN roles r ON ur.role_id = r.role_id
+    WHERE u.{column} = %s
+    LIMIT 1
+"""
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # token -> (expires_at, users_version, user, token_exp)
+_stats = {"hits": 0, "misses": 0}
+
+
+class Revoked(jwt.InvalidTokenError):
+    pass
+
+
+def fingerprint(password_hash):
+    return hashlib.sha256((password_hash or "").encode()).hexdigest()[:16]
+
+
+def public_user(row):
+    """The user fields returned to clients"""
+    return {
+        "user_id": row["user_id"],
+        "name": row["name"],
+        "email": row["email"],
+        "department_id": row["department_id"],
+        "role_id": row["role_id"],
+        "role": row["role_name"],
+    }
+
+
+def find_user(email=None, user_id=None):
+    """User row with password_hash and role, by email or id"""
+    if email is not None:
+        return fetch_one(USER_SQL.format(column="email"), (email,))
+    return fetch_one(USER_SQL.format(column="user_id"), (user_id,))
+
+
+def issue(user):
+    """Signed token for a user row (with password_hash)"""
+    return jwt.encode({
+        "user_id": user["user_id"],
+        "email": user["email"],
+        "pwd": fingerprint(user["password_hash"]),
+        "exp": datetime.utcnow() + timedelta(hours=TOKEN_HOURS),
+    }, SECRET_KEY, algorithm="HS256")
+
+
+def decode(token):
+    """Signature and expiry check only; raises jwt.InvalidTokenError"""
+    return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+
+
+def verify(token):
+    """
+    Return the token's user (public fields), or None if the user no longer
+    exists. Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError.
+    """
+    (version,), _ = snapshot(("users",))
+    with _lock:
+        entry = _cache.get(token)
+        if entry is not None:
+            expires_at, cached_version, user, token_exp = entry
+            if expires_at > time.monotonic() and cached_version == version and token_exp > time.time():
+                _cache.move_to_end(token)
+                _stats["hits"] += 1
+                return user
+            del _cache[token]
+        _stats["misses"] += 1
+
+    payload = decode(token)
+    row = find_user(user_id=payload["user_id"])
+    if not row:
+        return None
+    # Tokens issued before the fingerprint existed have no "pwd" claim
+    if "pwd" in payload and payload["pwd"] != fingerprint(row["password_hash"]):
+        raise Revoked("Token issued before the last password change")
+
+    user = public_user(row)
+    with _lock:
+        _cache[token] = (time.monotonic() + CACHE_TTL_SECONDS, version, user, payload["exp"])
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id):
+    """Drop this process's cached tokens for a user (other workers follow the version bump)"""
+    with _lock:
+        for token in [t for t, e in _cache.items() if e[2]["user_id"] == user_id]:
+            del _cache[token]
+
+
+def stats():
+    with _lock:
+        return dict(_stats, size=len(_cache), max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+
+from db import fetch_all, execute
+
+# How often (seconds) the in-process counters are re-synced from the database.
+# Writes made through this process invalidate the local copy immediately; this
+# only bounds how long a change made by another worker or by the MQTT ingest
+# process can go unnoticed.
+VERSION_SYNC_SECONDS = float(os.getenv("VERSION_SYNC_SECONDS", 1))
+
+RESOURCES = ("assets", "alerts", "tracking", "maintenance", "readers", "users", "roles")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resource_versions (
+    resource TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+INSERT INTO resource_versions (resource)
+SELECT unnest(%s::text[])
+ON CONFLICT (resource) DO NOTHING;
+"""
+
+_lock = threading.Lock()
+_versions = {}
+_synced_at = 0.0
+_schema_ready = False
+
+
+def _ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        execute(SCHEMA, (list(RESOURCES),))
+        _schema_ready = True
+
+
+def _store(rows):
+    for row in rows:
+        current = _versions.get(row["resource"])
+        if current is None or row["version"] >= current[0]:
+            _versions[row["resource"]] = (row["version"], row["updated_at"])
+
+
+def sync():
+    """Reload every counter from the database"""
+    global _synced_at
+    _ensure_schema()
+    rows = fetch_all("SELECT resource, version, updated_at FROM resource_versions")
+    with _lock:
+        _store(rows)
+        _synced_at = time.monotonic()
+
+
+def bump(*resources, tx=None):
+    """Increment the counters of the given resources after a write (inside tx when given)"""
+    global _synced_at
+    _ensure_schema()
+    (tx.execute if tx is not None else execute)("""
+        UPDATE resource_versions
+        SET version = version + 1,
+            updated_at = NOW()
+        WHERE resource = ANY(%s)
+    """, (list(resources),))
+    # Force the next snapshot() to pick up the new values
+    with _lock:
+        _synced_at = 0.0
+
+
+def snapshot(resources):
+    """Return ((version, ...), last_modified) for the given resources"""
+    if time.monotonic() - _synced_at > VERSION_SYNC_SECONDS:
+        sync()
+    with _lock:
+        entries = [_versions.get(r, (0, None)) for r in resources]
+    stamps = [e[1] for e in entries if e[1] is not None]
+    return tuple(e[0] for e in entries), (max(stamps) if stamps else None)
+
+
+def conditional(*resources, max_age=None):
+    """
+    Serve ETag / Last-Modified for a GET view derived from resource versions.
+
+    A request whose If-None-Match matches gets a 304 before the view runs, so
+    neither the query nor JSON serialization happen. ``max_age`` (seconds)
+    folds a time bucket into the tag for views whose output also depends on
+    NOW(), e.g. Active/Missing status.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions, last_modified = snapshot(resources)
+            bucket = 0
+            if max_age:
+                bucket = int(time.time() // max_age)
+                bucket_start = datetime.fromtimestamp(bucket * max_age, timezone.utc)
+                if last_modified is None or bucket_start > last_modified:
+                    last_modified = bucket_start
+
+            key = "|".join([request.full_path, str(bucket)] + [str(v) for v in versions])
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified is not None:
+                not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # Weak: the same version may be served gzip/br encoded or not
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
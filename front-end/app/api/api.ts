@@ -1,5 +1,25 @@
 const API_BASE = "http://localhost:5000/api";
 
+// Send the signed-in user's token with every API call, including the
+// components that call fetch() directly. Credentials carry the server's
+// read-after-write cookie, so reads right after a save see that save.
+export function installAuthFetch() {
+  const originalFetch = window.fetch.bind(window);
+  window.fetch = (input: RequestInfo | URL, init: RequestInit = {}) => {
+    const url = typeof input === "string" ? input : input instanceof URL ? input.href : input.url;
+    if (url.startsWith(API_BASE)) {
+      init = { credentials: "include", ...init };
+      const token = localStorage.getItem("token");
+      if (token) {
+        const headers = new Headers(init.headers ?? (input instanceof Request ? input.headers : undefined));
+        if (!headers.has("Authorization")) headers.set("Authorization", `Bearer ${token}`);
+        init = { ...init, headers };
+      }
+    }
+    return originalFetch(input, init);
+  };
+}
+
 export async function fetchAPI<T>(path: string): Promise<T> {
   const res = await fetch(`${API_BASE}${path}`);
   if (!res.ok) throw new Error("API error");
@@ -15,3 +35,61 @@ export async function postAPI(path: string, body: any) {
   if (!res.ok) throw new Error("POST failed");
   return res.json();
 }
+
+export interface BatchResult<T = any> {
+  id: string | number;
+  path: string;
+  status: number;
+  duration_ms: number;
+  body: T;
+}
+
+// Run several GET requests in one round trip; results come back in request order
+export async function batchAPI(paths: string[]): Promise<BatchResult[]> {
+  const res = await fetch(`${API_BASE}/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ requests: paths.map((path) => `/api${path}`) }),
+  });
+  if (!res.ok) throw new Error("Batch failed");
+  const data = await res.json();
+  return data.results;
+}
+
+// Queue a heavy report on the server and poll until its result is ready
+export async function runReportJob<T = any>(
+  reportType: string,
+  params: Record<string, any> = {},
+  pollMs = 1000
+): Promise<T> {
+  const job = await postAPI("/reports/jobs", { report_type: reportType, params });
+  for (;;) {
+    const res = await fetch(`${API_BASE}/reports/jobs/${job.job_id}/result`);
+    if (res.status === 202) {
+      await new Promise((resolve) => setTimeout(resolve, pollMs));
+      continue;
+    }
+    if (!res.ok) throw new Error("Report job failed");
+    return res.json();
+  }
+}
+
+// Download a report streamed by the server's /reports/export endpoint. Goes
+// through fetch() so the request carries the Authorization header.
+export async function downloadExport(
+  reportType: string,
+  params: Record<string, any> = {},
+  format: "csv" | "ndjson" = "csv"
+): Promise<void> {
+  const query = new URLSearchParams({ ...params, format }).toString();
+  const res = await fetch(`${API_BASE}/reports/export/${reportType}?${query}`);
+  if (!res.ok) throw new Error("Export failed");
+  const disposition = res.headers.get("Content-Disposition") || "";
+  const match = disposition.match(/filename="([^"]+)"/);
+  const url = window.URL.createObjectURL(await res.blob());
+  const a = document.createElement("a");
+  a.href = url;
+  a.download = match ? match[1] : `${reportType}.${format}`;
+  a.click();
+  window.URL.revokeObjectURL(url);
+}
@@ -1,10 +1,11 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./ui/card";
 import { Button } from "./ui/button";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "./ui/select";
 import { FileText, Download, Calendar, Filter, TrendingUp, DollarSign } from "lucide-react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "./ui/tabs";
 import { Badge } from "./ui/badge";
+import { batchAPI, downloadExport } from "../api/api";
 
 const API_BASE = 'http://localhost:5000/api';
 
@@ -87,53 +88,65 @@ export default function ReportingModule() {
     maintenance_cost_this_month: 0
   });
 
+  const initialLoad = useRef(true);
+
   useEffect(() => {
-    fetchQuickStats();
-    fetchDepartmentSummary();
-    fetchUtilizationTrends();
-    fetchMaintenanceHistory();
-    fetchTCOSummary();
-    fetchFinancialOverview();
+    loadAll();
   }, []);
 
   useEffect(() => {
+    // The initial batch already covers the default time range
+    if (initialLoad.current) {
+      initialLoad.current = false;
+      return;
+    }
     if (timeRange) {
       fetchUtilizationTrends();
       fetchMaintenanceHistory();
     }
   }, [timeRange]);
 
-  const fetchQuickStats = async () => {
+  // Load every panel in a single round trip through /api/batch
+  const loadAll = async () => {
     try {
-      const response = await fetch(`${API_BASE}/reports/quick-stats`);
-      const data = await response.json();
-      // Convert string numbers to actual numbers
-      setQuickStats({
-        total_asset_value: parseFloat(data.total_asset_value || 0),
-        total_assets: parseInt(data.total_assets || 0),
-        avg_asset_age_months: parseFloat(data.avg_asset_age_months || 0),
-        reports_generated_this_month: parseInt(data.reports_generated_this_month || 0),
-        scheduled_reports_count: parseInt(data.scheduled_reports_count || 0)
-      });
+      const [stats, departments, utilization, maintenance, tco, financial] = await batchAPI([
+        '/reports/quick-stats',
+        '/reports/department-summary',
+        `/reports/utilization-trends?time_range=${timeRange}`,
+        `/reports/maintenance-history?time_range=${timeRange}`,
+        '/reports/tco-summary',
+        '/reports/financial-overview'
+      ]);
+      applyQuickStats(stats.body);
+      applyDepartmentSummary(departments.body);
+      setUtilizationData(utilization.body?.data || []);
+      setMaintenanceData(maintenance.body?.data || []);
+      applyTCOSummary(tco.body);
+      applyFinancialOverview(financial.body);
     } catch (error) {
-      console.error('Error fetching quick stats:', error);
+      console.error('Error loading reports:', error);
     }
   };
 
-  const fetchDepartmentSummary = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/reports/department-summary`);
-      const result = await response.json();
-      // Convert string numbers to actual numbers
-      const data = (result.data || []).map((dept: any) => ({
-        ...dept,
-        total_value: parseFloat(dept.total_value || 0),
-        utilization_percentage: parseFloat(dept.utilization_percentage || 0)
-      }));
-      setDepartmentData(data);
-    } catch (error) {
-      console.error('Error fetching department summary:', error);
-    }
+  const applyQuickStats = (data: any) => {
+    // Convert string numbers to actual numbers
+    setQuickStats({
+      total_asset_value: parseFloat(data.total_asset_value || 0),
+      total_assets: parseInt(data.total_assets || 0),
+      avg_asset_age_months: parseFloat(data.avg_asset_age_months || 0),
+      reports_generated_this_month: parseInt(data.reports_generated_this_month || 0),
+      scheduled_reports_count: parseInt(data.scheduled_reports_count || 0)
+    });
+  };
+
+  const applyDepartmentSummary = (result: any) => {
+    // Convert string numbers to actual numbers
+    const data = (result.data || []).map((dept: any) => ({
+      ...dept,
+      total_value: parseFloat(dept.total_value || 0),
+      utilization_percentage: parseFloat(dept.utilization_percentage || 0)
+    }));
+    setDepartmentData(data);
   };
 
   const fetchUtilizationTrends = async () => {
@@ -156,37 +169,25 @@ export default function ReportingModule() {
     }
   };
 
-  const fetchTCOSummary = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/reports/tco-summary`);
-      const result = await response.json();
-      // Convert string numbers to actual numbers
-      const data = (result.data || []).map((item: any) => ({
-        ...item,
-        total_purchase_cost: parseFloat(item.total_purchase_cost || 0),
-        total_maintenance_cost: parseFloat(item.total_maintenance_cost || 0),
-        total_tco: parseFloat(item.total_tco || 0),
-        cost_per_asset: parseFloat(item.cost_per_asset || 0)
-      }));
-      setTCOData(data);
-    } catch (error) {
-      console.error('Error fetching TCO summary:', error);
-    }
+  const applyTCOSummary = (result: any) => {
+    // Convert string numbers to actual numbers
+    const data = (result.data || []).map((item: any) => ({
+      ...item,
+      total_purchase_cost: parseFloat(item.total_purchase_cost || 0),
+      total_maintenance_cost: parseFloat(item.total_maintenance_cost || 0),
+      total_tco: parseFloat(item.total_tco || 0),
+      cost_per_asset: parseFloat(item.cost_per_asset || 0)
+    }));
+    setTCOData(data);
   };
 
-  const fetchFinancialOverview = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/reports/financial-overview`);
-      const data = await response.json();
-      // Convert string numbers to actual numbers
-      setFinancialOverview({
-        total_acquisition_cost: parseFloat(data.total_acquisition_cost || 0),
-        maintenance_cost_ytd: parseFloat(data.maintenance_cost_ytd || 0),
-        maintenance_cost_this_month: parseFloat(data.maintenance_cost_this_month || 0)
-      });
-    } catch (error) {
-      console.error('Error fetching financial overview:', error);
-    }
+  const applyFinancialOverview = (data: any) => {
+    // Convert string numbers to actual numbers
+    setFinancialOverview({
+      total_acquisition_cost: parseFloat(data.total_acquisition_cost || 0),
+      maintenance_cost_ytd: parseFloat(data.maintenance_cost_ytd || 0),
+      maintenance_cost_this_month: parseFloat(data.maintenance_cost_this_month || 0)
+    });
   };
 
   const handleExportCSV = (data: any[], filename: string) => {
@@ -239,12 +240,11 @@ export default function ReportingModule() {
           filename = 'tco_report';
           break;
         case 'missing':
-          // Fetch missing assets report
-          const response = await fetch(`${API_BASE}/reports/missing-assets?days=30`);
-          const result = await response.json();
-          data = result.data || [];
-          filename = 'missing_assets';
-          break;
+          // Can be large; the server streams the CSV instead of the browser
+          // building it from a JSON copy of every row
+          await downloadExport('missing', { days: 30 });
+          alert('Missing report generated successfully!');
+          return;
         default:
           data = departmentData;
           filename = 'department_summary';
@@ -4,6 +4,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./ui/
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "./ui/table";
 import { Badge } from "./ui/badge";
 import { Progress } from "./ui/progress";
+import { batchAPI, BatchResult } from "../api/api";
 
 import {
   BarChart,
@@ -35,42 +36,41 @@ export function UtilizationAnalytics() {
   const [categoryDistribution, setCategoryDistribution] = useState<any[]>([]);
 
   useEffect(() => {
-    fetch("http://localhost:5000/api/utilization/assets")
-      .then(res => res.json())
-      .then(setAssets);
-
-    // 🔥 Peak Hour Utilization
-    fetch("http://localhost:5000/api/utilization/peak-hours-by-department")
-      .then(res => res.json())
-      .then(raw => {
-        const grouped: any = {};
-
-        raw.forEach((row: any) => {
-          const hour = `${row.hour}:00`;
-          if (!grouped[hour]) grouped[hour] = { hour };
-          grouped[hour][row.department_name] = Number(row.scan_count);
-        });
-
-        setPeakHourDeptData(Object.values(grouped));
-      })
-      .catch(console.error);
-
-    // Daily department-wise utilization
-    fetch("http://localhost:5000/api/utilization/daily-by-department")
-      .then(res => res.json())
-      .then(raw => {
-        const grouped: any = {};
-        raw.forEach((r: any) => {
-          if (!grouped[r.day]) grouped[r.day] = { day: r.day };
-          grouped[r.day][r.department_name] = Number(r.utilization);
-        });
-        setDailyDeptData(Object.values(grouped));
+    // All four panels in a single round trip through /api/batch
+    const loadAll = async () => {
+      const [assetRows, peakHours, daily, categories] = await batchAPI([
+        "/utilization/assets",
+        "/utilization/peak-hours-by-department",
+        "/utilization/daily-by-department",
+        "/assets/category-distribution"
+      ]);
+      const rows = (result: BatchResult) =>
+        result.status === 200 && Array.isArray(result.body) ? result.body : [];
+
+      setAssets(rows(assetRows));
+
+      // 🔥 Peak Hour Utilization
+      const byHour: any = {};
+      rows(peakHours).forEach((row: any) => {
+        const hour = `${row.hour}:00`;
+        if (!byHour[hour]) byHour[hour] = { hour };
+        byHour[hour][row.department_name] = Number(row.scan_count);
       });
+      setPeakHourDeptData(Object.values(byHour));
 
-    // Category distribution
-    fetch("http://localhost:5000/api/assets/category-distribution")
-      .then(res => res.json())
-      .then(setCategoryDistribution);
+      // Daily department-wise utilization
+      const byDay: any = {};
+      rows(daily).forEach((r: any) => {
+        if (!byDay[r.day]) byDay[r.day] = { day: r.day };
+        byDay[r.day][r.department_name] = Number(r.utilization);
+      });
+      setDailyDeptData(Object.values(byDay));
+
+      // Category distribution
+      setCategoryDistribution(rows(categories));
+    };
+
+    loadAll().catch(console.error);
   }, []);
 
   const avgUtilization =
@@ -2,11 +2,14 @@ import React from "react";
 import ReactDOM from "react-dom/client";
 import App from "./app/App.tsx";
 import { AuthProvider } from "./app/contexts/AuthContext";
+import { installAuthFetch } from "./app/api/api";
 
 import "./styles/index.css";   // defines --spacing
 import "./styles/theme.css";   // uses spacing
 import "./styles/tailwind.css";
 
+installAuthFetch();
+
 ReactDOM.createRoot(document.getElementById("root")!).render(
   <React.StrictMode>
     <AuthProvider>
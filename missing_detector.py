@@ -0,0 +1,356 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+# Minutes without a scan before an asset counts as missing, unless its
+# category has a row in missing_asset_thresholds
+DEFAULT_THRESHOLD_MINUTES = int(os.getenv("MISSING_DEFAULT_MINUTES", 1440))
+CHECK_INTERVAL_SECONDS = float(os.getenv("MISSING_CHECK_SECONDS", 30))
+# Expired deadlines handled per INSERT
+BATCH_SIZE = int(os.getenv("MISSING_BATCH_SIZE", 500))
+# Thresholds and the asset list are re-read this often, and as soon as the
+# API bumps the "assets" version
+REFRESH_SECONDS = float(os.getenv("MISSING_REFRESH_SECONDS", 300))
+
+# Same DDL as back-end/ingest_schema.py, which migrations.py uses
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS missing_asset_thresholds (
+    category_id INTEGER PRIMARY KEY REFERENCES asset_categories(category_id),
+    threshold_minutes INTEGER NOT NULL CHECK (threshold_minutes > 0)
+)
+"""
+
+# Last scan per asset, its threshold, and whether a Missing alert is already open
+LOAD_SQL = """
+SELECT
+    a.asset_id,
+    COALESCE(t.threshold_minutes, %s) AS threshold_minutes,
+    l.scan_time,
+    EXISTS (
+        SELECT 1 FROM alerts al
+        WHERE al.asset_id = a.asset_id
+          AND al.alert_type = 'Missing Asset'
+          AND al.acknowledged_at IS NULL
+    ) AS alert_open
+FROM assets a
+LEFT JOIN missing_asset_thresholds t ON t.category_id = a.category_id
+LEFT JOIN LATERAL (
+    SELECT scan_time
+    FROM asset_room_scan_events
+    WHERE asset_id = a.asset_id
+    ORDER BY scan_time DESC
+    LIMIT 1
+) l ON TRUE
+"""
+
+# Periodic refresh: every asset's current threshold
+THRESHOLDS_SQL = """
+SELECT a.asset_id, COALESCE(t.threshold_minutes, %s)
+FROM assets a
+LEFT JOIN missing_asset_thresholds t ON t.category_id = a.category_id
+"""
+
+# Last scan and open alert for assets created since the last refresh
+NEW_ASSETS_SQL = """
+SELECT
+    n.asset_id,
+    l.scan_time,
+    EXISTS (
+        SELECT 1 FROM alerts al
+        WHERE al.asset_id = n.asset_id
+          AND al.alert_type = 'Missing Asset'
+          AND al.acknowledged_at IS NULL
+    ) AS alert_open
+FROM unnest(%s::int[]) AS n(asset_id)
+LEFT JOIN LATERAL (
+    SELECT scan_time
+    FROM asset_room_scan_events
+    WHERE asset_id = n.asset_id
+    ORDER BY scan_time DESC
+    LIMIT 1
+) l ON TRUE
+"""
+
+ASSETS_VERSION_SQL = "SELECT version FROM resource_versions WHERE resource = 'assets'"
+
+THRESHOLD_SQL = """
+SELECT COALESCE(t.threshold_minutes, %s)
+FROM assets a
+LEFT JOIN missing_asset_thresholds t ON t.category_id = a.category_id
+WHERE a.asset_id = %s
+"""
+
+# One statement per batch: alert + status transition for every asset that is
+# still present, still unseen since its deadline and has no open Missing alert
+EMIT_SQL = """
+WITH expired AS (
+    SELECT * FROM unnest(%s::int[], %s::timestamp[], %s::timestamp[])
+        AS e(asset_id, last_seen, deadline)
+),
+missing AS (
+    SELECT e.asset_id, e.last_seen, e.deadline, a.asset_code, a.asset_name
+    FROM expired e
+    JOIN assets a ON a.asset_id = e.asset_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM alerts al
+        WHERE al.asset_id = e.asset_id
+          AND al.alert_type = 'Missing Asset'
+          AND al.acknowledged_at IS NULL
+    )
+      -- A scan may have committed after the deadline was popped
+      AND NOT EXISTS (
+        SELECT 1 FROM asset_room_scan_events s
+        WHERE s.asset_id = e.asset_id
+          AND s.scan_time > COALESCE(e.last_seen, '-infinity')
+    )
+),
+alerted AS (
+    INSERT INTO alerts (asset_id, alert_type, alert_message, generated_at)
+    SELECT
+        asset_id,
+        'Missing Asset',
+        CASE WHEN last_seen IS NULL
+            THEN asset_code || ' (' || asset_name || ') has never been scanned'
+            ELSE asset_code || ' (' || asset_name || ') not seen since ' || TO_CHAR(last_seen, 'YYYY-MM-DD HH24:MI')
+        END,
+        deadline
+    FROM missing
+    RETURNING asset_id
+)
+INSERT INTO asset_status (asset_id, status, recorded_at)
+SELECT m.asset_id, 'Missing', m.deadline
+FROM missing m
+JOIN alerted USING (asset_id)
+RETURNING asset_id
+"""
+
+
+class MissingAssetDetector:
+    """
+    Emits 'Missing Asset' alerts from a min-heap of per-asset deadlines.
+
+    Each accepted scan pushes the asset's new deadline (scan time + category
+    threshold) in O(log n); superseded heap entries are skipped lazily when
+    popped. A background thread pops everything past due and writes alerts
+    and 'Missing' status rows in batches, so no full-table sweep is needed
+    after the initial load. The same thread re-reads thresholds every
+    REFRESH_SECONDS or when the "assets" version moves: changed thresholds
+    move armed deadlines, assets created since get a deadline and deleted
+    ones are dropped.
+    """
+
+    def __init__(self, get_conn, put_conn, now, on_emit=None):
+        self._get_conn = get_conn
+        self._put_conn = put_conn
+        self._now = now              # returns naive local time, as stored in scan_time
+        self._on_emit = on_emit      # callback(cur) inside the emitting transaction
+        self._lock = threading.Lock()
+        self._heap = []              # (deadline, seq, asset_id)
+        self._deadlines = {}         # asset_id -> (deadline, last_seen) currently armed
+        self._thresholds = {}        # asset_id -> timedelta
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._refreshed_at = None    # monotonic time of the last threshold refresh
+        self._assets_version = None
+
+    # ------------------------------------------------------
+    def load(self):
+        """Arm a deadline for every asset from its latest scan (startup only)"""
+        conn = self._get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SCHEMA_SQL)
+                # Read first, so an asset change during the load still triggers a refresh
+                cur.execute(ASSETS_VERSION_SQL)
+                row = cur.fetchone()
+                cur.execute(LOAD_SQL, (DEFAULT_THRESHOLD_MINUTES,))
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            self._put_conn(conn)
+
+        now = self._now()
+        with self._lock:
+            self._heap.clear()
+            self._deadlines.clear()
+            self._thresholds.clear()
+            for asset_id, minutes, last_seen, alert_open in rows:
+                threshold = timedelta(minutes=minutes)
+                self._thresholds[asset_id] = threshold
+                if alert_open:
+                    continue  # re-armed by the next scan
+                self._arm(asset_id, (last_seen or now) + threshold, last_seen)
+        self._assets_version = row[0] if row else None
+        self._refreshed_at = time.monotonic()
+        print(f"✓ Missing detector armed {len(self._deadlines)} of {len(rows)} assets")
+
+    def refresh(self, force=False):
+        """
+        Re-read thresholds when REFRESH_SECONDS have passed or the "assets"
+        version moved (always with force); returns True if it re-read them
+        """
+        with self._lock:
+            known = set(self._thresholds)
+        conn = self._get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(ASSETS_VERSION_SQL)
+                row = cur.fetchone()
+                version = row[0] if row else None
+                due = (self._refreshed_at is None
+                       or time.monotonic() - self._refreshed_at >= REFRESH_SECONDS)
+                if not (force or due or version != self._assets_version):
+                    return False
+                cur.execute(THRESHOLDS_SQL, (DEFAULT_THRESHOLD_MINUTES,))
+                thresholds = {asset_id: timedelta(minutes=minutes) for asset_id, minutes in cur.fetchall()}
+                new = [asset_id for asset_id in thresholds if asset_id not in known]
+                new_rows = []
+                if new:
+                    cur.execute(NEW_ASSETS_SQL, (new,))
+                    new_rows = cur.fetchall()
+        finally:
+            conn.rollback()
+            self._put_conn(conn)
+
+        now = self._now()
+        with self._lock:
+            for asset_id in known - thresholds.keys():
+                # Deleted
+                self._thresholds.pop(asset_id, None)
+                self._deadlines.pop(asset_id, None)
+            for asset_id, threshold in thresholds.items():
+                old = self._thresholds.get(asset_id)
+                self._thresholds[asset_id] = threshold
+                current = self._deadlines.get(asset_id)
+                if old is not None and old != threshold and current is not None:
+                    self._arm(asset_id, current[0] - old + threshold, current[1])
+            for asset_id, last_seen, alert_open in new_rows:
+                # A scan may have armed it while we were reading
+                if alert_open or asset_id in self._deadlines:
+                    continue
+                self._arm(asset_id, (last_seen or now) + thresholds[asset_id], last_seen)
+        self._assets_version = version
+        self._refreshed_at = time.monotonic()
+        if new_rows:
+            print(f"✓ Missing detector picked up {len(new_rows)} new asset(s)")
+        return True
+
+    def _arm(self, asset_id, deadline, last_seen):
+        self._deadlines[asset_id] = (deadline, last_seen)
+        heapq.heappush(self._heap, (deadline, next(self._seq), asset_id))
+        # Busy assets leave superseded entries behind; drop them once they dominate
+        if len(self._heap) > 4 * len(self._deadlines) + 1024:
+            self._heap = [
+                (deadline, seq, aid) for deadline, seq, aid in self._heap
+                if self._deadlines.get(aid, (None,))[0] == deadline
+            ]
+            heapq.heapify(self._heap)
+
+    def _threshold(self, asset_id):
+        threshold = self._thresholds.get(asset_id)
+        if threshold is None:
+            conn = self._get_conn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(THRESHOLD_SQL, (DEFAULT_THRESHOLD_MINUTES, asset_id))
+                    row = cur.fetchone()
+                conn.rollback()
+            finally:
+                self._put_conn(conn)
+            threshold = timedelta(minutes=row[0] if row else DEFAULT_THRESHOLD_MINUTES)
+            self._thresholds[asset_id] = threshold
+        return threshold
+
+    # ------------------------------------------------------
+    def on_scan(self, asset_id, scan_time):
+        """Push the asset's deadline forward after an accepted scan"""
+        threshold = self._threshold(asset_id)
+        with self._lock:
+            current = self._deadlines.get(asset_id)
+            if current is not None and current[1] is not None and current[1] >= scan_time:
+                return  # out-of-order scan, newer one already armed
+            self._arm(asset_id, scan_time + threshold, scan_time)
+
+    def forget(self, asset_id):
+        with self._lock:
+            self._deadlines.pop(asset_id, None)
+            self._thresholds.pop(asset_id, None)
+
+    def _pop_expired(self, now, limit):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(expired) < limit:
+                deadline, _, asset_id = heapq.heappop(self._heap)
+                current = self._deadlines.get(asset_id)
+                if current is None or current[0] != deadline:
+                    continue  # superseded by a later scan
+                del self._deadlines[asset_id]
+                expired.append((asset_id, current[1], deadline))
+        return expired
+
+    def check(self):
+        """Emit alerts for every deadline that has passed; returns the number emitted"""
+        emitted = 0
+        while True:
+            expired = self._pop_expired(self._now(), BATCH_SIZE)
+            if not expired:
+                return emitted
+
+            conn = self._get_conn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(EMIT_SQL, (
+                        [e[0] for e in expired],
+                        [e[1] for e in expired],
+                        [e[2] for e in expired],
+                    ))
+                    count = cur.rowcount
+                    if count and self._on_emit:
+                        self._on_emit(cur)
+                conn.commit()
+                emitted += count
+            except Exception:
+                conn.rollback()
+                # Put them back so the next pass retries
+                with self._lock:
+                    for asset_id, last_seen, deadline in expired:
+                        if asset_id not in self._deadlines:
+                            self._arm(asset_id, deadline, last_seen)
+                raise
+            finally:
+                self._put_conn(conn)
+
+            if count:
+                print(f"🚨 Missing Asset alerts created for {count} asset(s)")
+
+    def run(self):
+        while not self._stop.wait(CHECK_INTERVAL_SECONDS):
+            try:
+                self.refresh()
+                self.check()
+            except Exception:
+                print("❌ Missing detector pass failed")
+                traceback.print_exc()
+
+    def start(self):
+        self.load()
+        threading.Thread(target=self.run, daemon=True, name="missing-detector").start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            next_deadline = self._heap[0][0] if self._heap else None
+            return {
+                "armed": len(self._deadlines),
+                "heap_size": len(self._heap),
+                "next_deadline": next_deadline.isoformat() if next_deadline else None,
+            }
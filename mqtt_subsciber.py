@@ -7,11 +7,15 @@ from datetime import datetime, timedelta
 import pytz
 import threading
 import traceback
+from missing_detector import MissingAssetDetector
+from reader_liveness import ReaderLivenessTracker
 
 # ==========================================================
 # DATABASE CONFIG
 # ==========================================================
-db_pool = psycopg2.pool.SimpleConnectionPool(
+# Shared by the paho network thread, the missing detector and the reader
+# liveness tracker: must be the thread-safe pool
+db_pool = psycopg2.pool.ThreadedConnectionPool(
     1, 10,
     dbname="asset_tracking_db_test_3",
     user="postgres",
@@ -26,6 +30,61 @@ def get_db_connection():
 def return_db_connection(conn):
     db_pool.putconn(conn)
 
+# ----------------------------------------------------------
+# RESOURCE VERSION COUNTERS (read by the API for ETags)
+# ----------------------------------------------------------
+def ensure_resource_versions():
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS resource_versions (
+                    resource TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+            """)
+        conn.commit()
+    finally:
+        return_db_connection(conn)
+
+def bump_versions(cur, *resources):
+    """
+    Bump API resource versions inside the current ingest transaction. Rows
+    are locked in sorted order so the scan handler and the background
+    threads never wait on each other's locks in opposite orders (deadlock).
+    """
+    cur.execute("""
+        INSERT INTO resource_versions (resource, version, updated_at)
+        SELECT unnest(%s::text[]), 1, NOW()
+        ON CONFLICT (resource) DO UPDATE
+        SET version = resource_versions.version + 1,
+            updated_at = NOW()
+    """, (sorted(set(resources)),))
+
+ensure_resource_versions()
+
+# ----------------------------------------------------------
+# MISSING ASSET DETECTOR
+# ----------------------------------------------------------
+def ist_now():
+    """Current Indian Standard Time, timezone-naive like scan_time"""
+    return datetime.now(pytz.timezone('Asia/Kolkata')).replace(tzinfo=None)
+
+missing_detector = MissingAssetDetector(
+    get_db_connection,
+    return_db_connection,
+    ist_now,
+    on_emit=lambda cur: bump_versions(cur, "alerts", "tracking"),
+)
+
+reader_liveness = ReaderLivenessTracker(
+    get_db_connection,
+    return_db_connection,
+    ist_now,
+    on_change=lambda cur, resources: bump_versions(cur, *resources),
+)
+
 # ==========================================================
 # FLASK APP
 # ==========================================================
@@ -37,6 +96,7 @@ app = Flask(__name__)
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC = "asset_tracking/readers/+/scan"
+MQTT_HEARTBEAT_TOPIC = "asset_tracking/readers/+/heartbeat"
 
 # ==========================================================
 # MQTT CALLBACKS
@@ -44,7 +104,7 @@ MQTT_TOPIC = "asset_tracking/readers/+/scan"
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print("✓ MQTT Connected")
-        client.subscribe(MQTT_TOPIC)
+        client.subscribe([(MQTT_TOPIC, 0), (MQTT_HEARTBEAT_TOPIC, 0)])
     else:
         print("✗ MQTT Connection failed:", rc)
 
@@ -137,9 +197,32 @@ def on_message(client, userdata, msg):
                 VALUES (%s, 'BOOT', %s)
             """, (reader_id, now))
             conn.commit()
+            reader_liveness.heartbeat(reader_id, now, reader_code)
             print("✓ Boot logged:", reader_code)
             return
 
+        # --------------------------------------------------
+        # HEARTBEAT EVENT (wifi / power telemetry)
+        # --------------------------------------------------
+        if event_type == "heartbeat":
+            wifi_quality = payload.get("wifi_quality")
+            wifi_rssi = payload.get("wifi_rssi")
+            voltage = payload.get("voltage")
+            cur.execute("""
+                INSERT INTO esp32_health_logs
+                (reader_id, event_type, recorded_at, wifi_quality, wifi_rssi)
+                VALUES (%s, 'HEARTBEAT', %s, %s, %s)
+            """, (reader_id, now, wifi_quality, wifi_rssi))
+            if voltage is not None:
+                cur.execute("""
+                    INSERT INTO esp32_power_logs
+                    (reader_id, voltage, recorded_at)
+                    VALUES (%s, %s, %s)
+                """, (reader_id, voltage, now))
+            conn.commit()
+            reader_liveness.heartbeat(reader_id, now, reader_code, wifi_quality, wifi_rssi, voltage)
+            return
+
         # --------------------------------------------------
         # ONLY SCAN EVENTS BELOW
         # --------------------------------------------------
@@ -204,6 +287,7 @@ def on_message(client, userdata, msg):
                     # Table doesn't exist, just log to console
                     print(f"⚠ Unknown tag {uid} - unable to store (unknown_tag_scans table may not exist)")
             
+            bump_versions(cur, "alerts")
             conn.commit()
             print(f"🚨 Unknown asset alert created for tag: {uid}")
             return
@@ -225,6 +309,8 @@ def on_message(client, userdata, msg):
             print("⏭ Duplicate scan ignored")
             return
 
+        changed = ["tracking"]
+
         # --------------------------------------------------
         # STORE SCAN EVENT
         # --------------------------------------------------
@@ -256,6 +342,7 @@ def on_message(client, userdata, msg):
         """, (now, asset_id))
         
         if cur.rowcount > 0:
+            changed.append("alerts")
             print(f"✓ Auto-acknowledged {cur.rowcount} 'Missing Asset' alert(s) for asset {asset_id}")
 
         # --------------------------------------------------
@@ -297,6 +384,8 @@ def on_message(client, userdata, msg):
                 (asset_id, alert_type, alert_message, generated_at)
                 VALUES (%s, 'Geofencing Alert', %s, %s)
             """, (asset_id, alert_msg, now))
+            if "alerts" not in changed:
+                changed.append("alerts")
             print(f"🚨 Geofence violation alert created for asset {asset_id}")
 
         # --------------------------------------------------
@@ -348,7 +437,10 @@ def on_message(client, userdata, msg):
         # --------------------------------------------------
         # COMMIT ALL CHANGES
         # --------------------------------------------------
+        bump_versions(cur, *changed)
         conn.commit()
+        missing_detector.on_scan(asset_id, now)
+        reader_liveness.heartbeat(reader_id, now, reader_code)
         print(f"✓ Scan processed successfully for asset {asset_id} in room {room_id}")
 
     except Exception as e:
@@ -373,6 +465,8 @@ def mqtt_thread():
     client.connect(MQTT_BROKER, MQTT_PORT, 60)
     client.loop_forever()
 
+missing_detector.start()
+reader_liveness.start()
 threading.Thread(target=mqtt_thread, daemon=True).start()
 
 # ==========================================================
@@ -414,6 +508,14 @@ def alerts():
     return_db_connection(conn)
     return jsonify(rows)
 
+@app.route("/missing-detector")
+def missing_detector_stats():
+    return jsonify(missing_detector.stats())
+
+@app.route("/reader-liveness")
+def reader_liveness_stats():
+    return jsonify(reader_liveness.stats())
+
 @app.route("/health")
 def health():
     return jsonify({"status": "healthy"})
@@ -0,0 +1,348 @@
+import heapq
+import itertools
+import os
+import threading
+import traceback
+from datetime import timedelta
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+# Same cut-offs the readers endpoint applies to last_heartbeat
+WARNING_AFTER = timedelta(seconds=int(os.getenv("READER_WARNING_SECONDS", 300)))
+OFFLINE_AFTER = timedelta(seconds=int(os.getenv("READER_OFFLINE_SECONDS", 3600)))
+# How often timers are checked
+TICK_SECONDS = float(os.getenv("READER_TICK_SECONDS", 5))
+# Heartbeat timestamps / wifi / voltage are written at most this often per
+# reader, however fast the ingest stream is; status changes are written at once
+FLUSH_SECONDS = float(os.getenv("READER_FLUSH_SECONDS", 30))
+
+ONLINE, WARNING, OFFLINE = "Online", "Warning", "Offline"
+
+# Same DDL as back-end/ingest_schema.py, which migrations.py and the API use
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS reader_liveness (
+    reader_id INTEGER PRIMARY KEY REFERENCES room_rfid_readers(reader_id),
+    status TEXT NOT NULL,
+    status_since TIMESTAMP NOT NULL,
+    last_heartbeat TIMESTAMP,
+    wifi_quality INTEGER,
+    wifi_rssi INTEGER,
+    last_voltage NUMERIC,
+    offline_alert_id INTEGER
+)
+"""
+
+# Startup only: persisted state, falling back to the raw logs for readers
+# the tracker has never seen
+LOAD_SQL = """
+SELECT
+    rr.reader_id,
+    rr.reader_code,
+    rl.status,
+    rl.status_since,
+    GREATEST(rl.last_heartbeat, hl.recorded_at) AS last_heartbeat,
+    COALESCE(rl.wifi_quality, hl.wifi_quality) AS wifi_quality,
+    COALESCE(rl.wifi_rssi, hl.wifi_rssi) AS wifi_rssi,
+    COALESCE(rl.last_voltage, pl.voltage) AS last_voltage,
+    rl.offline_alert_id
+FROM room_rfid_readers rr
+LEFT JOIN reader_liveness rl ON rl.reader_id = rr.reader_id
+LEFT JOIN LATERAL (
+    SELECT recorded_at, wifi_quality, wifi_rssi
+    FROM esp32_health_logs
+    WHERE reader_id = rr.reader_id
+    ORDER BY recorded_at DESC
+    LIMIT 1
+) hl ON rl.reader_id IS NULL
+LEFT JOIN LATERAL (
+    SELECT voltage
+    FROM esp32_power_logs
+    WHERE reader_id = rr.reader_id
+    ORDER BY recorded_at DESC
+    LIMIT 1
+) pl ON rl.reader_id IS NULL
+"""
+
+UPSERT_SQL = """
+INSERT INTO reader_liveness
+    (reader_id, status, status_since, last_heartbeat, wifi_quality, wifi_rssi, last_voltage, offline_alert_id)
+SELECT * FROM unnest(
+    %s::int[], %s::text[], %s::timestamp[], %s::timestamp[],
+    %s::int[], %s::int[], %s::numeric[], %s::int[]
+)
+ON CONFLICT (reader_id) DO UPDATE SET
+    status = EXCLUDED.status,
+    status_since = EXCLUDED.status_since,
+    last_heartbeat = EXCLUDED.last_heartbeat,
+    wifi_quality = EXCLUDED.wifi_quality,
+    wifi_rssi = EXCLUDED.wifi_rssi,
+    last_voltage = EXCLUDED.last_voltage,
+    offline_alert_id = EXCLUDED.offline_alert_id
+"""
+
+OFFLINE_ALERT_SQL = """
+INSERT INTO alerts (asset_id, alert_type, alert_message, generated_at)
+VALUES (NULL, 'Reader Offline', %s, %s)
+RETURNING alert_id
+"""
+
+RECOVER_ALERTS_SQL = """
+UPDATE alerts
+SET acknowledged_at = %s,
+    acknowledged_by = 0
+WHERE alert_id = ANY(%s)
+  AND acknowledged_at IS NULL
+"""
+
+
+def status_for(last_heartbeat, now):
+    if last_heartbeat is None:
+        return OFFLINE
+    age = now - last_heartbeat
+    if age < WARNING_AFTER:
+        return ONLINE
+    if age < OFFLINE_AFTER:
+        return WARNING
+    return OFFLINE
+
+
+class _Reader:
+    __slots__ = ("reader_id", "reader_code", "status", "status_since", "last_heartbeat",
+                 "wifi_quality", "wifi_rssi", "voltage", "offline_alert_id", "timer_armed")
+
+    def __init__(self, reader_id, reader_code):
+        self.reader_id = reader_id
+        self.reader_code = reader_code
+        self.status = OFFLINE
+        self.status_since = None
+        self.last_heartbeat = None
+        self.wifi_quality = None
+        self.wifi_rssi = None
+        self.voltage = None
+        self.offline_alert_id = None
+        self.timer_armed = False
+
+    def next_deadline(self):
+        if self.last_heartbeat is None or self.status == OFFLINE:
+            return None
+        return self.last_heartbeat + (WARNING_AFTER if self.status == ONLINE else OFFLINE_AFTER)
+
+
+class ReaderLivenessTracker:
+    """
+    Online/Warning/Offline state for every reader, driven by the ingest stream.
+
+    heartbeat() only touches memory. Each reader has at most one timer in a
+    min-heap; when it fires the reader's status is re-derived from its latest
+    heartbeat, so a busy reader costs nothing beyond the dictionary update.
+    A background thread writes status changes (and Reader Offline alerts)
+    immediately and coalesces plain heartbeats into one batched upsert per
+    READER_FLUSH_SECONDS.
+    """
+
+    def __init__(self, get_conn, put_conn, now, on_change=None):
+        self._get_conn = get_conn
+        self._put_conn = put_conn
+        self._now = now              # returns naive local time, as stored in recorded_at
+        self._on_change = on_change  # callback(cur, resources) inside the writing transaction
+        self._lock = threading.Lock()
+        self._readers = {}           # reader_id -> _Reader
+        self._heap = []              # (deadline, seq, reader_id)
+        self._seq = itertools.count()
+        self._dirty = set()          # reader_ids with unwritten heartbeat data
+        self._changes = []           # (reader_id, old_status, new_status)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_flush = None
+
+    # ------------------------------------------------------
+    def load(self):
+        """Seed state from the database and settle readers that changed while we were down"""
+        conn = self._get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SCHEMA_SQL)
+                cur.execute(LOAD_SQL)
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            self._put_conn(conn)
+
+        now = self._now()
+        with self._lock:
+            self._readers.clear()
+            self._heap.clear()
+            for (reader_id, code, status, since, heartbeat,
+                 quality, rssi, voltage, alert_id) in rows:
+                reader = _Reader(reader_id, code)
+                reader.last_heartbeat = heartbeat
+                reader.wifi_quality = quality
+                reader.wifi_rssi = rssi
+                reader.voltage = voltage
+                reader.offline_alert_id = alert_id
+                reader.status = status or OFFLINE
+                reader.status_since = since or now
+                self._readers[reader_id] = reader
+                if status is None:
+                    self._dirty.add(reader_id)
+                self._settle(reader, now)
+        self._flush()
+        print(f"✓ Reader liveness loaded {len(rows)} readers")
+
+    def _arm(self, reader):
+        deadline = reader.next_deadline()
+        if deadline is not None and not reader.timer_armed:
+            reader.timer_armed = True
+            heapq.heappush(self._heap, (deadline, next(self._seq), reader.reader_id))
+
+    def _set_status(self, reader, status, now):
+        if status != reader.status:
+            self._changes.append((reader.reader_id, reader.status, status))
+            reader.status = status
+            reader.status_since = now
+            self._dirty.add(reader.reader_id)
+            self._wake.set()
+
+    def _settle(self, reader, now):
+        self._set_status(reader, status_for(reader.last_heartbeat, now), now)
+        self._arm(reader)
+
+    # ------------------------------------------------------
+    def heartbeat(self, reader_id, at, reader_code=None,
+                  wifi_quality=None, wifi_rssi=None, voltage=None):
+        """Record a sign of life (scan, boot or heartbeat message) for a reader"""
+        with self._lock:
+            reader = self._readers.get(reader_id)
+            if reader is None:
+                reader = self._readers[reader_id] = _Reader(reader_id, reader_code)
+                reader.status_since = at
+            if reader_code:
+                reader.reader_code = reader_code
+            if reader.last_heartbeat is None or at > reader.last_heartbeat:
+                reader.last_heartbeat = at
+            if wifi_quality is not None:
+                reader.wifi_quality = wifi_quality
+            if wifi_rssi is not None:
+                reader.wifi_rssi = wifi_rssi
+            if voltage is not None:
+                reader.voltage = voltage
+            self._dirty.add(reader_id)
+            self._settle(reader, self._now())
+
+    def _fire_timers(self, now):
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, reader_id = heapq.heappop(self._heap)
+                reader = self._readers.get(reader_id)
+                if reader is None:
+                    continue
+                reader.timer_armed = False
+                self._settle(reader, now)
+
+    # ------------------------------------------------------
+    def _flush(self):
+        """Write changed readers in one transaction; alerts for readers that went offline"""
+        now = self._now()
+        with self._lock:
+            changes, self._changes = self._changes, []
+            dirty, self._dirty = self._dirty, set()
+            readers = {rid: self._readers[rid] for rid in dirty if rid in self._readers}
+        if not readers:
+            self._last_flush = now
+            return
+
+        # Net effect per reader, so a flap inside one pass raises nothing
+        first = {}
+        for rid, old, _ in changes:
+            first.setdefault(rid, old)
+        went_offline = {rid for rid, old in first.items()
+                        if rid in readers and old != OFFLINE and readers[rid].status == OFFLINE}
+        recovered = {rid for rid, old in first.items()
+                     if rid in readers and old == OFFLINE and readers[rid].status != OFFLINE}
+
+        conn = self._get_conn()
+        try:
+            with conn.cursor() as cur:
+                resources = ["readers"]
+                alert_ids = {}
+                for rid in sorted(went_offline):
+                    reader = readers[rid]
+                    message = (f"Reader {reader.reader_code or rid} offline - no heartbeat since "
+                               f"{reader.last_heartbeat:%Y-%m-%d %H:%M}" if reader.last_heartbeat
+                               else f"Reader {reader.reader_code or rid} has never reported")
+                    cur.execute("SAVEPOINT reader_alert")
+                    try:
+                        cur.execute(OFFLINE_ALERT_SQL, (message, now))
+                        alert_ids[rid] = cur.fetchone()[0]
+                        cur.execute("RELEASE SAVEPOINT reader_alert")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT reader_alert")
+                        print(f"⚠ Could not create Reader Offline alert for {reader.reader_code}: {e}")
+                    print(f"🚨 Reader {reader.reader_code or rid} is offline")
+
+                cleared = [readers[rid].offline_alert_id for rid in recovered
+                           if readers[rid].offline_alert_id is not None]
+                if cleared:
+                    cur.execute(RECOVER_ALERTS_SQL, (now, cleared))
+                if alert_ids or cleared:
+                    resources.append("alerts")
+
+                # Snapshot under the lock, write after releasing it, so
+                # heartbeats are not held up by the database round trip
+                with self._lock:
+                    for rid, alert_id in alert_ids.items():
+                        readers[rid].offline_alert_id = alert_id
+                    for rid in recovered:
+                        readers[rid].offline_alert_id = None
+                    rows = [(r.reader_id, r.status, r.status_since, r.last_heartbeat,
+                             r.wifi_quality, r.wifi_rssi, r.voltage, r.offline_alert_id)
+                            for r in (readers[rid] for rid in sorted(readers))]
+                cur.execute(UPSERT_SQL, tuple(list(column) for column in zip(*rows)))
+                if self._on_change:
+                    self._on_change(cur, resources)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Keep the work for the next pass
+            with self._lock:
+                self._changes = changes + self._changes
+                self._dirty |= dirty
+            raise
+        finally:
+            self._put_conn(conn)
+        self._last_flush = now
+
+    def run(self):
+        while not self._stop.is_set():
+            self._wake.wait(TICK_SECONDS)
+            self._wake.clear()
+            try:
+                now = self._now()
+                self._fire_timers(now)
+                due = self._last_flush is None or (now - self._last_flush).total_seconds() >= FLUSH_SECONDS
+                if self._changes or (due and self._dirty):
+                    self._flush()
+            except Exception:
+                print("❌ Reader liveness pass failed")
+                traceback.print_exc()
+
+    def start(self):
+        self.load()
+        threading.Thread(target=self.run, daemon=True, name="reader-liveness").start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            counts = {ONLINE: 0, WARNING: 0, OFFLINE: 0}
+            for reader in self._readers.values():
+                counts[reader.status] += 1
+            return {
+                "readers": len(self._readers),
+                "status": counts,
+                "timers": len(self._heap),
+                "pending_writes": len(self._dirty),
+            }